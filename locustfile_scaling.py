@@ -0,0 +1,62 @@
+"""
+Load test showing how Files API throughput scales with concurrent users at a fixed number of workers.
+
+The user count is stepped up over time (e.g. 5 -> 10 -> 25 -> 50 -> 100 users) while the API runs
+with a fixed number of uvicorn workers. Requests/s in the Locust "Charts" tab should keep rising with
+the user count while S3 calls run off the event loop (`S3_BACKEND=async`) and flatten out early with
+`S3_BACKEND=sync`, where each worker can only wait on one S3 call at a time.
+
+Run it with, e.g.
+
+    LOCUST_STEP_USERS=5,10,25,50,100 LOCUST_STEP_SECONDS=60 \
+        locust --locustfile locustfile_scaling.py --host http://localhost:8000
+"""
+
+import os
+import random
+
+from locust import (
+    HttpUser,
+    LoadTestShape,
+    constant,
+    task,
+)
+
+N_SEED_FILES = 20
+
+
+class FileReadsUser(HttpUser):
+    """Issue S3-bound reads back to back so that throughput is limited by the API, not by think time."""
+
+    wait_time = constant(0)
+
+    def on_start(self):
+        for i in range(N_SEED_FILES):
+            files = {"file_content": (f"scaling_{i}.txt", b"This is a test file content.", "text/plain")}
+            self.client.put(f"/v1/files/scaling/scaling_{i}.txt", files=files, name="Seed File")
+
+    @task(5)
+    def download_file(self):
+        self.client.get(f"/v1/files/scaling/scaling_{random.randrange(N_SEED_FILES)}.txt", name="Download File")
+
+    @task(3)
+    def describe_file(self):
+        self.client.head(f"/v1/files/scaling/scaling_{random.randrange(N_SEED_FILES)}.txt", name="Describe File")
+
+    @task(1)
+    def list_files(self):
+        self.client.get("/v1/files?directory=scaling/", name="List Files")
+
+
+class StepLoadShape(LoadTestShape):
+    """Hold each user count from `LOCUST_STEP_USERS` for `LOCUST_STEP_SECONDS`, then stop."""
+
+    step_users = [int(users) for users in os.getenv("LOCUST_STEP_USERS", "5,10,25,50,100").split(",")]
+    step_seconds = int(os.getenv("LOCUST_STEP_SECONDS", "60"))
+
+    def tick(self):
+        step = int(self.get_run_time() // self.step_seconds)
+        if step >= len(self.step_users):
+            return None
+        users = self.step_users[step]
+        return users, users
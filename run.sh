@@ -143,6 +143,7 @@ function generate-client-library {
 
 function run {
     export S3_BUCKET_NAME=some-bucket
+    export PAGE_TOKEN_SECRET="${PAGE_TOKEN_SECRET:?set PAGE_TOKEN_SECRET to the key page tokens are signed with}"
     export LOGURU_LEVEL="INFO"
     AWS_PROFILE=cloud-course uvicorn files_api.main:create_app --reload
 }
@@ -156,6 +157,7 @@ function run-mock {
     export AWS_SECRET_ACCESS_KEY="mock"
     export AWS_ACCESS_KEY_ID="mock"
     export S3_BUCKET_NAME=some-bucket
+    export PAGE_TOKEN_SECRET=mock
 
     if ! aws s3 ls "s3://$S3_BUCKET_NAME" --endpoint-url "http://localhost:5000" 2>/dev/null; then
         aws s3 mb "s3://$S3_BUCKET_NAME" --endpoint-url "http://localhost:5000"
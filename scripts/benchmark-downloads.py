@@ -0,0 +1,112 @@
+# pylint: disable=invalid-name
+"""
+Measure download throughput (MB/s) of `GET /v1/files/{file_path}` for objects of different sizes.
+
+For every size, the benchmark reports two numbers:
+
+- "line iteration": reading the S3 body the way `StreamingResponse` used to, i.e. iterating the
+  botocore `StreamingBody` directly, which splits the content on newlines;
+- "api": downloading the file end to end through the API, which streams the body in chunks
+  of `--chunk-size-kb`.
+
+The benchmark starts a moto server and the API (uvicorn) on localhost so that both hops go over
+real HTTP connections.
+
+Usage:
+
+    python scripts/benchmark-downloads.py --sizes-mb 1 100 1024 --chunk-size-kb 1024
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from typing import Callable
+
+import boto3
+import httpx
+import uvicorn
+from moto.server import ThreadedMotoServer
+
+from files_api.main import create_app
+from files_api.settings import Settings
+
+BUCKET_NAME = "benchmark-bucket"
+MiB = 1024 * 1024
+
+
+def measure_mb_per_s(download: Callable[[], int]) -> float:
+    """Run `download`, which returns the number of bytes it read, and return its throughput in MB/s."""
+    start = time.perf_counter()
+    n_bytes = download()
+    return n_bytes / MiB / (time.perf_counter() - start)
+
+
+def start_api(settings: Settings, port: int) -> uvicorn.Server:
+    """Serve the API with uvicorn on a background thread and wait until it accepts requests."""
+    server = uvicorn.Server(uvicorn.Config(create_app(settings=settings), port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[1, 100, 1024], help="Object sizes to download.")
+    parser.add_argument(
+        "--chunk-size-kb", type=int, default=1024, help="Value of S3_DOWNLOAD_CHUNK_SIZE_BYTES / 1024."
+    )
+    parser.add_argument("--moto-port", type=int, default=5055, help="Port to run the moto server on.")
+    parser.add_argument("--api-port", type=int, default=8055, help="Port to run the API on.")
+    args = parser.parse_args()
+
+    # silence the per-request access logs of the moto server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    moto_server = ThreadedMotoServer(port=args.moto_port, verbose=False)
+    moto_server.start()
+    os.environ.update(
+        {
+            "AWS_ENDPOINT_URL": f"http://localhost:{args.moto_port}",
+            "AWS_ACCESS_KEY_ID": "mock",
+            "AWS_SECRET_ACCESS_KEY": "mock",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+    )
+    try:
+        s3_client = boto3.client("s3")
+        s3_client.create_bucket(Bucket=BUCKET_NAME)
+        settings = Settings(
+            s3_bucket_name=BUCKET_NAME,
+            s3_download_chunk_size_bytes=args.chunk_size_kb * 1024,
+            page_token_secret="benchmark",
+        )
+        api_server = start_api(settings, args.api_port)
+
+        for size_mb in args.sizes_mb:
+            object_key = f"benchmark/{size_mb}mb.bin"
+            # random bytes contain a newline every 256 bytes on average, like most binary files
+            s3_client.put_object(Bucket=BUCKET_NAME, Key=object_key, Body=os.urandom(size_mb * MiB))
+
+            def iterate_lines(key: str = object_key) -> int:
+                body = s3_client.get_object(Bucket=BUCKET_NAME, Key=key)["Body"]
+                return sum(len(line) for line in body)
+
+            def download_from_api(key: str = object_key) -> int:
+                with httpx.stream("GET", f"http://localhost:{args.api_port}/v1/files/{key}", timeout=None) as response:
+                    return sum(len(chunk) for chunk in response.iter_raw())
+
+            print(
+                f"{size_mb:>6} MB  line iteration={measure_mb_per_s(iterate_lines):8.1f} MB/s  "
+                f"api={measure_mb_per_s(download_from_api):8.1f} MB/s"
+            )
+            s3_client.delete_object(Bucket=BUCKET_NAME, Key=object_key)
+
+        api_server.should_exit = True
+    finally:
+        moto_server.stop()
+
+
+if __name__ == "__main__":
+    main()
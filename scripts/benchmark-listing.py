@@ -0,0 +1,99 @@
+# pylint: disable=invalid-name
+"""
+Compare the time to list a large prefix with a sequential paginator vs. the sharded, concurrent listing.
+
+The benchmark starts a moto server on localhost and fills it with synthetic keys spread over
+`--directories` subdirectories. The keys are written straight into moto's in-memory backend, since
+a million `put_object` calls over HTTP would take far longer than the listing itself.
+
+Each S3 call gets `--latency-ms` of extra delay, to stand in for the time real S3 takes to serve a
+page of 1000 keys. Pages of a sequential listing pay that latency one after the other; the shards of
+a sharded listing pay it concurrently.
+
+Note that moto serializes every page in Python, on the same core as the client, at roughly a quarter
+of a millisecond per key. That cost does not shrink with concurrency, so against moto the speed-up
+of the sharded listing comes from the simulated latency only. Against real S3, whose listing work
+happens on its side, it also covers most of the per-page time.
+
+Usage:
+
+    python scripts/benchmark-listing.py --keys 1000000 --directories 100 --latency-ms 100
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import boto3
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.s3.models import s3_backends
+from moto.server import ThreadedMotoServer
+
+from files_api.s3.client import create_s3_client
+from files_api.s3.read_objects import iter_s3_objects_pages
+from files_api.s3.sharded_listing import iter_s3_objects_sharded
+from files_api.settings import Settings
+
+BUCKET_NAME = "benchmark-bucket"
+
+
+def add_latency(s3_client, latency_ms: float) -> None:
+    """Sleep for `latency_ms` before every call made with `s3_client`."""
+
+    def sleep_before_call(**kwargs):  # pylint: disable=unused-argument
+        time.sleep(latency_ms / 1000)
+
+    s3_client.meta.events.register("before-call.s3", sleep_before_call)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Number of synthetic keys.")
+    parser.add_argument("--directories", type=int, default=100, help="Number of subdirectories to spread them over.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of shards listed at once.")
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="Simulated round trip per S3 call.")
+    parser.add_argument("--port", type=int, default=5055, help="Port to run the moto server on.")
+    args = parser.parse_args()
+
+    # silence the per-request access logs of the moto server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=args.port, verbose=False)
+    server.start()
+    os.environ.update(
+        {
+            "AWS_ENDPOINT_URL": f"http://localhost:{args.port}",
+            "AWS_ACCESS_KEY_ID": "mock",
+            "AWS_SECRET_ACCESS_KEY": "mock",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+    )
+    try:
+        boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+        moto_backend = s3_backends[DEFAULT_ACCOUNT_ID]["aws"]
+        for i in range(args.keys):
+            moto_backend.put_object(BUCKET_NAME, f"dir_{i % args.directories:04}/file_{i:08}.bin", b"")
+
+        settings = Settings(s3_bucket_name=BUCKET_NAME, s3_max_pool_connections=args.concurrency)
+        s3_client = create_s3_client(settings)
+        add_latency(s3_client, args.latency_ms)
+
+        start = time.perf_counter()
+        n_sequential = sum(len(objects) for objects, _ in iter_s3_objects_pages(BUCKET_NAME, s3_client=s3_client))
+        sequential_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        n_sharded = sum(
+            len(page)
+            for page in iter_s3_objects_sharded(BUCKET_NAME, max_concurrency=args.concurrency, s3_client=s3_client)
+        )
+        sharded_seconds = time.perf_counter() - start
+
+        print(f"sequential paginator: {n_sequential} keys in {sequential_seconds:7.2f}s")
+        print(f"sharded ({args.concurrency:>2} threads): {n_sharded} keys in {sharded_seconds:7.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# pylint: disable=invalid-name
+"""
+Compare the latency of chat completions made with a fresh `AsyncOpenAI()` per call vs. the shared, pooled client.
+
+The benchmark starts the mocked OpenAI app of the tests (`tests/mocks/openai_fastapi_mock_app.py`) on
+localhost, so every call goes over a real HTTP connection. The mock speaks plain HTTP, so the TLS handshake
+that a fresh client pays against the real API on top of this is not part of the numbers.
+
+Usage:
+
+    python scripts/benchmark-openai-client.py --requests 200 --concurrency 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import (
+    Awaitable,
+    Callable,
+    List,
+)
+
+import httpx
+
+from files_api.generate_files import (
+    create_openai_client,
+    get_text_chat_completion,
+)
+from files_api.settings import Settings
+
+MOCK_APP_PATH = Path(__file__).parent.parent / "tests/mocks/openai_fastapi_mock_app.py"
+
+
+async def time_calls(func: Callable[[], Awaitable[object]], n_requests: int, concurrency: int) -> List[float]:
+    """Make `n_requests` calls of `func`, `concurrency` at a time, and return the latency of each in milliseconds."""
+    latencies_ms: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed_call() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await func()
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(timed_call() for _ in range(n_requests)))
+    return latencies_ms
+
+
+def print_summary(label: str, latencies_ms: List[float]) -> None:
+    """Print the mean, median and p95 latency of a benchmark run."""
+    quantiles = statistics.quantiles(latencies_ms, n=20)
+    print(
+        f"{label:<28} mean={statistics.mean(latencies_ms):7.2f}ms "
+        f"p50={statistics.median(latencies_ms):7.2f}ms p95={quantiles[-1]:7.2f}ms"
+    )
+
+
+def wait_for_server(url: str, timeout_seconds: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"The mocked OpenAI app did not start at {url}")
+
+
+async def run_benchmark(n_requests: int, concurrency: int) -> None:
+    before = await time_calls(lambda: get_text_chat_completion("prompt"), n_requests, concurrency)
+
+    async with await create_openai_client(Settings(s3_bucket_name="unused")) as client:
+        after = await time_calls(lambda: get_text_chat_completion("prompt", client=client), n_requests, concurrency)
+
+    print_summary("before: client per request", before)
+    print_summary("after: shared pooled client", after)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=10, help="Number of requests in flight at once.")
+    parser.add_argument("--port", type=int, default=5056, help="Port to run the mocked OpenAI app on.")
+    args = parser.parse_args()
+
+    # pylint: disable=consider-using-with
+    server = subprocess.Popen(
+        [sys.executable, str(MOCK_APP_PATH)],
+        env={**os.environ, "OPENAI_MOCK_PORT": str(args.port)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    os.environ.update({"OPENAI_BASE_URL": f"http://localhost:{args.port}", "OPENAI_API_KEY": "mocked_key"})
+    try:
+        wait_for_server(f"http://localhost:{args.port}/")
+        asyncio.run(run_benchmark(args.requests, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# pylint: disable=invalid-name
+"""
+Compare per-request S3 latency of a fresh `boto3.client("s3")` per call vs. the shared, pooled client.
+
+The benchmark starts a moto server on localhost so that every call goes over a real HTTP connection.
+
+Usage:
+
+    python scripts/benchmark-s3-client.py --requests 200
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import time
+from typing import (
+    Callable,
+    List,
+)
+
+import boto3
+from moto.server import ThreadedMotoServer
+
+from files_api.s3.client import create_s3_client
+from files_api.s3.read_objects import object_exists_in_s3
+from files_api.settings import Settings
+
+BUCKET_NAME = "benchmark-bucket"
+OBJECT_KEY = "benchmark/object.txt"
+
+
+def time_calls(func: Callable[[], object], n_requests: int) -> List[float]:
+    """Call `func` `n_requests` times and return the latency of each call in milliseconds."""
+    latencies_ms = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        func()
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+    return latencies_ms
+
+
+def print_summary(label: str, latencies_ms: List[float]) -> None:
+    """Print the mean, median and p95 latency of a benchmark run."""
+    quantiles = statistics.quantiles(latencies_ms, n=20)
+    print(
+        f"{label:<28} mean={statistics.mean(latencies_ms):7.2f}ms "
+        f"p50={statistics.median(latencies_ms):7.2f}ms p95={quantiles[-1]:7.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Number of requests per scenario.")
+    parser.add_argument("--port", type=int, default=5055, help="Port to run the moto server on.")
+    args = parser.parse_args()
+
+    # silence the per-request access logs of the moto server
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=args.port, verbose=False)
+    server.start()
+    os.environ.update(
+        {
+            "AWS_ENDPOINT_URL": f"http://localhost:{args.port}",
+            "AWS_ACCESS_KEY_ID": "mock",
+            "AWS_SECRET_ACCESS_KEY": "mock",
+            "AWS_DEFAULT_REGION": "us-east-1",
+        }
+    )
+    try:
+        boto3.client("s3").create_bucket(Bucket=BUCKET_NAME)
+        boto3.client("s3").put_object(Bucket=BUCKET_NAME, Key=OBJECT_KEY, Body=b"benchmark")
+
+        before = time_calls(lambda: object_exists_in_s3(BUCKET_NAME, OBJECT_KEY), args.requests)
+
+        s3_client = create_s3_client(Settings(s3_bucket_name=BUCKET_NAME))
+        after = time_calls(lambda: object_exists_in_s3(BUCKET_NAME, OBJECT_KEY, s3_client=s3_client), args.requests)
+
+        print_summary("before: client per request", before)
+        print_summary("after: shared pooled client", after)
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -123,7 +123,7 @@ def generate_openapi() -> dict:
 
     :return: The generated OpenAPI schema.
     """
-    settings = Settings(s3_bucket_name="placeholder")
+    settings = Settings(s3_bucket_name="placeholder", page_token_secret="placeholder")
     app = create_app(settings=settings)
 
     openapi_schema = get_openapi(
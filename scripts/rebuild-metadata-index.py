@@ -0,0 +1,41 @@
+# pylint: disable=invalid-name
+"""
+Reconcile the metadata index of the Files API with a full listing of its bucket.
+
+The API rebuilds its index at startup and every `METADATA_INDEX_REBUILD_INTERVAL_SECONDS`;
+this script does the same once, e.g. from a cron job, or to build the index of a large bucket
+before the API is first started with it.
+
+Usage:
+
+    S3_BUCKET_NAME=my-bucket METADATA_INDEX_PATH=index.sqlite3 python scripts/rebuild-metadata-index.py
+"""
+
+import time
+
+from files_api.metadata_index import MetadataIndex
+from files_api.s3.client import create_s3_client
+from files_api.s3.sharded_listing import iter_s3_objects_sharded
+from files_api.settings import Settings
+
+
+def main() -> None:
+    settings = Settings()
+    if settings.metadata_index_path is None:
+        raise SystemExit("METADATA_INDEX_PATH is not set.")
+    s3_client = create_s3_client(settings)
+    index = MetadataIndex(settings.metadata_index_path)
+
+    start = time.perf_counter()
+    try:
+        pages = iter_s3_objects_sharded(
+            settings.s3_bucket_name, max_concurrency=settings.s3_listing_max_concurrency, s3_client=s3_client
+        )
+        n_files = index.rebuild(settings.s3_bucket_name, pages)
+    finally:
+        index.close()
+    print(f"Indexed {n_files} files of '{settings.s3_bucket_name}' in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# pylint: disable=invalid-name
+"""
+Write an inventory of every file under a prefix of the Files API bucket as newline-delimited JSON.
+
+The subdirectories of the prefix are listed concurrently (see `files_api.s3.sharded_listing`),
+and the inventory is written in path order as the listing progresses.
+
+Usage:
+
+    S3_BUCKET_NAME=my-bucket python scripts/s3-inventory.py --prefix path/to/ --output inventory.ndjson
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from files_api.s3.client import create_s3_client
+from files_api.s3.sharded_listing import iter_s3_objects_sharded
+from files_api.settings import Settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prefix", default="", help="Prefix to take the inventory of; the whole bucket by default.")
+    parser.add_argument("--output", type=Path, help="File to write the inventory to; stdout by default.")
+    parser.add_argument("--depth", type=int, default=1, help="Number of directory levels to split into shards.")
+    args = parser.parse_args()
+
+    settings = Settings()
+    s3_client = create_s3_client(settings)
+    output = args.output.open("w", encoding="utf-8") if args.output else sys.stdout
+
+    start = time.perf_counter()
+    n_files, n_bytes = 0, 0
+    try:
+        for page in iter_s3_objects_sharded(
+            settings.s3_bucket_name,
+            args.prefix,
+            max_concurrency=settings.s3_listing_max_concurrency,
+            depth=args.depth,
+            s3_client=s3_client,
+        ):
+            for obj in page:
+                record = {
+                    "file_path": obj["Key"],
+                    "last_modified": obj["LastModified"].isoformat(),
+                    "size_bytes": obj["Size"],
+                    "etag": obj.get("ETag"),
+                }
+                output.write(json.dumps(record) + "\n")
+                n_files += 1
+                n_bytes += obj["Size"]
+    finally:
+        if args.output:
+            output.close()
+
+    print(
+        f"Listed {n_files} files ({n_bytes} bytes) under '{args.prefix}' in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Write zip and tar.gz archives incrementally, so that a directory can be downloaded as one streamed file.
+
+The writers never seek and never hold more than the chunk they are given: every call returns the
+archive bytes that are ready, which the caller sends to the client before writing the next chunk.
+"""
+
+import tarfile
+import zipfile
+import zlib
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+    Type,
+)
+
+
+class ArchiveWriter:
+    """Write the files of an archive one after another, each as its header, its content in chunks, and its end."""
+
+    media_type = "application/octet-stream"
+
+    def start_file(self, file_name: str, size_bytes: int, last_modified: datetime) -> bytes:
+        """
+        Start the next file of the archive.
+
+        :param file_name: The path of the file inside the archive.
+        :param size_bytes: The exact size of the content that is written for the file.
+        :param last_modified: An aware datetime.
+        """
+        raise NotImplementedError
+
+    def write(self, chunk: bytes) -> bytes:
+        """Write the next chunk of the content of the current file."""
+        raise NotImplementedError
+
+    def end_file(self) -> bytes:
+        raise NotImplementedError
+
+    def close(self) -> bytes:
+        """End the archive."""
+        raise NotImplementedError
+
+
+class _Sink:
+    """An unseekable file that hands out what was written to it since it was last drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipArchiveWriter(ArchiveWriter):
+    """
+    Write a deflated zip archive.
+
+    Since the sink cannot seek back to a file's header, the size and CRC of each file follow its
+    content in a data descriptor. Only the central directory, a small record per file, is kept
+    in memory until the archive is closed.
+    """
+
+    media_type = "application/zip"
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip_file = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_DEFLATED)  # type: ignore[arg-type]
+        self._entry = None
+
+    def start_file(self, file_name: str, size_bytes: int, last_modified: datetime) -> bytes:
+        # zip timestamps cannot predate 1980
+        zip_info = zipfile.ZipInfo(file_name, date_time=max(last_modified.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+        zip_info.compress_type = zipfile.ZIP_DEFLATED
+        zip_info.external_attr = 0o644 << 16
+        zip_info.file_size = size_bytes
+        self._entry = self._zip_file.open(zip_info, "w", force_zip64=size_bytes > zipfile.ZIP64_LIMIT)
+        return self._sink.drain()
+
+    def write(self, chunk: bytes) -> bytes:
+        self._entry.write(chunk)
+        return self._sink.drain()
+
+    def end_file(self) -> bytes:
+        self._entry.close()
+        self._entry = None
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zip_file.close()
+        return self._sink.drain()
+
+
+class TarGzArchiveWriter(ArchiveWriter):
+    """Write a gzip-compressed POSIX (pax) tar archive."""
+
+    media_type = "application/gzip"
+
+    def __init__(self, compress_level: int = 6):
+        # 16 + MAX_WBITS makes zlib write a gzip header and trailer
+        self._compressor = zlib.compressobj(compress_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self._offset = 0
+        self._size_bytes = 0
+
+    def start_file(self, file_name: str, size_bytes: int, last_modified: datetime) -> bytes:
+        tar_info = tarfile.TarInfo(file_name)
+        tar_info.size = size_bytes
+        tar_info.mtime = int(last_modified.timestamp())
+        tar_info.mode = 0o644
+        self._size_bytes = size_bytes
+        return self._compress(tar_info.tobuf(tarfile.PAX_FORMAT))
+
+    def write(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def end_file(self) -> bytes:
+        # the content of a file is padded to whole blocks
+        return self._compress(tarfile.NUL * (-self._size_bytes % tarfile.BLOCKSIZE))
+
+    def close(self) -> bytes:
+        # two empty blocks end the archive, which is padded to a whole record like `tarfile` does
+        end_of_archive = tarfile.NUL * (2 * tarfile.BLOCKSIZE)
+        end_of_archive += tarfile.NUL * (-(self._offset + len(end_of_archive)) % tarfile.RECORDSIZE)
+        return self._compress(end_of_archive) + self._compressor.flush()
+
+    def _compress(self, data: bytes) -> bytes:
+        self._offset += len(data)
+        return self._compressor.compress(data)
+
+
+# the archive formats, by the extension of the archive's name
+ARCHIVE_WRITERS: Dict[str, Type[ArchiveWriter]] = {
+    ".zip": ZipArchiveWriter,
+    ".tar.gz": TarGzArchiveWriter,
+}
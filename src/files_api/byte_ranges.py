@@ -0,0 +1,98 @@
+"""Parse HTTP `Range` headers and build `multipart/byteranges` bodies for partial downloads.
+
+Docs: https://developer.mozilla.org/en-US/docs/Web/HTTP/Range_requests
+"""
+
+import re
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+# cap the number of ranges per request so that one request cannot fan out into unbounded S3 calls
+MAX_RANGES_PER_REQUEST = 16
+
+BYTE_RANGE_SPEC = re.compile(r"^\s*(?P<first>\d*)\s*-\s*(?P<last>\d*)\s*$")
+
+
+def parse_range_header(range_header: Optional[str]) -> Optional[List[str]]:
+    """
+    Split a `Range` header into single byte ranges in the format `get_object(Range=...)` accepts.
+
+    For example, "bytes=0-99, -500" becomes ["bytes=0-99", "bytes=-500"].
+
+    :param range_header: The value of the `Range` header of the request.
+
+    :return: The byte ranges, or None if the header is missing or invalid. Per RFC 9110,
+        a server must ignore a `Range` header it cannot parse and respond with the whole file.
+    """
+    if not range_header:
+        return None
+    unit, _, range_set = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not range_set:
+        return None
+
+    byte_ranges = []
+    for range_spec in range_set.split(","):
+        match = BYTE_RANGE_SPEC.match(range_spec)
+        if not match:
+            return None
+        first, last = match.group("first"), match.group("last")
+        if not first and not last:
+            return None
+        if first and last and int(first) > int(last):
+            return None
+        byte_ranges.append(f"bytes={first}-{last}")
+
+    if len(byte_ranges) > MAX_RANGES_PER_REQUEST:
+        return None
+    return byte_ranges
+
+
+def parse_if_range_header(if_range: str) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Parse an `If-Range` header into the ETag or the date that the ranges are conditional on.
+
+    :param if_range: The value of the `If-Range` header of the request.
+
+    :return: A pair of (ETag, date), at most one of which is set. Both are None if the header can
+        not be used, e.g. it holds a weak ETag, in which case the whole file must be returned.
+    """
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        return if_range, None
+    if if_range.startswith("W/"):
+        # If-Range requires a strong comparison, which a weak ETag never satisfies
+        return None, None
+    try:
+        return None, parsedate_to_datetime(if_range)
+    except (TypeError, ValueError):
+        return None, None
+
+
+async def iter_multipart_byteranges(
+    parts: AsyncIterable[Tuple[str, AsyncIterable[bytes]]],
+    content_type: str,
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a `multipart/byteranges` body, one part per byte range.
+
+    :param parts: Pairs of the `Content-Range` of a part, e.g. "bytes 0-99/1000", and its content.
+        The content of a part is only consumed once the previous part has been written.
+    :param content_type: The MIME type of the file the ranges were taken from.
+    :param boundary: The boundary separating the parts, as declared in the response's `Content-Type`.
+    """
+    async for content_range, content in parts:
+        yield (
+            f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: {content_range}\r\n\r\n".encode("utf-8")
+        )
+        async for chunk in content:
+            yield chunk
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("utf-8")
@@ -0,0 +1,51 @@
+"""FastAPI dependencies that hand app-scoped resources to the route handlers."""
+
+from typing import Optional
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    pass
+
+import httpx
+from fastapi import Request
+from openai import AsyncOpenAI
+
+from files_api.generation_cache import GenerationCache
+from files_api.s3.backends import S3Backend
+from files_api.single_flight import SingleFlight
+
+
+def get_s3_client(request: Request) -> "S3Client":
+    """Return the S3 client created once in `create_app`."""
+    return request.app.state.s3_client
+
+
+def get_s3_backend(request: Request) -> S3Backend:
+    """Return the storage backend selected by `Settings.s3_backend`."""
+    return request.app.state.s3_backend
+
+
+def get_openai_client(request: Request) -> Optional[AsyncOpenAI]:
+    """Return the OpenAI client opened for the app's lifetime in `lifespan`, or None if OpenAI is not configured."""
+    return request.app.state.openai_client
+
+
+def get_download_client(request: Request) -> httpx.AsyncClient:
+    """Return the HTTP client that downloads generated files, opened for the app's lifetime in `lifespan`."""
+    return request.app.state.download_client
+
+
+def get_generation_cache(request: Request) -> Optional[GenerationCache]:
+    """Return the cache of generated files, or None if `Settings.generation_cache_enabled` is off."""
+    return request.app.state.generation_cache
+
+
+def get_generation_single_flight(request: Request) -> Optional[SingleFlight]:
+    """Return what coalesces identical concurrent generations, or None if `Settings.single_flight_enabled` is off."""
+    return request.app.state.generation_single_flight
+
+
+def get_page_token_secret(request: Request) -> bytes:
+    """Return the key that page tokens are signed with, see `Settings.page_token_secret`."""
+    return request.app.state.page_token_secret
@@ -1,54 +1,174 @@
 from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
     Literal,
+    Optional,
     Tuple,
     Union,
 )
 
-from openai import AsyncOpenAI
+import httpx
+from openai import (
+    AsyncOpenAI,
+    OpenAIError,
+)
 from openai.types.chat import ChatCompletion
 
+from files_api.settings import Settings
+
 SYSTEM_PROMPT = "You are an autocompletion tool that produces text files given constraints."
 
-async def get_text_chat_completion(prompt: str) -> str:
+# the parameters of the generations besides the prompt, which is also what a cached generation is keyed by
+CHAT_COMPLETION_PARAMETERS: Dict[str, Any] = {"model": "gpt-3.5-turbo", "n": 1}
+DEFAULT_CHAT_COMPLETION_MAX_TOKENS = 100
+IMAGE_GENERATION_PARAMETERS: Dict[str, Any] = {"model": "dall-e-3", "size": "1024*1024", "quality": "standard", "n": 1}
+
+
+async def create_openai_client(settings: Settings) -> AsyncOpenAI:
+    """
+    Create a pooled OpenAI client configured from the app settings.
+
+    One client, and its pool of (TLS) connections, is reused across requests instead of paying for
+    a new client, pool and handshake on every generation. The API key and base URL are read from
+    the `OPENAI_API_KEY` and `OPENAI_BASE_URL` environment variables as usual.
+
+    :param settings: The settings of the app.
+
+    :return: An OpenAI client, to be closed when the app shuts down.
+
+    :raises OpenAIError: If OpenAI is not configured, e.g. `OPENAI_API_KEY` is not set.
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry_seconds,
+        ),
+        # needs the `h2` package, e.g. `pip install httpx[http2]`
+        http2=settings.openai_http2,
+    )
+    try:
+        return AsyncOpenAI(
+            http_client=http_client,
+            max_retries=settings.openai_max_retries,
+            # the client sets the timeout of every request, overriding the one of its httpx client
+            timeout=httpx.Timeout(
+                settings.openai_read_timeout_seconds, connect=settings.openai_connect_timeout_seconds
+            ),
+        )
+    except OpenAIError:
+        await http_client.aclose()
+        raise
+
+
+def create_download_client(settings: Settings) -> httpx.AsyncClient:
+    """
+    Create the pooled HTTP client that downloads generated files from the URLs the provider returns.
+
+    :param settings: The settings of the app.
+
+    :return: An httpx client, to be closed when the app shuts down.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=settings.download_max_connections),
+        timeout=httpx.Timeout(
+            settings.download_read_timeout_seconds, connect=settings.download_connect_timeout_seconds
+        ),
+        follow_redirects=True,
+    )
+
+
+class DownloadTooLargeError(Exception):
+    """A download exceeded the size it was allowed to have."""
+
+
+async def stream_download(http_client: httpx.AsyncClient, url: str, max_size_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Download a file in chunks, without holding more than one chunk in memory.
+
+    :param max_size_bytes: Size above which the download is stopped.
+
+    :raises httpx.HTTPError: If the download fails, times out, or the server responds with an error.
+    :raises DownloadTooLargeError: If the file is larger than `max_size_bytes`.
+    """
+    async with http_client.stream("GET", url) as response:
+        response.raise_for_status()
+        if int(response.headers.get("Content-Length", 0)) > max_size_bytes:
+            raise DownloadTooLargeError(f"The file at {url} is larger than {max_size_bytes} bytes.")
+        size_bytes = 0
+        async for chunk in response.aiter_bytes():
+            size_bytes += len(chunk)
+            if size_bytes > max_size_bytes:
+                raise DownloadTooLargeError(f"The file at {url} is larger than {max_size_bytes} bytes.")
+            yield chunk
+
+
+async def get_text_chat_completion(
+    prompt: str, client: Optional[AsyncOpenAI] = None, max_tokens: int = DEFAULT_CHAT_COMPLETION_MAX_TOKENS
+) -> str:
     """Generate a text chat completion from a given prompt."""
-    client = AsyncOpenAI()
+    client = client or AsyncOpenAI()
 
     response: ChatCompletion = await client.chat.completions.create(
-        model="gpt-3.5-turbo",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
-        max_tokens=100,
-        n=1
+        max_tokens=max_tokens,
+        **CHAT_COMPLETION_PARAMETERS,
     )
 
     return response.choices[0].message.content or ""
 
-async def generate_image(prompt: str) -> Union[str, None]:
-    """Generate an image from a given prompt."""
-    client = AsyncOpenAI()
-
-    response = await client.images.generate(
-        model="dall-e-3",
-        prompt=prompt,
-        size="1024*1024",
-        quality="standard",
-        n=1
+
+async def stream_text_chat_completion(
+    prompt: str, client: Optional[AsyncOpenAI] = None, max_tokens: int = DEFAULT_CHAT_COMPLETION_MAX_TOKENS
+) -> AsyncIterator[str]:
+    """
+    Generate a text chat completion from a given prompt, yielding the text as the model produces it.
+
+    The first text arrives after a fraction of the time the whole completion takes, so long
+    completions (a large `max_tokens`) can be shown and stored while they are generated.
+    """
+    client = client or AsyncOpenAI()
+
+    stream = await client.chat.completions.create(
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=max_tokens,
+        stream=True,
+        **CHAT_COMPLETION_PARAMETERS,
     )
+    # closing the stream closes the connection, e.g. when the consumer stops early
+    async with stream:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def generate_image(prompt: str, client: Optional[AsyncOpenAI] = None) -> Union[str, None]:
+    """Generate an image from a given prompt."""
+    client = client or AsyncOpenAI()
+
+    response = await client.images.generate(prompt=prompt, **IMAGE_GENERATION_PARAMETERS)
 
     return response.data[0].url or None
 
+
 async def generate_text_to_speech(
-        prompt: str,
-        response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
-        ) -> Tuple[bytes, str]:
+    prompt: str,
+    response_format: Literal["mp3", "opus", "aac", "flac", "wav", "pcm"] = "mp3",
+    client: Optional[AsyncOpenAI] = None,
+) -> Tuple[bytes, str]:
     """
     Generate text-to-speech audio from a given prompt.
 
     Returns the audio content as bytes and the MIME type as a string.
     """
-    client = AsyncOpenAI()
+    client = client or AsyncOpenAI()
 
     response = await client.audio.speech.with_raw_response.create(
         model="tts-1",
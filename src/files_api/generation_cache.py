@@ -0,0 +1,234 @@
+"""Cache generated files, so that an identical generation request is answered with a copy of the earlier result.
+
+A cached generation is an S3 object of `Settings.generation_cache_bucket_name` whose key is a hash of
+everything the generated content depends on: the model, its parameters and the prompt. A hit is copied
+server-side to the requested file path, so neither OpenAI nor this process handles the content again.
+The cache has a bucket of its own so that the files API, which only serves its own bucket, cannot be
+used to list cached generations or to plant entries.
+
+Entries expire `ttl_seconds` after they were generated. An in-memory LRU of the entries known to exist
+spares the lookup of hot entries in S3; the LRU is only a shortcut, S3 is the source of truth, so every
+instance of the API shares the same cache.
+"""
+
+import hashlib
+import json
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+)
+
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from files_api.s3 import write_objects
+from files_api.s3.backends import S3Backend
+from files_api.s3.metadata_cache import MetadataCache
+from files_api.s3.read_objects import is_missing_object_error
+from files_api.settings import Settings
+
+
+def generation_cache_key(parameters: Mapping[str, Any], prompt: str) -> str:
+    """
+    Hash a generation request into the key of its cache entry.
+
+    :param parameters: Everything besides the prompt that the generated content depends on, e.g. the model,
+        its parameters and the content type the file is stored with. Must be JSON-serializable.
+    :param prompt: The prompt of the generation.
+
+    :return: A hex digest; requests with equal parameters and prompt, and only those, have the same key.
+    """
+    canonical_request = json.dumps({"parameters": parameters, "prompt": prompt}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    A cache of generated files, stored in an S3 bucket of its own.
+
+    :param s3_backend: The backend the cached files are looked up, copied and evicted with.
+    :param bucket_name: The bucket of the files, which cached files are copied to and from.
+    :param cache_bucket_name: The bucket of the cached files.
+    :param prefix: The prefix under which the cached files are stored.
+    :param ttl_seconds: Time after which a cached file is no longer served.
+    :param max_file_size_bytes: Generated files larger than this are not cached.
+    :param max_size_bytes: Total size of the cache above which `evict` deletes the oldest entries.
+    :param lru_max_entries: Number of entries whose metadata is kept in memory.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        s3_backend: S3Backend,
+        bucket_name: str,
+        cache_bucket_name: str,
+        prefix: str,
+        ttl_seconds: float,
+        max_file_size_bytes: int,
+        max_size_bytes: int,
+        lru_max_entries: int,
+    ):
+        self.s3_backend = s3_backend
+        self.bucket_name = bucket_name
+        self.cache_bucket_name = cache_bucket_name
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_file_size_bytes = max_file_size_bytes
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        # an entry cannot outlive its TTL, so neither can what the LRU knows about it
+        self._known_entries = MetadataCache(max_entries=lru_max_entries, ttl_seconds=ttl_seconds)
+
+    def object_key(self, cache_key: str) -> str:
+        """Return the key of the S3 object that holds a cached generation."""
+        return f"{self.prefix}{cache_key}"
+
+    async def copy_to(self, cache_key: str, object_key: str) -> bool:
+        """
+        Copy a cached generation to a file, if there is one.
+
+        :param cache_key: The key of the generation request, see `generation_cache_key`.
+        :param object_key: The path of the file to write.
+
+        :return: True on a hit, False if the file has to be generated.
+        """
+        metadata = await self._lookup(cache_key)
+        if metadata is not None:
+            try:
+                await self.s3_backend.copy_s3_object(
+                    self.bucket_name,
+                    self.object_key(cache_key),
+                    object_key,
+                    size_bytes=metadata["ContentLength"],
+                    source_etag=metadata["ETag"],
+                    source_bucket_name=self.cache_bucket_name,
+                )
+                self.hits += 1
+                return True
+            except ClientError as err:
+                if not is_missing_object_error(err) and err.response["Error"].get("Code") != "PreconditionFailed":
+                    raise
+                # evicted or replaced since it was looked up
+                self._known_entries.invalidate(self.cache_bucket_name, self.object_key(cache_key))
+        self.misses += 1
+        return False
+
+    async def store(self, cache_key: str, object_key: str, size_bytes: int, etag: str) -> None:
+        """
+        Cache a generated file by copying it server-side into the cache.
+
+        The copy is conditional on the ETag the generation was uploaded with: if the file was overwritten
+        in the meantime, e.g. by a concurrent upload to the same path, it is not cached, so that other
+        content is never served for the prompt. Failing to cache is not an error of the generation, so it
+        is only logged.
+
+        :param cache_key: The key of the generation request, see `generation_cache_key`.
+        :param object_key: The path of the file the generation was written to.
+        :param size_bytes: The size of the file.
+        :param etag: The ETag of the file as it was written by the generation.
+        """
+        if size_bytes > self.max_file_size_bytes:
+            return
+        try:
+            # a plain copy: the cache bucket is not served by the API, so the backend's caches,
+            # metadata index and directory statistics have nothing to mirror
+            await self.s3_backend.run(
+                write_objects.copy_s3_object,
+                self.cache_bucket_name,
+                object_key,
+                self.object_key(cache_key),
+                size_bytes=size_bytes,
+                source_etag=etag,
+                transfer_config=self.s3_backend.copy_transfer_config,
+                source_bucket_name=self.bucket_name,
+            )
+        except ClientError as err:
+            if err.response["Error"].get("Code") == "PreconditionFailed":
+                logger.info("Not caching {object_key}, which changed since it was generated", object_key=object_key)
+            else:
+                logger.exception("Failed to cache the generated file {object_key}", object_key=object_key)
+        self._known_entries.invalidate(self.cache_bucket_name, self.object_key(cache_key))
+
+    async def evict(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Delete the expired entries, then the oldest ones until the cache is no larger than `max_size_bytes`.
+
+        :param now: The current time, an aware datetime; defaults to the current UTC time.
+
+        :return: The keys of the deleted S3 objects.
+        """
+        expired_before = (now or datetime.now(timezone.utc)) - timedelta(seconds=self.ttl_seconds)
+        evicted_keys: List[str] = []
+        entries = []
+        async for objects, _ in self.s3_backend.iter_s3_objects_pages(self.cache_bucket_name, self.prefix):
+            for obj in objects:
+                if obj["LastModified"] < expired_before:
+                    evicted_keys.append(obj["Key"])
+                else:
+                    entries.append(obj)
+        size_bytes = 0
+        for obj in sorted(entries, key=lambda obj: obj["LastModified"], reverse=True):
+            size_bytes += obj["Size"]
+            if size_bytes > self.max_size_bytes:
+                evicted_keys.append(obj["Key"])
+
+        errors = await self.s3_backend.delete_s3_objects(self.cache_bucket_name, evicted_keys)
+        for key in evicted_keys:
+            self._known_entries.invalidate(self.cache_bucket_name, key)
+        failed_keys = {error["Key"] for error in errors}
+        return [key for key in evicted_keys if key not in failed_keys]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters."""
+        return {"hits": self.hits, "misses": self.misses}
+
+    async def _lookup(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Return the metadata of a cached generation that has not expired, or None if there is none."""
+        object_key = self.object_key(cache_key)
+        metadata = self._known_entries.get(self.cache_bucket_name, object_key)
+        if metadata is None:
+            try:
+                metadata = dict(await self.s3_backend.fetch_s3_object_metadata(self.cache_bucket_name, object_key))
+            except ClientError as err:
+                if is_missing_object_error(err):
+                    return None
+                raise
+            self._known_entries.put(self.cache_bucket_name, object_key, metadata)
+        if metadata["LastModified"] < datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds):
+            self._known_entries.invalidate(self.cache_bucket_name, object_key)
+            return None
+        return metadata
+
+
+def create_generation_cache(settings: Settings, s3_backend: S3Backend) -> Optional[GenerationCache]:
+    """
+    Create the cache of generated files, if `settings.generation_cache_enabled`.
+
+    :param settings: The settings of the app.
+    :param s3_backend: The storage backend of the app.
+
+    :raises ValueError: If the cache is enabled without a bucket of its own.
+    """
+    if not settings.generation_cache_enabled:
+        return None
+    cache_bucket_name = settings.generation_cache_bucket_name
+    if cache_bucket_name is None or cache_bucket_name == settings.s3_bucket_name:
+        raise ValueError("GENERATION_CACHE_BUCKET_NAME must be set to a bucket other than S3_BUCKET_NAME.")
+    return GenerationCache(
+        s3_backend,
+        settings.s3_bucket_name,
+        cache_bucket_name,
+        prefix=settings.generation_cache_prefix,
+        ttl_seconds=settings.generation_cache_ttl_seconds,
+        max_file_size_bytes=settings.generation_cache_max_file_size_bytes,
+        max_size_bytes=settings.generation_cache_max_size_bytes,
+        lru_max_entries=settings.generation_cache_lru_max_entries,
+    )
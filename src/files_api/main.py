@@ -1,14 +1,32 @@
+from contextlib import (
+    AsyncExitStack,
+    asynccontextmanager,
+)
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
 from textwrap import dedent
+from typing import AsyncIterator
 
+import anyio
 import pydantic
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.routing import APIRoute
+from loguru import logger
+from openai import OpenAIError
 
 from files_api.errors import (
     handle_broad_exceptions,
     handle_pydantic_validation_errors,
 )
+from files_api.generate_files import (
+    create_download_client,
+    create_openai_client,
+)
+from files_api.generation_cache import create_generation_cache
 from files_api.monitoring.logger import inject_lambda_context__middleware
 # from files_api.monitoring.logger import log_process_request_and_response_info
 from files_api.route_handler import RouteHandler
@@ -16,7 +34,10 @@ from files_api.routes import (
     FILES_ROUTER,
     GENERATED_FILES_ROUTER,
 )
+from files_api.s3.backends import create_s3_backend
+from files_api.s3.client import create_s3_client
 from files_api.settings import Settings
+from files_api.single_flight import SingleFlight
 
 
 def create_app(settings: Settings = None) -> FastAPI:
@@ -42,9 +63,18 @@ def create_app(settings: Settings = None) -> FastAPI:
         docs_url="/",  # its easier to find the docs when they live on the base url
         root_path="/prod",
         generate_unique_id_function=custom_generate_unique_id,
+        lifespan=lifespan,
     )
 
     app.state.settings = settings
+    app.state.s3_client = create_s3_client(settings)
+    app.state.s3_backend = create_s3_backend(settings, app.state.s3_client)
+    app.state.generation_cache = create_generation_cache(settings, app.state.s3_backend)
+    app.state.generation_single_flight = SingleFlight() if settings.single_flight_enabled else None
+    if settings.page_token_secret is None:
+        # a random key per process would break page tokens after a restart and across instances
+        raise ValueError("PAGE_TOKEN_SECRET must be set to the key that page tokens are signed with.")
+    app.state.page_token_secret = settings.page_token_secret.get_secret_value().encode("utf-8")
 
     app.router.route_class = RouteHandler
     app.include_router(FILES_ROUTER)
@@ -65,6 +95,154 @@ def create_app(settings: Settings = None) -> FastAPI:
     return app
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Open the app's OpenAI and download clients, and run its background tasks, for as long as it serves requests."""
+    settings: Settings = app.state.settings
+    try:
+        app.state.openai_client = await create_openai_client(settings)
+    except OpenAIError:
+        # serve files anyway; the generation endpoints fail until OPENAI_API_KEY is set
+        logger.warning("OpenAI is not configured, so files cannot be generated")
+        app.state.openai_client = None
+    async with AsyncExitStack() as exit_stack, anyio.create_task_group() as task_group:
+        if app.state.openai_client is not None:
+            exit_stack.push_async_callback(app.state.openai_client.close)
+        app.state.download_client = await exit_stack.enter_async_context(create_download_client(settings))
+        if settings.negative_cache_enabled and settings.negative_cache_bloom_prefix is not None:
+            await refresh_bloom_filter(app)
+            task_group.start_soon(refresh_bloom_filter_periodically, app)
+        metadata_index = app.state.s3_backend.metadata_index
+        if metadata_index is not None:
+            if metadata_index.count(settings.s3_bucket_name) == 0:
+                # nothing to list from yet, so only start serving once the bucket has been indexed
+                await rebuild_metadata_index(app)
+            else:
+                task_group.start_soon(rebuild_metadata_index, app)
+            task_group.start_soon(rebuild_metadata_index_periodically, app)
+        if app.state.s3_backend.metadata_cache is not None or app.state.generation_cache is not None:
+            task_group.start_soon(log_cache_stats_periodically, app)
+        task_group.start_soon(abort_stale_upload_sessions_periodically, app)
+        if app.state.generation_cache is not None:
+            task_group.start_soon(evict_generation_cache_periodically, app)
+        yield
+        task_group.cancel_scope.cancel()
+
+
+async def refresh_bloom_filter(app: FastAPI) -> None:
+    """Rebuild the negative cache's Bloom filter from a fresh listing of `negative_cache_bloom_prefix`."""
+    settings: Settings = app.state.settings
+    try:
+        n_keys = await app.state.s3_backend.load_bloom_filter(
+            settings.s3_bucket_name,
+            settings.negative_cache_bloom_prefix,
+            false_positive_rate=settings.negative_cache_bloom_false_positive_rate,
+        )
+    except Exception:  # pylint: disable=broad-except
+        # the previous filter expires on its own, so lookups fall back to S3 until the next refresh succeeds
+        logger.exception("Failed to rebuild the Bloom filter of missing files")
+        return
+    logger.info("Rebuilt the Bloom filter of missing files from {n_keys} keys", n_keys=n_keys)
+
+
+async def refresh_bloom_filter_periodically(app: FastAPI) -> None:
+    """Rebuild the Bloom filter at half its max age, so a fresh filter is in place before the old one expires."""
+    settings: Settings = app.state.settings
+    while True:
+        await anyio.sleep(settings.negative_cache_bloom_max_age_seconds / 2)
+        await refresh_bloom_filter(app)
+
+
+async def rebuild_metadata_index(app: FastAPI) -> None:
+    """Reconcile the metadata index with a full listing of the bucket."""
+    settings: Settings = app.state.settings
+    try:
+        n_files = await app.state.s3_backend.rebuild_metadata_index(
+            settings.s3_bucket_name, max_concurrency=settings.s3_listing_max_concurrency
+        )
+    except Exception:  # pylint: disable=broad-except
+        # the index still mirrors every change made through this process, so keep serving from it
+        logger.exception("Failed to rebuild the metadata index")
+        return
+    logger.info("Rebuilt the metadata index from {n_files} files", n_files=n_files)
+
+
+async def rebuild_metadata_index_periodically(app: FastAPI) -> None:
+    """Pick up changes made to the bucket outside this process."""
+    settings: Settings = app.state.settings
+    while True:
+        await anyio.sleep(settings.metadata_index_rebuild_interval_seconds)
+        await rebuild_metadata_index(app)
+
+
+def log_metadata_cache_stats(app: FastAPI) -> None:
+    """Log the counters of the metadata cache, which tell whether its size and TTL suit the traffic."""
+    logger.info(
+        "Metadata cache: {hits} hits, {misses} misses, {entries} entries",
+        **app.state.s3_backend.metadata_cache.stats(),
+    )
+
+
+def log_generation_cache_stats(app: FastAPI) -> None:
+    """Log the counters of the generation cache, which tell how often identical generations are requested."""
+    logger.info("Generation cache: {hits} hits, {misses} misses", **app.state.generation_cache.stats())
+
+
+async def log_cache_stats_periodically(app: FastAPI) -> None:
+    """Log the counters of the enabled caches every `metadata_cache_stats_log_interval_seconds`."""
+    settings: Settings = app.state.settings
+    while True:
+        await anyio.sleep(settings.metadata_cache_stats_log_interval_seconds)
+        if app.state.s3_backend.metadata_cache is not None:
+            log_metadata_cache_stats(app)
+        if app.state.generation_cache is not None:
+            log_generation_cache_stats(app)
+
+
+async def abort_stale_upload_sessions(app: FastAPI) -> None:
+    """Abort the upload sessions that are older than `upload_session_max_age_seconds`, discarding their parts."""
+    settings: Settings = app.state.settings
+    initiated_before = datetime.now(timezone.utc) - timedelta(seconds=settings.upload_session_max_age_seconds)
+    try:
+        aborted_keys = await app.state.s3_backend.abort_stale_multipart_uploads(
+            settings.s3_bucket_name, initiated_before
+        )
+    except Exception:  # pylint: disable=broad-except
+        # the uploads are still stale at the next run
+        logger.exception("Failed to abort stale upload sessions")
+        return
+    if aborted_keys:
+        logger.info("Aborted {n_sessions} stale upload sessions", n_sessions=len(aborted_keys))
+
+
+async def abort_stale_upload_sessions_periodically(app: FastAPI) -> None:
+    """Keep abandoned uploads from using storage forever."""
+    settings: Settings = app.state.settings
+    while True:
+        await anyio.sleep(settings.upload_session_gc_interval_seconds)
+        await abort_stale_upload_sessions(app)
+
+
+async def evict_generation_cache(app: FastAPI) -> None:
+    """Delete the expired cached generations, and the oldest ones while the cache is over its size."""
+    try:
+        evicted_keys = await app.state.generation_cache.evict()
+    except Exception:  # pylint: disable=broad-except
+        # expired entries are not served anyway, so they only take up storage until the next run
+        logger.exception("Failed to evict cached generations")
+        return
+    if evicted_keys:
+        logger.info("Evicted {n_entries} cached generations", n_entries=len(evicted_keys))
+
+
+async def evict_generation_cache_periodically(app: FastAPI) -> None:
+    """Keep the cache of generated files within its TTL and size."""
+    settings: Settings = app.state.settings
+    while True:
+        await anyio.sleep(settings.generation_cache_eviction_interval_seconds)
+        await evict_generation_cache(app)
+
+
 def custom_generate_unique_id(route: APIRoute):
     """
     Generate prettier `operationId`s in the OpenAPI schema.
@@ -0,0 +1,283 @@
+"""A local SQLite index of file metadata that mirrors the bucket, for fast, filtered and sorted listings.
+
+S3 can only list keys in key order, one page at a time, and cannot filter by size or date. The index keeps
+one row per file with B-tree indexes on path, size and last-modified date, so that `GET /v1/files` can
+answer e.g. "the largest files under `dir/` modified this week" with a single indexed query.
+
+The index is kept up to date by the writes made through the storage backend, and reconciled with the
+bucket by `rebuild`, which picks up changes made by anyone else.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+try:
+    from mypy_boto3_s3.type_defs import ObjectTypeDef
+except ImportError:
+    pass
+
+SortBy = Literal["file_path", "size", "last_modified"]
+
+# the cursor of a sorted listing: the sort value and the path of the last file of the previous page
+Cursor = Tuple[Union[int, str, None], str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    bucket_name TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    -- ISO 8601 in UTC, so that text order is chronological order
+    last_modified TEXT NOT NULL,
+    etag TEXT,
+    -- when this process last wrote the row, see `rebuild`
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (bucket_name, file_path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_by_size ON files (bucket_name, size_bytes, file_path);
+CREATE INDEX IF NOT EXISTS files_by_last_modified ON files (bucket_name, last_modified, file_path);
+"""
+
+SORT_COLUMNS: Dict[str, str] = {"file_path": "file_path", "size": "size_bytes", "last_modified": "last_modified"}
+
+
+class IndexedFile(NamedTuple):
+    """The metadata of a file, as stored in the index."""
+
+    file_path: str
+    size_bytes: int
+    last_modified: datetime
+    etag: Optional[str]
+
+
+def _to_text(last_modified: datetime) -> str:
+    if last_modified.tzinfo is None:
+        # e.g. a `modified_since` query parameter without an offset
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f+00:00")
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string that starts with `prefix`, if any."""
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class MetadataIndex:
+    """
+    A SQLite table of file metadata, one row per file and bucket.
+
+    The index is safe to use from several threads; calls are serialized on one connection.
+
+    :param database_path: Path of the SQLite database file, or ":memory:" for an index that lives
+        as long as the process.
+    """
+
+    def __init__(self, database_path: str):
+        self._connection = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        # bucket name -> files deleted while the bucket's index is being rebuilt
+        self._deleted_during_rebuild: Dict[str, Set[str]] = {}
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+
+    def upsert(self, bucket_name: str, file_path: str, size_bytes: int, last_modified: datetime, etag: Optional[str]):
+        """Add a file to the index or update its metadata."""
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket_name, file_path, size_bytes, _to_text(last_modified), etag, time.time()),
+            )
+
+    def delete(self, bucket_name: str, file_paths: List[str]) -> None:
+        """Remove files from the index."""
+        with self._lock:
+            if bucket_name in self._deleted_during_rebuild:
+                self._deleted_during_rebuild[bucket_name].update(file_paths)
+            self._connection.executemany(
+                "DELETE FROM files WHERE bucket_name = ? AND file_path = ?",
+                [(bucket_name, file_path) for file_path in file_paths],
+            )
+
+    def count(self, bucket_name: str) -> int:
+        """Return the number of files indexed for a bucket."""
+        with self._lock:
+            cursor = self._connection.execute("SELECT COUNT(*) FROM files WHERE bucket_name = ?", (bucket_name,))
+            return cursor.fetchone()[0]
+
+    def get(self, bucket_name: str, file_path: str) -> Optional[IndexedFile]:
+        """Return the indexed metadata of a file, or None if it is not indexed."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT file_path, size_bytes, last_modified, etag FROM files WHERE bucket_name = ? AND file_path = ?",
+                (bucket_name, file_path),
+            ).fetchone()
+        if row is None:
+            return None
+        return IndexedFile(row[0], row[1], datetime.fromisoformat(row[2]), row[3])
+
+    def iter_files(self, bucket_name: str, directory: str = "", page_size: int = 10_000) -> Iterator[IndexedFile]:
+        """Walk every file under a directory in path order, one page of `page_size` rows at a time."""
+        after, has_more = None, True
+        while has_more:
+            files, has_more = self.query(bucket_name, directory, page_size, after=after)
+            yield from files
+            if files:
+                after = cursor_of(files[-1], "file_path")
+
+    def query(  # pylint: disable=too-many-arguments
+        self,
+        bucket_name: str,
+        directory: str = "",
+        page_size: int = 10,
+        sort: SortBy = "file_path",
+        min_size: Optional[int] = None,
+        modified_since: Optional[datetime] = None,
+        after: Optional[Cursor] = None,
+    ) -> Tuple[List[IndexedFile], bool]:
+        """
+        List a page of files, filtered and sorted.
+
+        :param bucket_name: Name of the bucket the files are in.
+        :param directory: Only list files whose path starts with this prefix.
+        :param page_size: Maximum number of files to return.
+        :param sort: The order to list files in, ascending. Ties are broken by file path.
+        :param min_size: Only list files of at least this many bytes.
+        :param modified_since: Only list files modified at or after this date.
+        :param after: Start after this position, see `cursor_of`.
+
+        :return: The files, and whether more files match after them.
+        """
+        sort_column = SORT_COLUMNS[sort]
+        conditions, params = ["bucket_name = ?"], [bucket_name]
+        if directory:
+            conditions.append("file_path >= ?")
+            params.append(directory)
+            upper_bound = _prefix_upper_bound(directory)
+            if upper_bound is not None:
+                conditions.append("file_path < ?")
+                params.append(upper_bound)
+        if min_size is not None:
+            conditions.append("size_bytes >= ?")
+            params.append(min_size)
+        if modified_since is not None:
+            conditions.append("last_modified >= ?")
+            params.append(_to_text(modified_since))
+        if after is not None:
+            if sort == "file_path":
+                conditions.append("file_path > ?")
+                params.append(after[1])
+            else:
+                conditions.append(f"({sort_column}, file_path) > (?, ?)")
+                params.extend(after)
+
+        order_by = "file_path" if sort == "file_path" else f"{sort_column}, file_path"
+        sql = (
+            "SELECT file_path, size_bytes, last_modified, etag FROM files "
+            f"WHERE {' AND '.join(conditions)} ORDER BY {order_by} LIMIT ?"
+        )
+        with self._lock:
+            rows = self._connection.execute(sql, (*params, page_size + 1)).fetchall()
+        files = [
+            IndexedFile(file_path, size_bytes, datetime.fromisoformat(last_modified), etag)
+            for file_path, size_bytes, last_modified, etag in rows[:page_size]
+        ]
+        return files, len(rows) > page_size
+
+    def rebuild(self, bucket_name: str, pages: Iterable[List["ObjectTypeDef"]]) -> int:
+        """
+        Reconcile the index of a bucket with a fresh listing of it.
+
+        The listing is staged first, so listings keep being answered from the current index while it runs.
+        Files written or deleted through this index while the listing runs keep their newer state, even if
+        the listing saw them before the change.
+
+        :param bucket_name: Name of the bucket.
+        :param pages: Pages of a listing of every object in the bucket.
+
+        :return: The number of files listed.
+        """
+        with self._rebuild_lock:
+            started_at = time.time()
+            with self._lock:
+                self._deleted_during_rebuild[bucket_name] = set()
+                self._connection.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS staged_files "
+                    "(file_path TEXT PRIMARY KEY, size_bytes INTEGER, last_modified TEXT, etag TEXT)"
+                )
+                self._connection.execute("DELETE FROM staged_files")
+            try:
+                n_files = 0
+                for page in pages:
+                    rows = [(obj["Key"], obj["Size"], _to_text(obj["LastModified"]), obj.get("ETag")) for obj in page]
+                    with self._lock:
+                        self._connection.executemany("INSERT OR REPLACE INTO staged_files VALUES (?, ?, ?, ?)", rows)
+                    n_files += len(rows)
+                with self._lock:
+                    self._apply_staged_files(bucket_name, started_at)
+            finally:
+                with self._lock:
+                    self._deleted_during_rebuild.pop(bucket_name, None)
+                    self._connection.execute("DELETE FROM staged_files")
+            return n_files
+
+    def _apply_staged_files(self, bucket_name: str, started_at: float) -> None:
+        deleted_file_paths = self._deleted_during_rebuild[bucket_name]
+        self._connection.execute("BEGIN")
+        try:
+            self._connection.executemany(
+                "DELETE FROM staged_files WHERE file_path = ?", [(file_path,) for file_path in deleted_file_paths]
+            )
+            # files that are gone from the bucket, unless they were written since the listing started
+            self._connection.execute(
+                "DELETE FROM files WHERE bucket_name = ? AND indexed_at < ? "
+                "AND file_path NOT IN (SELECT file_path FROM staged_files)",
+                (bucket_name, started_at),
+            )
+            # new and changed files, unless they were written since the listing started
+            self._connection.execute(
+                "INSERT OR REPLACE INTO files "
+                "SELECT ?, staged.file_path, staged.size_bytes, staged.last_modified, staged.etag, ? "
+                "FROM staged_files AS staged WHERE NOT EXISTS ("
+                "    SELECT 1 FROM files WHERE bucket_name = ? AND file_path = staged.file_path AND indexed_at >= ?"
+                ")",
+                (bucket_name, started_at, bucket_name, started_at),
+            )
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+def cursor_of(indexed_file: IndexedFile, sort: SortBy) -> Cursor:
+    """Return the position right after a file in a listing sorted by `sort`, to continue the listing from."""
+    if sort == "size":
+        return indexed_file.size_bytes, indexed_file.file_path
+    if sort == "last_modified":
+        return _to_text(indexed_file.last_modified), indexed_file.file_path
+    return None, indexed_file.file_path
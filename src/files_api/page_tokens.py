@@ -0,0 +1,86 @@
+"""Encode and verify the opaque page tokens that `GET /v1/files` hands out for pagination.
+
+A page token records where a listing stopped: the directory being listed, the last file path
+returned (the next page starts after it, see `list_objects_v2(StartAfter=...)`) and the page size.
+It is signed, so a client cannot forge a token for another directory, and it does not depend on
+S3's continuation tokens, so any source of sorted file paths can continue a listing from it.
+
+Listings answered from the metadata index may also be filtered and sorted by size or date; their
+tokens additionally record the filters, the sort order and the sort value of the last file returned.
+"""
+
+from datetime import datetime
+from typing import (
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from files_api.signing import (
+    decode_signed,
+    derive_key,
+    encode_signed,
+)
+
+
+class InvalidPageTokenError(ValueError):
+    """The page token was not issued by this API, was tampered with, or is malformed."""
+
+
+class PageToken(NamedTuple):
+    """The position of a listing."""
+
+    directory: str
+    last_file_path: str
+    page_size: int
+    sort: str = "file_path"
+    # the value of the sort column of the last file returned, unless sorted by file path
+    last_sort_value: Union[int, str, None] = None
+    min_size: Optional[int] = None
+    modified_since: Optional[datetime] = None
+
+
+def encode_page_token(page_token: PageToken, secret: bytes) -> str:
+    """
+    Encode a listing position into a compact, URL-safe, signed token.
+
+    :param page_token: The position to encode.
+    :param secret: The secret the token's key is derived from, see `signing.derive_key`.
+
+    :return: The token, e.g. "eyJkIjoiZGlyLyIsImsiOiJkaXIvYSIsIm4iOjEwfQ.Qm9n...".
+    """
+    data = {"d": page_token.directory, "k": page_token.last_file_path, "n": page_token.page_size}
+    # only listings of the metadata index use these, so leave them out of plain listings' tokens
+    if page_token.sort != "file_path":
+        data.update(s=page_token.sort, v=page_token.last_sort_value)
+    if page_token.min_size is not None:
+        data["min"] = page_token.min_size
+    if page_token.modified_since is not None:
+        data["since"] = page_token.modified_since.isoformat()
+    return encode_signed(data, derive_key(secret, "page-token"))
+
+
+def decode_page_token(token: str, secret: bytes) -> PageToken:
+    """
+    Verify a token created by `encode_page_token` and decode the listing position from it.
+
+    :param token: The token sent by the client.
+    :param secret: The secret the token's key was derived from.
+
+    :return: The listing position.
+
+    :raises InvalidPageTokenError: If the token is malformed or its signature does not match.
+    """
+    try:
+        data = decode_signed(token, derive_key(secret, "page-token"))
+        return PageToken(
+            directory=str(data["d"]),
+            last_file_path=str(data["k"]),
+            page_size=int(data["n"]),
+            sort=str(data.get("s", "file_path")),
+            last_sort_value=data.get("v"),
+            min_size=int(data["min"]) if "min" in data else None,
+            modified_since=datetime.fromisoformat(data["since"]) if "since" in data else None,
+        )
+    except (ValueError, KeyError, TypeError) as err:
+        raise InvalidPageTokenError("Invalid page_token.") from err
@@ -1,45 +1,155 @@
-from typing import Annotated
+import json
 import mimetypes
+from contextlib import asynccontextmanager
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+from email.utils import parsedate_to_datetime
+from functools import partial
+from tempfile import SpooledTemporaryFile
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote
+from uuid import uuid4
+
 import httpx
+from anyio.streams.memory import MemoryObjectSendStream
+from botocore.exceptions import ClientError
 from fastapi import (
     APIRouter,
     Depends,
+    Header,
     HTTPException,
+    Path,
     Request,
     Response,
     UploadFile,
     status,
 )
-from fastapi.responses import StreamingResponse
-from files_api import settings
-from files_api.generate_files import  (
-    get_text_chat_completion,
-    generate_image,
+from fastapi.responses import (
+    RedirectResponse,
+    StreamingResponse,
 )
 from loguru import logger
+from openai import (
+    AsyncOpenAI,
+    OpenAIError,
+)
 from pydantic_core import ValidationError
 
+from files_api import settings
+from files_api.archives import ARCHIVE_WRITERS
+from files_api.byte_ranges import (
+    iter_multipart_byteranges,
+    parse_if_range_header,
+    parse_range_header,
+)
+from files_api.dependencies import (
+    get_download_client,
+    get_generation_cache,
+    get_generation_single_flight,
+    get_openai_client,
+    get_page_token_secret,
+    get_s3_backend,
+)
+from files_api.generate_files import (
+    CHAT_COMPLETION_PARAMETERS,
+    IMAGE_GENERATION_PARAMETERS,
+    SYSTEM_PROMPT,
+    DownloadTooLargeError,
+    generate_image,
+    get_text_chat_completion,
+    stream_download,
+    stream_text_chat_completion,
+)
+from files_api.generation_cache import (
+    GenerationCache,
+    generation_cache_key,
+)
+from files_api.metadata_index import cursor_of
+from files_api.page_tokens import (
+    InvalidPageTokenError,
+    PageToken,
+    decode_page_token,
+    encode_page_token,
+)
 from files_api.route_handler import RouteHandler
-from files_api.s3.delete_objects import delete_s3_object
+from files_api.s3.backends import S3Backend
+from files_api.s3.directory_stats import SIZE_HISTOGRAM_BOUNDARIES
+from files_api.s3.multipart_uploads import is_missing_upload_error
 from files_api.s3.read_objects import (
-    fetch_s3_object,
-    fetch_s3_objects_metadata,
-    fetch_s3_objects_using_page_token,
-    object_exists_in_s3,
+    is_missing_object_error,
+    is_not_modified_error,
+    read_s3_object_body,
 )
-from files_api.s3.write_objects import upload_s3_object
 from files_api.schemas import (
+    DEFAULT_GET_FILES_DIRECTORY,
+    DEFAULT_GET_FILES_PAGE_SIZE,
+    MAX_BATCH_DELETE_FILE_PATHS,
+    MAX_BATCH_UPLOAD_FILES,
+    MAX_MULTIPART_UPLOAD_PARTS,
+    MAX_UPLOAD_PART_SIZE_BYTES,
+    BatchDeleteFilesRequest,
+    BatchDeleteFilesResponse,
+    BatchUploadFilesResponse,
+    CompleteUploadSessionRequest,
+    CopyFileRequest,
+    CopyFileResponse,
+    CreateUploadSessionRequest,
+    DirectoryMetadata,
+    DirectoryStatsResponse,
+    FileError,
     FileMetadata,
     FilePathValidator,
-    GeneratedFileType,
     GeneratedFilesQueryParams,
+    GeneratedFileType,
     GeneratedImagesQueryParams,
     GetFilesQueryParams,
     GetFilesResponse,
+    LargeFile,
+    MoveDirectoryRequest,
+    MoveDirectoryResponse,
+    PresignedUrl,
+    PresignFileRequest,
+    PresignFileResponse,
     PutFileResponse,
     PutGeneratedFileResponse,
+    SizeHistogramBucket,
+    StreamFilesQueryParams,
+    UploadedPart,
+    UploadSessionResponse,
 )
 from files_api.settings import Settings
+from files_api.single_flight import (
+    SingleFlight,
+    call_coalesced,
+)
+from files_api.streaming import ProducerStreamingResponse
+from files_api.upload_sessions import (
+    InvalidUploadSessionError,
+    UploadSession,
+    decode_upload_session_id,
+    encode_upload_session_id,
+)
+
+try:
+    from mypy_boto3_s3.type_defs import (
+        GetObjectOutputTypeDef,
+        ObjectTypeDef,
+        PartTypeDef,
+    )
+except ImportError:
+    pass
 
 # from pkg_resources import FileMetadata
 
@@ -58,7 +168,11 @@ FILES_ROUTER.route_class = RouteHandler
     },
 )
 async def upload_file(
-    request: Request, file_content: UploadFile, file_path: str, response: Response
+    request: Request,
+    file_content: UploadFile,
+    file_path: str,
+    response: Response,
+    s3_backend: S3Backend = Depends(get_s3_backend),
 ) -> PutFileResponse:
     """Upload a file."""
     try:
@@ -66,7 +180,7 @@ async def upload_file(
     except ValidationError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     settings: Settings = request.app.state.settings
-    object_already_exists = object_exists_in_s3(settings.s3_bucket_name, file_path)
+    object_already_exists = await s3_backend.object_exists_in_s3(settings.s3_bucket_name, file_path)
     logger.debug("object_already_exists: {exists}", exists=object_already_exists)
     if object_already_exists:
         message = f"Existing file updated at path: /{file_path}"
@@ -75,10 +189,10 @@ async def upload_file(
         message = f"New file uploaded at path: /{file_path}"
         response.status_code = status.HTTP_201_CREATED
 
-    file_bytes = await file_content.read()
     logger.debug("trying to upload file to s3: {file_path}", file_path=file_path)
-    upload_s3_object(
-        settings.s3_bucket_name, file_path, file_content=file_bytes, content_type=file_content.content_type
+    # stream the (spooled) request body to S3 instead of reading the whole file into memory
+    await s3_backend.upload_s3_fileobj(
+        settings.s3_bucket_name, file_path, fileobj=file_content.file, content_type=file_content.content_type
     )
 
     logger.info(message)
@@ -90,29 +204,245 @@ async def upload_file(
 async def list_files(
     request: Request,
     query_params: GetFilesQueryParams = Depends(),
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    page_token_secret: bytes = Depends(get_page_token_secret),
 ) -> GetFilesResponse:
-    """List files with pagination."""
+    """List files with pagination.
+
+    The `page_size` may change from one page to the next.
+
+    If the metadata index is enabled, files can also be filtered by size and modification date,
+    and sorted by size or modification date.
+    """
     settings: Settings = request.app.state.settings
     logger.debug("fetching files from s3: {dir}", dir=query_params.directory)
     logger.info(query_params.model_dump())
     # raise Exception('test')
 
     if query_params.page_token:
-        objects, next_token = fetch_s3_objects_using_page_token(
-            bucket_name=settings.s3_bucket_name,
-            continuation_token=query_params.page_token,
-            max_keys=query_params.page_size,
-        )
+        try:
+            position = decode_page_token(query_params.page_token, page_token_secret)
+        except InvalidPageTokenError as err:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+        position = position._replace(page_size=query_params.page_size or position.page_size)
     else:
-        objects, next_token = fetch_s3_objects_metadata(
-            bucket_name=settings.s3_bucket_name, prefix=query_params.directory, max_keys=query_params.page_size
+        position = PageToken(
+            directory=query_params.directory or DEFAULT_GET_FILES_DIRECTORY,
+            last_file_path="",
+            page_size=query_params.page_size or DEFAULT_GET_FILES_PAGE_SIZE,
+            sort=query_params.sort or "file_path",
+            min_size=query_params.min_size,
+            modified_since=query_params.modified_since,
         )
 
+    if s3_backend.metadata_index is not None:
+        return await _list_files_from_metadata_index(s3_backend, settings.s3_bucket_name, position, page_token_secret)
+    if position.sort != "file_path" or position.min_size is not None or position.modified_since is not None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="min_size, modified_since and sort require the metadata index, which is not enabled.",
+        )
+
+    objects, next_continuation_token = await s3_backend.fetch_s3_objects_metadata(
+        bucket_name=settings.s3_bucket_name,
+        prefix=position.directory,
+        max_keys=position.page_size,
+        start_after=position.last_file_path or None,
+    )
+
+    next_page_token = None
+    if next_continuation_token and objects:
+        next_page_token = encode_page_token(position._replace(last_file_path=objects[-1]["Key"]), page_token_secret)
     file_metadata = [
         FileMetadata(file_path=file.get("Key"), last_modified=file.get("LastModified"), size_bytes=file.get("Size"))
         for file in objects
     ]
-    return GetFilesResponse(files=file_metadata, next_page_token=next_token)
+    return GetFilesResponse(files=file_metadata, next_page_token=next_page_token)
+
+
+async def _list_files_from_metadata_index(
+    s3_backend: S3Backend, bucket_name: str, position: PageToken, page_token_secret: bytes
+) -> GetFilesResponse:
+    """List a page of files from the metadata index instead of S3."""
+    after = (position.last_sort_value, position.last_file_path) if position.last_file_path else None
+    indexed_files, has_more = await s3_backend.query_metadata_index(
+        bucket_name,
+        directory=position.directory,
+        page_size=position.page_size,
+        sort=position.sort,
+        min_size=position.min_size,
+        modified_since=position.modified_since,
+        after=after,
+    )
+    next_page_token = None
+    if has_more:
+        last_sort_value, last_file_path = cursor_of(indexed_files[-1], position.sort)
+        next_page_token = encode_page_token(
+            position._replace(last_file_path=last_file_path, last_sort_value=last_sort_value), page_token_secret
+        )
+    file_metadata = [
+        FileMetadata(file_path=file.file_path, last_modified=file.last_modified, size_bytes=file.size_bytes)
+        for file in indexed_files
+    ]
+    return GetFilesResponse(files=file_metadata, next_page_token=next_page_token)
+
+
+@FILES_ROUTER.get(
+    "/v1/files:stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "description": (
+                "Newline-delimited JSON: one `FileMetadata` object per line, and with a `delimiter`, "
+                "one `DirectoryMetadata` object per subdirectory."
+            ),
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        },
+    },
+)
+async def stream_files(
+    request: Request,
+    query_params: StreamFilesQueryParams = Depends(),
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> StreamingResponse:
+    """List every file in a directory in a single response.
+
+    The listing is streamed as newline-delimited JSON while S3 returns it page by page,
+    so a directory of any size is listed with one request and constant server memory.
+    """
+    settings: Settings = request.app.state.settings
+    logger.debug("streaming files from s3: {dir}", dir=query_params.directory)
+
+    async def iter_ndjson_lines():
+        if query_params.parallel:
+            pages = (
+                (objects, [])
+                async for objects in s3_backend.iter_s3_objects_sharded(
+                    settings.s3_bucket_name,
+                    prefix=query_params.directory,
+                    max_concurrency=settings.s3_listing_max_concurrency,
+                )
+            )
+        else:
+            pages = s3_backend.iter_s3_objects_pages(
+                settings.s3_bucket_name, prefix=query_params.directory, delimiter=query_params.delimiter
+            )
+        async for objects, common_prefixes in pages:
+            lines = [DirectoryMetadata(directory=common_prefix).model_dump_json() for common_prefix in common_prefixes]
+            lines.extend(
+                FileMetadata(
+                    file_path=file.get("Key"), last_modified=file.get("LastModified"), size_bytes=file.get("Size")
+                ).model_dump_json()
+                for file in objects
+            )
+            if lines:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+
+    return StreamingResponse(content=iter_ndjson_lines(), media_type="application/x-ndjson")
+
+
+@FILES_ROUTER.get("/v1/directories/{directory:path}/stats")
+async def get_directory_stats(
+    request: Request,
+    directory: str,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> DirectoryStatsResponse:
+    """Get the number, total size, size distribution and largest files of the files in a directory.
+
+    Files in subdirectories are included. The statistics are computed once and then kept up to date
+    as files are uploaded and deleted through this API.
+    """
+    if directory and not directory.endswith("/"):
+        directory += "/"
+    if directory:
+        try:
+            FilePathValidator(file_path=directory)
+        except ValidationError as err:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    settings: Settings = request.app.state.settings
+    stats = await s3_backend.fetch_directory_stats(
+        settings.s3_bucket_name, directory, max_concurrency=settings.s3_listing_max_concurrency
+    )
+    bucket_bounds = [0, *SIZE_HISTOGRAM_BOUNDARIES, None]
+    return DirectoryStatsResponse(
+        directory=stats.directory,
+        file_count=stats.file_count,
+        total_bytes=stats.total_bytes,
+        largest_files=[LargeFile(file_path=file_path, size_bytes=size) for size, file_path in stats.largest_files],
+        size_histogram=[
+            SizeHistogramBucket(min_size_bytes=min_size, max_size_bytes=max_size, file_count=file_count)
+            for min_size, max_size, file_count in zip(bucket_bounds, bucket_bounds[1:], stats.size_histogram)
+        ],
+    )
+
+
+@FILES_ROUTER.get(
+    "/v1/archives/{archive_path:path}",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "The archive, streamed as it is written.",
+            "content": {"application/zip": {}, "application/gzip": {}},
+        },
+        status.HTTP_404_NOT_FOUND: {
+            "description": "The directory has no files, or the archive format is neither `.zip` nor `.tar.gz`.",
+        },
+    },
+)
+async def download_archive(
+    request: Request,
+    archive_path: str,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> StreamingResponse:
+    """Download every file in a directory, including its subdirectories, as one archive.
+
+    `GET /v1/archives/path/to/dir.zip` returns a zip archive of the files under `path/to/dir/`, and
+    `GET /v1/archives/path/to/dir.tar.gz` a tar.gz archive; paths inside the archive are relative to
+    the directory. The archive is written while the files are read from S3, a few files ahead, so
+    memory stays bounded however large the directory is.
+    """
+    for extension, writer_class in ARCHIVE_WRITERS.items():
+        if archive_path.endswith(extension) and len(archive_path) > len(extension):
+            directory = archive_path[: -len(extension)] + "/"
+            break
+    else:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Archives are `.zip` or `.tar.gz` files.")
+    try:
+        FilePathValidator(file_path=directory)
+    except ValidationError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    settings: Settings = request.app.state.settings
+    # the status code is sent before the first file, so find out now whether there is one
+    objects, _ = await s3_backend.fetch_s3_objects_metadata(settings.s3_bucket_name, prefix=directory, max_keys=1)
+    if not objects:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Directory not found.")
+
+    writer = writer_class()
+
+    async def iter_archive(objects: AsyncIterable[Tuple["ObjectTypeDef", "GetObjectOutputTypeDef"]]):
+        async for obj, response in objects:
+            yield writer.start_file(obj["Key"][len(directory) :], response["ContentLength"], response["LastModified"])
+            async for chunk in s3_backend.stream_s3_object_body(response["Body"]):
+                # compressing a chunk takes a while, and zlib releases the GIL, so do it like a boto3 call
+                data = await s3_backend.run_blocking(partial(writer.write, chunk))
+                if data:
+                    yield data
+            yield writer.end_file()
+        yield writer.close()
+
+    archive_name = directory.rstrip("/").rsplit("/", 1)[-1] + extension
+    logger.info("Streaming archive of directory='{dir}'", dir=directory)
+    return ProducerStreamingResponse(
+        produce=partial(
+            s3_backend.send_s3_objects_prefetched,
+            settings.s3_bucket_name,
+            directory,
+            prefetch=settings.archive_prefetch_count,
+        ),
+        consume=iter_archive,
+        media_type=writer.media_type,
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(archive_name)}"},
+    )
 
 
 @FILES_ROUTER.head(
@@ -138,13 +468,37 @@ async def list_files(
                     "example": "Thu, 01 Jan 2022 00:00:00 GMT",
                     "schema": {"type": "string", "format": "date-time"},
                 },
+                "Accept-Ranges": {
+                    "description": "Always `bytes`: the file can be downloaded in parts with a `Range` header.",
+                    "example": "bytes",
+                    "schema": {"type": "string"},
+                },
+                "ETag": {
+                    "description": "The entity tag of the current version of the file.",
+                    "example": '"d41d8cd98f00b204e9800998ecf8427e"',
+                    "schema": {"type": "string"},
+                },
             }
         },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "The file has not changed since the version in `If-None-Match` or `If-Modified-Since`.",
+        },
     },
 )
-async def get_file_metadata(request: Request, file_path: str, response: Response) -> Response:
+async def get_file_metadata(
+    request: Request,
+    file_path: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None, description="Respond with 304 if the file still has this ETag."),
+    if_modified_since: Optional[str] = Header(
+        None, description="Respond with 304 if the file has not been modified since this date."
+    ),
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> Response:
     """Retrieve file metadata.
 
+    Supports conditional requests with `If-None-Match` and `If-Modified-Since`.
+
     Note: by convention, HEAD requests MUST NOT return a body in the response.
     """
     try:
@@ -152,18 +506,30 @@ async def get_file_metadata(request: Request, file_path: str, response: Response
     except ValidationError as err:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     settings: Settings = request.app.state.settings
-    logger.debug("Checking if object exists in bucket='{bucket}' with key='{key}'", 
-                 bucket=settings.s3_bucket_name, key=file_path)
-    
-    object_exists = object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path)
-    if not object_exists:
-        logger.info("File not found: key='{key}' in bucket='{bucket}'", 
-                    key=file_path, bucket=settings.s3_bucket_name)
+    logger.debug(
+        "Fetching metadata of object in bucket='{bucket}' with key='{key}'",
+        bucket=settings.s3_bucket_name,
+        key=file_path,
+    )
+
+    try:
+        head_object_response = await s3_backend.fetch_s3_object_metadata(
+            bucket_name=settings.s3_bucket_name,
+            object_key=file_path,
+            **_conditional_read_params(if_none_match, if_modified_since),
+        )
+    except ClientError as err:
+        if is_not_modified_error(err):
+            return _not_modified_response(err)
+        if not is_missing_object_error(err):
+            raise
+        logger.info("File not found: key='{key}' in bucket='{bucket}'", key=file_path, bucket=settings.s3_bucket_name)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
-    get_object_response = fetch_s3_object(bucket_name=settings.s3_bucket_name, object_key=file_path)
-    response.headers["Content-Type"] = get_object_response["ContentType"]
-    response.headers["Content-Length"] = str(get_object_response["ContentLength"])
-    response.headers["Last-Modified"] = get_object_response["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT")
+    response.headers["Content-Type"] = head_object_response["ContentType"]
+    response.headers["Content-Length"] = str(head_object_response["ContentLength"])
+    response.headers["Last-Modified"] = head_object_response["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT")
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["ETag"] = head_object_response["ETag"]
     response.status_code = status.HTTP_200_OK
 
     logger.info("File metadata retrieval succeeded for key='{key}'", key=file_path)
@@ -185,46 +551,254 @@ async def get_file_metadata(request: Request, file_path: str, response: Response
                 },
             },
         },
+        status.HTTP_206_PARTIAL_CONTENT: {
+            "description": (
+                "The requested byte range of the file, described by the `Content-Range` header. "
+                "Several ranges are returned as a `multipart/byteranges` body."
+            ),
+            "content": {
+                "application/octet-stream": {
+                    "schema": {"type": "string", "format": "binary"},
+                },
+            },
+        },
+        status.HTTP_304_NOT_MODIFIED: {
+            "description": "The file has not changed since the version in `If-None-Match` or `If-Modified-Since`.",
+        },
+        status.HTTP_307_TEMPORARY_REDIRECT: {
+            "description": (
+                "The file is large, and is to be downloaded straight from S3 from the presigned URL in the "
+                "`Location` header. Only if the API is configured to redirect large files."
+            ),
+        },
+        status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE: {
+            "description": "None of the requested byte ranges overlap the file.",
+        },
     },
 )
 async def get_file(
     request: Request,
     file_path: str,
-) -> StreamingResponse:
-    """Retrieve a file."""
+    range_header: Optional[str] = Header(
+        None, alias="Range", description="Byte range(s) to fetch instead of the whole file, e.g. `bytes=0-1023`."
+    ),
+    if_range: Optional[str] = Header(
+        None, description="Only honor `Range` if the file still has this ETag or last-modified date."
+    ),
+    if_none_match: Optional[str] = Header(None, description="Respond with 304 if the file still has this ETag."),
+    if_modified_since: Optional[str] = Header(
+        None, description="Respond with 304 if the file has not been modified since this date."
+    ),
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> Response:
+    """Retrieve a file.
+
+    Supports HTTP range requests: a single byte range is returned as `206 Partial Content`, several
+    byte ranges as a `multipart/byteranges` body.
+
+    Supports conditional requests: if the file still matches `If-None-Match` (or was not modified
+    since `If-Modified-Since`), a `304 Not Modified` is returned without the file content.
+    """
     logger.info("GET request received for file_path='{file_path}'", file_path=file_path)
 
     try:
         FilePathValidator(file_path=file_path)
     except ValidationError as err:
-        logger.warning("Validation failed for key='{key}': {error}", 
-                       key=file_path, 
-                       error=err
-                    )
+        logger.warning("Validation failed for key='{key}': {error}", key=file_path, error=err)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     settings: Settings = request.app.state.settings
-    logger.debug("Checking if object exists in bucket='{bucket}' with key='{key}'", 
-                 bucket=settings.s3_bucket_name, key=file_path)
-    
-    object_exists = object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path)
-    if not object_exists:
-        logger.info("File not found: key='{key}' in bucket='{bucket}'", 
-                    key=file_path, bucket=settings.s3_bucket_name)
+
+    if settings.presigned_redirect_threshold_bytes is not None:
+        redirect = await _presigned_redirect(s3_backend, settings, file_path)
+        if redirect is not None:
+            return redirect
+
+    byte_ranges = parse_range_header(range_header)
+    if_range_etag, if_range_date = None, None
+    if byte_ranges and if_range:
+        if_range_etag, if_range_date = parse_if_range_header(if_range)
+        if not (if_range_etag or if_range_date):
+            byte_ranges = None
+
+    conditions = _conditional_read_params(if_none_match, if_modified_since)
+    try:
+        if byte_ranges:
+            return await _get_file_byte_ranges(
+                s3_backend, settings.s3_bucket_name, file_path, byte_ranges, if_range_etag, if_range_date, conditions
+            )
+
+        logger.debug(
+            "Fetching object key='{key}' from bucket='{bucket}'", key=file_path, bucket=settings.s3_bucket_name
+        )
+        get_object_response = await _fetch_s3_object_or_404(
+            s3_backend, settings.s3_bucket_name, file_path, **conditions
+        )
+    except ClientError as err:
+        if not is_not_modified_error(err):
+            raise
+        logger.info("File not modified: key='{key}'", key=file_path)
+        return _not_modified_response(err)
+    logger.info("File retrieval succeeded for key='{key}'", key=file_path)
+    return _file_response(s3_backend, get_object_response)
+
+
+async def _presigned_redirect(
+    s3_backend: S3Backend, settings: Settings, object_key: str
+) -> Optional[RedirectResponse]:
+    """
+    Redirect the download of a file of at least `presigned_redirect_threshold_bytes` to a presigned URL.
+
+    The client repeats the request, `Range` and conditional headers included, against S3.
+    """
+    bucket_name = settings.s3_bucket_name
+    try:
+        metadata = await s3_backend.fetch_s3_object_metadata(bucket_name, object_key)
+    except ClientError as err:
+        if not is_missing_object_error(err):
+            raise
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+    if metadata["ContentLength"] < settings.presigned_redirect_threshold_bytes:
+        return None
+    url = await s3_backend.create_presigned_download_url(
+        bucket_name, object_key, settings.presigned_url_expiry_seconds
+    )
+    logger.info("Redirecting download of key='{key}' to a presigned URL", key=object_key)
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+
+async def _fetch_s3_object_or_404(
+    s3_backend: S3Backend, bucket_name: str, object_key: str, **kwargs
+) -> "GetObjectOutputTypeDef":
+    """Fetch an object from S3, turning a missing object into a 404 response."""
+    try:
+        return await s3_backend.fetch_s3_object(bucket_name=bucket_name, object_key=object_key, **kwargs)
+    except ClientError as err:
+        if not is_missing_object_error(err):
+            raise
+        logger.info("File not found: key='{key}' in bucket='{bucket}'", key=object_key, bucket=bucket_name)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
-    
-    logger.debug("Fetching object key='{key}' from bucket='{bucket}'", 
-                 key=file_path, bucket=settings.s3_bucket_name)
-    get_object_response = fetch_s3_object(bucket_name=settings.s3_bucket_name, object_key=file_path)
+
+
+def _file_response(
+    s3_backend: S3Backend, get_object_response: "GetObjectOutputTypeDef", status_code: int = status.HTTP_200_OK
+) -> StreamingResponse:
+    """Stream the content of a `get_object` response (or of one byte range of it) to the client."""
     headers = {
         "Content-Length": str(get_object_response["ContentLength"]),
         "Content-Type": get_object_response["ContentType"],
+        "Accept-Ranges": "bytes",
+        "ETag": get_object_response["ETag"],
+        "Last-Modified": get_object_response["LastModified"].strftime("%a, %d %b %Y %H:%M:%S GMT"),
     }
-    logger.info("File retrieval succeeded for key='{key}'", key=file_path)
+    if status_code == status.HTTP_206_PARTIAL_CONTENT:
+        headers["Content-Range"] = get_object_response["ContentRange"]
     return StreamingResponse(
-        content=get_object_response["Body"], media_type=get_object_response["ContentType"], headers=headers
+        content=s3_backend.stream_s3_object_body(get_object_response["Body"]),
+        status_code=status_code,
+        media_type=get_object_response["ContentType"],
+        headers=headers,
     )
 
 
+async def _get_file_byte_ranges(
+    s3_backend: S3Backend,
+    bucket_name: str,
+    object_key: str,
+    byte_ranges: List[str],
+    if_range_etag: Optional[str],
+    if_range_date: Optional[datetime],
+    conditions: Dict[str, Any],
+) -> StreamingResponse:
+    """
+    Respond to a range request with one `get_object(Range=...)` call per byte range.
+
+    Ranges that lie entirely outside the file are skipped; if no range overlaps the file, the
+    response is a 416. If the `If-Range` condition fails, the whole file is returned instead: an
+    ETag must match the file's, and a date must be exactly the file's `Last-Modified` (RFC 9110).
+    """
+    object_size = None
+    for range_index, byte_range in enumerate(byte_ranges):
+        try:
+            get_object_response = await _fetch_s3_object_or_404(
+                s3_backend, bucket_name, object_key, byte_range=byte_range, if_match=if_range_etag, **conditions
+            )
+            break
+        except ClientError as err:
+            error = err.response["Error"]
+            if error["Code"] == "PreconditionFailed":
+                return await _get_whole_file_after_failed_if_range(s3_backend, bucket_name, object_key, conditions)
+            if error["Code"] != "InvalidRange":
+                raise
+            object_size = error.get("ActualObjectSize")
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable.",
+            headers={"Content-Range": f"bytes */{object_size}"} if object_size else None,
+        )
+
+    if if_range_date is not None and get_object_response["LastModified"] != if_range_date:
+        get_object_response["Body"].close()
+        return await _get_whole_file_after_failed_if_range(s3_backend, bucket_name, object_key, conditions)
+
+    remaining_byte_ranges = byte_ranges[range_index + 1 :]
+    if not remaining_byte_ranges:
+        return _file_response(s3_backend, get_object_response, status_code=status.HTTP_206_PARTIAL_CONTENT)
+
+    async def iter_parts():
+        yield get_object_response["ContentRange"], s3_backend.stream_s3_object_body(get_object_response["Body"])
+        for byte_range in remaining_byte_ranges:
+            try:
+                # pin the remaining ranges to the version of the file the first range was read from
+                part = await s3_backend.fetch_s3_object(
+                    bucket_name, object_key, byte_range=byte_range, if_match=get_object_response["ETag"]
+                )
+            except ClientError as err:
+                if err.response["Error"]["Code"] == "InvalidRange":
+                    continue
+                raise
+            yield part["ContentRange"], s3_backend.stream_s3_object_body(part["Body"])
+
+    boundary = uuid4().hex
+    # the parts are fetched lazily while the body is streamed
+    return StreamingResponse(
+        content=iter_multipart_byteranges(iter_parts(), get_object_response["ContentType"], boundary),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers={"Accept-Ranges": "bytes", "ETag": get_object_response["ETag"]},
+    )
+
+
+async def _get_whole_file_after_failed_if_range(
+    s3_backend: S3Backend, bucket_name: str, object_key: str, conditions: Dict[str, Any]
+) -> StreamingResponse:
+    logger.info("If-Range condition failed for key='{key}', returning the whole file", key=object_key)
+    return _file_response(s3_backend, await _fetch_s3_object_or_404(s3_backend, bucket_name, object_key, **conditions))
+
+
+def _conditional_read_params(if_none_match: Optional[str], if_modified_since: Optional[str]) -> Dict[str, Any]:
+    """
+    Translate the conditional request headers of a GET or HEAD into `fetch_s3_object*` arguments.
+
+    Per RFC 9110, `If-Modified-Since` is ignored when `If-None-Match` is present or is not a valid date.
+    """
+    if if_none_match:
+        return {"if_none_match": if_none_match}
+    if if_modified_since:
+        try:
+            return {"if_modified_since": parsedate_to_datetime(if_modified_since)}
+        except (TypeError, ValueError):
+            return {}
+    return {}
+
+
+def _not_modified_response(err: ClientError) -> Response:
+    """Build a 304 response from the error S3 raised for an unchanged object, keeping its validators."""
+    s3_headers = err.response["ResponseMetadata"].get("HTTPHeaders", {})
+    headers = {name: s3_headers[name.lower()] for name in ("ETag", "Last-Modified") if name.lower() in s3_headers}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
 @FILES_ROUTER.delete(
     "/v1/files/{file_path:path}",
     responses={
@@ -234,38 +808,543 @@ async def get_file(
         status.HTTP_204_NO_CONTENT: {
             "description": "File deleted successfully.",
         },
+        status.HTTP_412_PRECONDITION_FAILED: {
+            "description": "The `If-Match` ETag does not match the current version of the file.",
+        },
     },
 )
-async def delete_file(request: Request, file_path: str, response: Response) -> Response:
+async def delete_file(
+    request: Request,
+    file_path: str,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="Only delete the file if its ETag matches."),
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> Response:
     """Delete a file.
 
+    With an `If-Match` header the file is deleted with a single conditional S3 call.
+
     NOTE: DELETE requests MUST NOT return a body in the response."""
     logger.info("DELETE /v1/files/{key} - Request received.", key=file_path)
     try:
         FilePathValidator(file_path=file_path)
     except ValidationError as err:
-        logger.warning("Validation failed for key='{file_path}': {err}", 
-                       file_path=file_path,
-                       err=err
-                    )
+        logger.warning("Validation failed for key='{file_path}': {err}", file_path=file_path, err=err)
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
     settings: Settings = request.app.state.settings
-    logger.debug("Checking object existence in bucket='{bucket}' with key='{key}'", 
-                 bucket=settings.s3_bucket_name, key=file_path)
-    
-    object_exists = object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path)
-    if not object_exists:
-        logger.info("File not found: key='{key}' in bucket='{bucket}'", 
-                    key=file_path, bucket=settings.s3_bucket_name)
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
-    
-    logger.debug("Deleting object key='{key}' from bucket='{bucket}'", 
-                 key=file_path, bucket=settings.s3_bucket_name)
-    delete_s3_object(bucket_name=settings.s3_bucket_name, object_key=file_path)
+    if settings.delete_checks_existence and not if_match:
+        logger.debug(
+            "Checking object existence in bucket='{bucket}' with key='{key}'",
+            bucket=settings.s3_bucket_name,
+            key=file_path,
+        )
+        object_exists = await s3_backend.object_exists_in_s3(bucket_name=settings.s3_bucket_name, object_key=file_path)
+        if not object_exists:
+            logger.info(
+                "File not found: key='{key}' in bucket='{bucket}'", key=file_path, bucket=settings.s3_bucket_name
+            )
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+
+    logger.debug("Deleting object key='{key}' from bucket='{bucket}'", key=file_path, bucket=settings.s3_bucket_name)
+    try:
+        await s3_backend.delete_s3_object(bucket_name=settings.s3_bucket_name, object_key=file_path, if_match=if_match)
+    except ClientError as err:
+        if is_missing_object_error(err):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+        if err.response["Error"]["Code"] == "PreconditionFailed":
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="ETag does not match.")
+        raise
     response.status_code = status.HTTP_204_NO_CONTENT
     logger.info("File deleted successfully: key='{key}'", key=file_path)
     return response
 
+
+@FILES_ROUTER.post("/v1/files/{file_path:path}:presign")
+async def presign_file(
+    request: Request,
+    file_path: str,
+    presign_request: PresignFileRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> PresignFileResponse:
+    """Create presigned URLs to download or upload a file straight from or to S3.
+
+    The file content then never passes through the API, so there is no limit on its size
+    other than S3's, and transfers are not limited by the API's bandwidth.
+
+    For files over 5 GiB, or to upload parts in parallel, use `UPLOAD_PART`: `PUT` each part
+    (at least 5 MiB, except the last one) to its URL, then `POST` the list of parts to `complete_url`.
+    """
+    try:
+        FilePathValidator(file_path=file_path)
+    except ValidationError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    settings: Settings = request.app.state.settings
+    expires_in_seconds = presign_request.expires_in_seconds or settings.presigned_url_expiry_seconds
+    if expires_in_seconds > settings.presigned_url_max_expiry_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"expires_in_seconds must be at most {settings.presigned_url_max_expiry_seconds}.",
+        )
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_in_seconds)
+
+    if presign_request.method == "GET":
+        url = await s3_backend.create_presigned_download_url(settings.s3_bucket_name, file_path, expires_in_seconds)
+        return PresignFileResponse(http_method="GET", urls=[PresignedUrl(url=url)], expires_at=expires_at)
+    if presign_request.method == "PUT":
+        url = await s3_backend.create_presigned_upload_url(
+            settings.s3_bucket_name, file_path, expires_in_seconds, content_type=presign_request.content_type
+        )
+        return PresignFileResponse(http_method="PUT", urls=[PresignedUrl(url=url)], expires_at=expires_at)
+
+    upload_id, part_urls, complete_url, abort_url = await s3_backend.create_presigned_multipart_upload(
+        settings.s3_bucket_name,
+        file_path,
+        presign_request.part_numbers,
+        expires_in_seconds,
+        upload_id=presign_request.upload_id,
+        content_type=presign_request.content_type,
+    )
+    return PresignFileResponse(
+        http_method="PUT",
+        urls=[
+            PresignedUrl(url=url, part_number=part_number)
+            for part_number, url in zip(presign_request.part_numbers, part_urls)
+        ],
+        expires_at=expires_at,
+        upload_id=upload_id,
+        complete_url=complete_url,
+        abort_url=abort_url,
+    )
+
+
+@FILES_ROUTER.post(
+    "/v1/files/{file_path:path}:copy",
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "File not found for the given `file_path`."},
+    },
+)
+async def copy_file(
+    request: Request,
+    file_path: str,
+    copy_request: CopyFileRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> CopyFileResponse:
+    """Copy a file to another path.
+
+    The file is copied inside S3, so its content never passes through the API, whatever its size.
+    """
+    _validate_copy(file_path, copy_request.destination_path)
+    settings: Settings = request.app.state.settings
+    try:
+        await s3_backend.copy_s3_object(settings.s3_bucket_name, file_path, copy_request.destination_path)
+    except ClientError as err:
+        if is_missing_object_error(err):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+        raise
+    logger.info("Copied key='{key}' to '{destination}'", key=file_path, destination=copy_request.destination_path)
+    return CopyFileResponse(
+        source_path=file_path,
+        destination_path=copy_request.destination_path,
+        message=f"File copied from /{file_path} to /{copy_request.destination_path}",
+    )
+
+
+@FILES_ROUTER.post(
+    "/v1/files/{file_path:path}:move",
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "File not found for the given `file_path`."},
+        status.HTTP_412_PRECONDITION_FAILED: {
+            "description": (
+                "The file changed while it was being moved. The destination holds the version that was "
+                "copied, and the source was kept."
+            ),
+        },
+    },
+)
+async def move_file(
+    request: Request,
+    file_path: str,
+    copy_request: CopyFileRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> CopyFileResponse:
+    """Move (rename) a file.
+
+    The file is copied inside S3 and then deleted, so its content never passes through the API.
+    """
+    _validate_copy(file_path, copy_request.destination_path)
+    settings: Settings = request.app.state.settings
+    try:
+        await s3_backend.move_s3_object(settings.s3_bucket_name, file_path, copy_request.destination_path)
+    except ClientError as err:
+        if is_missing_object_error(err):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found.")
+        if err.response["Error"]["Code"] == "PreconditionFailed":
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED, detail="File changed while it was being moved."
+            )
+        raise
+    logger.info("Moved key='{key}' to '{destination}'", key=file_path, destination=copy_request.destination_path)
+    return CopyFileResponse(
+        source_path=file_path,
+        destination_path=copy_request.destination_path,
+        message=f"File moved from /{file_path} to /{copy_request.destination_path}",
+    )
+
+
+def _validate_copy(file_path: str, destination_path: str) -> None:
+    try:
+        FilePathValidator(file_path=file_path)
+    except ValidationError as err:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    if destination_path == file_path:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="destination_path must differ from file_path."
+        )
+
+
+@FILES_ROUTER.post("/v1/directories/{directory:path}:move")
+async def move_directory(
+    request: Request,
+    directory: str,
+    move_request: MoveDirectoryRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> MoveDirectoryResponse:
+    """Move every file in a directory, including its subdirectories, to another directory.
+
+    Files are copied inside S3 several at a time, and the copied files are deleted with one S3 call
+    per 1000 files. The response lists the outcome for every file. A file that is changed during the
+    move is kept and reported with the code "PreconditionFailed".
+    """
+    source_directory = directory if directory.endswith("/") else directory + "/"
+    destination_directory = move_request.destination_directory
+    if not destination_directory.endswith("/"):
+        destination_directory += "/"
+    for path in (source_directory, destination_directory):
+        try:
+            FilePathValidator(file_path=path)
+        except ValidationError as err:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(err))
+    if destination_directory.startswith(source_directory):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="destination_directory must not be the directory itself or one of its subdirectories.",
+        )
+    settings: Settings = request.app.state.settings
+    moved, errors = await s3_backend.move_s3_prefix(
+        settings.s3_bucket_name,
+        source_directory,
+        destination_directory,
+        max_concurrency=settings.s3_copy_max_concurrency,
+    )
+    logger.info(
+        "Directory move finished: {n_moved} moved, {n_failed} failed", n_moved=len(moved), n_failed=len(errors)
+    )
+    return MoveDirectoryResponse(
+        moved=moved,
+        errors=[
+            FileError(file_path=error["Key"], code=error.get("Code", ""), message=error.get("Message", ""))
+            for error in errors
+        ],
+    )
+
+
+@FILES_ROUTER.post("/v1/files:batchDelete")
+async def batch_delete_files(
+    request: Request,
+    batch_delete_request: BatchDeleteFilesRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> BatchDeleteFilesResponse:
+    """Delete many files at once, either by path or every file under a directory.
+
+    Files are deleted with one S3 call per 1000 files, and those calls run concurrently.
+    The response lists the outcome for every file. Like a list of paths, a directory may hold
+    at most 10,000 files; nothing is deleted from a larger one.
+    """
+    settings: Settings = request.app.state.settings
+    if batch_delete_request.directory is not None:
+        logger.debug("Listing files to delete under directory='{dir}'", dir=batch_delete_request.directory)
+        file_paths: List[str] = []
+        async for objects, _ in s3_backend.iter_s3_objects_pages(
+            settings.s3_bucket_name, batch_delete_request.directory
+        ):
+            file_paths.extend(obj["Key"] for obj in objects)
+            if len(file_paths) > MAX_BATCH_DELETE_FILE_PATHS:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"The directory holds more than {MAX_BATCH_DELETE_FILE_PATHS} files to delete at once.",
+                )
+    else:
+        # deleting a key twice in one `delete_objects` call is allowed, but would be reported twice
+        file_paths = list(dict.fromkeys(batch_delete_request.file_paths))
+
+    errors = await s3_backend.delete_s3_objects(settings.s3_bucket_name, file_paths)
+    failed_file_paths = {error["Key"] for error in errors}
+    logger.info(
+        "Batch delete finished: {n_deleted} deleted, {n_failed} failed",
+        n_deleted=len(file_paths) - len(failed_file_paths),
+        n_failed=len(failed_file_paths),
+    )
+    return BatchDeleteFilesResponse(
+        deleted=[file_path for file_path in file_paths if file_path not in failed_file_paths],
+        errors=[
+            FileError(file_path=error["Key"], code=error.get("Code", ""), message=error.get("Message", ""))
+            for error in errors
+        ],
+    )
+
+
+@FILES_ROUTER.post("/v1/files:batchUpload")
+async def batch_upload_files(
+    request: Request,
+    files: List[UploadFile],
+    s3_backend: S3Backend = Depends(get_s3_backend),
+) -> BatchUploadFilesResponse:
+    """Upload many files at once, e.g. to ingest a large number of small files.
+
+    Send each file as a `files` part of a multipart form, with its path as the part's filename.
+    Up to 1000 files are accepted per request. Files are uploaded to S3 several at a time, and
+    existing files are overwritten. The response lists the outcome for every file.
+    """
+    settings: Settings = request.app.state.settings
+    if len(files) > MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {MAX_BATCH_UPLOAD_FILES} files can be uploaded at once.",
+        )
+    errors: List[FileError] = []
+    uploads: Dict[str, UploadFile] = {}
+    for file in files:
+        file_path = file.filename or ""
+        try:
+            FilePathValidator(file_path=file_path)
+        except ValidationError as err:
+            errors.append(FileError(file_path=file_path, code="InvalidFilePath", message=str(err)))
+            continue
+        if file_path in uploads:
+            errors.append(
+                FileError(file_path=file_path, code="DuplicateFilePath", message="The path was sent more than once.")
+            )
+            continue
+        uploads[file_path] = file
+
+    upload_errors = await s3_backend.upload_s3_fileobjs(
+        settings.s3_bucket_name,
+        [(file_path, file.file, file.content_type) for file_path, file in uploads.items()],
+        max_concurrency=settings.s3_batch_upload_max_concurrency,
+    )
+    failed_file_paths = {error["Key"] for error in upload_errors}
+    logger.info(
+        "Batch upload finished: {n_uploaded} uploaded, {n_failed} failed",
+        n_uploaded=len(uploads) - len(failed_file_paths),
+        n_failed=len(errors) + len(failed_file_paths),
+    )
+    return BatchUploadFilesResponse(
+        uploaded=[file_path for file_path in uploads if file_path not in failed_file_paths],
+        errors=errors
+        + [
+            FileError(file_path=error["Key"], code=error.get("Code", ""), message=error.get("Message", ""))
+            for error in upload_errors
+        ],
+    )
+
+
+@FILES_ROUTER.post("/v1/uploads", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    request: Request,
+    create_request: CreateUploadSessionRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    secret: bytes = Depends(get_page_token_secret),
+) -> UploadSessionResponse:
+    """Start a resumable upload of a file.
+
+    Upload the file in numbered parts with `PUT /v1/uploads/{upload_id}/parts/{part_number}`;
+    parts may be uploaded in parallel and in any order, and a failed part is simply uploaded again.
+    Every part but the last must be at least 5 MiB. `GET /v1/uploads/{upload_id}` lists the parts
+    that have arrived, so an interrupted upload can be resumed with the missing ones. Finally,
+    `POST /v1/uploads/{upload_id}:complete` joins the parts into the file.
+
+    Sessions that are neither completed nor aborted are aborted after `upload_session_max_age_seconds`.
+    """
+    settings: Settings = request.app.state.settings
+    s3_upload_id = await s3_backend.create_multipart_upload(
+        settings.s3_bucket_name, create_request.file_path, create_request.content_type
+    )
+    upload_id = encode_upload_session_id(UploadSession(create_request.file_path, s3_upload_id), secret)
+    logger.info("Started upload session for key='{key}'", key=create_request.file_path)
+    return UploadSessionResponse(upload_id=upload_id, file_path=create_request.file_path, parts=[])
+
+
+@FILES_ROUTER.get(
+    "/v1/uploads/{upload_id}",
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Upload session not found, completed or aborted."}},
+)
+async def get_upload_session(
+    request: Request,
+    upload_id: str,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    secret: bytes = Depends(get_page_token_secret),
+) -> UploadSessionResponse:
+    """List the parts of an upload session that have been uploaded so far."""
+    settings: Settings = request.app.state.settings
+    upload_session = _decode_upload_session_or_404(upload_id, secret)
+    async with _upload_session_errors():
+        parts = await s3_backend.list_uploaded_parts(
+            settings.s3_bucket_name, upload_session.file_path, upload_session.s3_upload_id
+        )
+    return UploadSessionResponse(
+        upload_id=upload_id,
+        file_path=upload_session.file_path,
+        parts=[
+            UploadedPart(part_number=part["PartNumber"], size_bytes=part["Size"], etag=part["ETag"]) for part in parts
+        ],
+    )
+
+
+@FILES_ROUTER.put(
+    "/v1/uploads/{upload_id}/parts/{part_number}",
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "Upload session not found, completed or aborted."},
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE: {"description": "The part is larger than 5 GiB."},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def upload_part(
+    request: Request,
+    upload_id: str,
+    part_number: Annotated[int, Path(ge=1, le=MAX_MULTIPART_UPLOAD_PARTS)],
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    secret: bytes = Depends(get_page_token_secret),
+) -> UploadedPart:
+    """Upload one part of an upload session as the raw request body.
+
+    Uploading a part again replaces it.
+    """
+    settings: Settings = request.app.state.settings
+    upload_session = _decode_upload_session_or_404(upload_id, secret)
+    # spool the body so that S3 gets the part's length up front, without holding a large part in memory
+    with SpooledTemporaryFile(max_size=settings.s3_multipart_part_size_bytes) as part:
+        size_bytes = 0
+        async for chunk in request.stream():
+            size_bytes += len(chunk)
+            if size_bytes > MAX_UPLOAD_PART_SIZE_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Parts must be at most 5 GiB."
+                )
+            part.write(chunk)
+        part.seek(0)
+        async with _upload_session_errors():
+            etag = await s3_backend.upload_part(
+                settings.s3_bucket_name, upload_session.file_path, upload_session.s3_upload_id, part_number, part
+            )
+    return UploadedPart(part_number=part_number, size_bytes=size_bytes, etag=etag)
+
+
+@FILES_ROUTER.post(
+    "/v1/uploads/{upload_id}:complete",
+    responses={
+        status.HTTP_404_NOT_FOUND: {"description": "Upload session not found, completed or aborted."},
+        status.HTTP_422_UNPROCESSABLE_ENTITY: {
+            "description": (
+                "The uploaded parts are not the parts of the request, "
+                "or a part other than the last is smaller than 5 MiB."
+            ),
+        },
+    },
+)
+async def complete_upload_session(
+    request: Request,
+    upload_id: str,
+    complete_request: CompleteUploadSessionRequest,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    secret: bytes = Depends(get_page_token_secret),
+) -> PutFileResponse:
+    """Join the uploaded parts, in order of their numbers, into the file, and end the upload session.
+
+    The request lists every part of the file with the ETag its upload returned. If a part is missing,
+    was uploaded again since, or was uploaded but is not listed, nothing is joined and the session
+    stays open, so the client can fix the parts and complete it again.
+    """
+    settings: Settings = request.app.state.settings
+    upload_session = _decode_upload_session_or_404(upload_id, secret)
+    async with _upload_session_errors():
+        parts = await s3_backend.list_uploaded_parts(
+            settings.s3_bucket_name, upload_session.file_path, upload_session.s3_upload_id
+        )
+        _check_uploaded_parts(complete_request, parts)
+        await s3_backend.complete_multipart_upload(
+            settings.s3_bucket_name, upload_session.file_path, upload_session.s3_upload_id, parts
+        )
+    message = f"File uploaded at path: /{upload_session.file_path}"
+    logger.info(message)
+    return PutFileResponse(file_path=upload_session.file_path, message=message)
+
+
+@FILES_ROUTER.delete(
+    "/v1/uploads/{upload_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={status.HTTP_404_NOT_FOUND: {"description": "Upload session not found, completed or aborted."}},
+)
+async def abort_upload_session(
+    request: Request,
+    upload_id: str,
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    secret: bytes = Depends(get_page_token_secret),
+) -> Response:
+    """Abort an upload session and discard its parts."""
+    settings: Settings = request.app.state.settings
+    upload_session = _decode_upload_session_or_404(upload_id, secret)
+    async with _upload_session_errors():
+        await s3_backend.abort_multipart_upload(
+            settings.s3_bucket_name, upload_session.file_path, upload_session.s3_upload_id
+        )
+    logger.info("Aborted upload session for key='{key}'", key=upload_session.file_path)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _check_uploaded_parts(complete_request: CompleteUploadSessionRequest, parts: List["PartTypeDef"]) -> None:
+    """Raise a 422 unless the uploaded parts are exactly the parts the client expects."""
+    # S3 quotes ETags, clients may not
+    uploaded_etags = {part["PartNumber"]: part["ETag"].strip('"') for part in parts}
+    expected_etags = {part.part_number: part.etag.strip('"') for part in complete_request.parts}
+    for part_number in sorted(uploaded_etags.keys() | expected_etags.keys()):
+        if part_number not in uploaded_etags:
+            detail = f"Part {part_number} has not been uploaded."
+        elif part_number not in expected_etags:
+            detail = f"Part {part_number} has been uploaded, but is not in the request."
+        elif uploaded_etags[part_number] != expected_etags[part_number]:
+            detail = f"The ETag of part {part_number} does not match; it has been uploaded again since."
+        else:
+            continue
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+def _decode_upload_session_or_404(upload_id: str, secret: bytes) -> UploadSession:
+    try:
+        return decode_upload_session_id(upload_id, secret)
+    except InvalidUploadSessionError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+
+
+@asynccontextmanager
+async def _upload_session_errors() -> AsyncIterator[None]:
+    """Turn the S3 errors of a missing upload, or of parts that cannot be joined, into HTTP errors."""
+    try:
+        yield
+    except ClientError as err:
+        if is_missing_upload_error(err):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found.")
+        if err.response["Error"]["Code"] in ("EntityTooSmall", "InvalidPart", "InvalidPartOrder"):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=err.response["Error"].get("Message", "")
+            )
+        raise
+
+
 @GENERATED_FILES_ROUTER.post(
     "/v1/files/generated/chat/completion/{file_path:path}",
     status_code=status.HTTP_201_CREATED,
@@ -280,6 +1359,7 @@ async def delete_file(request: Request, file_path: str, response: Response) -> R
                         "text": PutGeneratedFileResponse.model_json_schema()["examples"][0],
                     },
                 },
+                "text/event-stream": {"schema": {"type": "string"}},
             },
         },
     },
@@ -287,7 +1367,11 @@ async def delete_file(request: Request, file_path: str, response: Response) -> R
 async def generate_chat_completion(
     request: Request,
     response: Response,
-    query_params: Annotated[GeneratedFilesQueryParams, Depends()], 
+    query_params: Annotated[GeneratedFilesQueryParams, Depends()],
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+    generation_cache: Optional[GenerationCache] = Depends(get_generation_cache),
+    single_flight: Optional[SingleFlight] = Depends(get_generation_single_flight),
 ) -> PutGeneratedFileResponse:
     """
     Generate a File using AI.
@@ -297,30 +1381,114 @@ async def generate_chat_completion(
 
     Note: the generated file type is derived from the file_path extension. So the file_path must have
     an extension matching one of the supported file types in the list above.
+
+    With `stream=true`, the text is sent as server-sent events while it is generated: a `data: {"delta": ...}`
+    event per piece of text, then an `event: done` with the JSON response, or an `event: error` if the
+    generation or the upload failed, in which case the file is not written.
     """
     settings: Settings = request.app.state.settings
     s3_bucket_name = settings.s3_bucket_name
 
-    file_content = await get_text_chat_completion(prompt=query_params.prompt)
-    file_content_bytes: bytes = file_content.encode('utf-8')
     content_type = "text/plain"
 
-    content_type: str |None = content_type or mimetypes.guess_type(query_params.file_path)[0] # type: ignore
-
-    upload_s3_object(
-        bucket_name=s3_bucket_name,
-        object_key=query_params.file_path,
-        file_content=file_content_bytes,
-        content_type=content_type,
-    )
+    content_type: str | None = content_type or mimetypes.guess_type(query_params.file_path)[0]  # type: ignore
 
-    response.status_code = status.HTTP_201_CREATED
-    return PutGeneratedFileResponse(
+    cache_key = None
+    if generation_cache is not None:
+        cache_key = generation_cache_key(
+            {
+                "system_prompt": SYSTEM_PROMPT,
+                "content_type": content_type,
+                "max_tokens": query_params.max_tokens,
+                **CHAT_COMPLETION_PARAMETERS,
+            },
+            query_params.prompt,
+        )
+    created_response = PutGeneratedFileResponse(
         file_path=query_params.file_path,
-        # message=f"New {query_params.file_type.value} file generated and uploaded at path: {query_params.file_path}",
         message=f"New {GeneratedFileType.TEXT.value} file generated and uploaded at path: {query_params.file_path}",
     )
 
+    if query_params.stream:
+
+        async def send_server_sent_events(send_stream: MemoryObjectSendStream[str]) -> None:
+            async with send_stream:
+                if cache_key is not None and await generation_cache.copy_to(cache_key, query_params.file_path):
+                    cached_response = await s3_backend.fetch_s3_object(s3_bucket_name, query_params.file_path)
+                    content = await s3_backend.run_blocking(partial(read_s3_object_body, cached_response["Body"]))
+                    await send_stream.send(_server_sent_event(json.dumps({"delta": content.decode("utf-8")})))
+                    await send_stream.send(_server_sent_event(created_response.model_dump_json(), event="done"))
+                    return
+                await generate_and_upload(send_stream)
+
+        async def iter_uploaded_chunks(send_stream: MemoryObjectSendStream[str]) -> AsyncIterator[bytes]:
+            deltas = stream_text_chat_completion(
+                prompt=query_params.prompt, client=openai_client, max_tokens=query_params.max_tokens
+            )
+            async for delta in deltas:
+                await send_stream.send(_server_sent_event(json.dumps({"delta": delta})))
+                yield delta.encode("utf-8")
+
+        async def generate_and_upload(send_stream: MemoryObjectSendStream[str]) -> None:
+            try:
+                size_bytes, etag = await s3_backend.upload_s3_stream(
+                    bucket_name=s3_bucket_name,
+                    object_key=query_params.file_path,
+                    chunks=iter_uploaded_chunks(send_stream),
+                    content_type=content_type,
+                )
+            except (OpenAIError, ClientError) as err:
+                logger.warning("Failed to generate a streamed chat completion: {err}", err=err)
+                error = json.dumps({"detail": "Failed to generate the file."})
+                await send_stream.send(_server_sent_event(error, event="error"))
+                return
+            if cache_key is not None:
+                await generation_cache.store(cache_key, query_params.file_path, size_bytes, etag)
+            await send_stream.send(_server_sent_event(created_response.model_dump_json(), event="done"))
+
+        # the deltas are sent to the client as they are uploaded, through a buffer of a few events;
+        # a client that disconnects cancels the generation, and the file is not written
+        return ProducerStreamingResponse(
+            produce=send_server_sent_events,
+            max_buffer_size=16,
+            status_code=status.HTTP_201_CREATED,
+            media_type="text/event-stream",
+            # keep proxies from buffering the events
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if cache_key is None or not await generation_cache.copy_to(cache_key, query_params.file_path):
+        file_content = await call_coalesced(
+            single_flight,
+            ("get_text_chat_completion", query_params.prompt, query_params.max_tokens),
+            partial(
+                get_text_chat_completion,
+                prompt=query_params.prompt,
+                client=openai_client,
+                max_tokens=query_params.max_tokens,
+            ),
+        )
+        file_content_bytes: bytes = file_content.encode("utf-8")
+
+        etag = await s3_backend.upload_s3_object(
+            bucket_name=s3_bucket_name,
+            object_key=query_params.file_path,
+            file_content=file_content_bytes,
+            content_type=content_type,
+        )
+        if cache_key is not None:
+            await generation_cache.store(cache_key, query_params.file_path, len(file_content_bytes), etag)
+
+    response.status_code = status.HTTP_201_CREATED
+    return created_response
+
+
+def _server_sent_event(data: str, event: Optional[str] = None) -> str:
+    """Format a server-sent event; `data` must be a single line, e.g. JSON."""
+    if event is None:
+        return f"data: {data}\n\n"
+    return f"event: {event}\ndata: {data}\n\n"
+
 
 @GENERATED_FILES_ROUTER.post(
     "/v1/files/generated/image/generation/{file_path:path}",
@@ -338,12 +1506,20 @@ async def generate_chat_completion(
                 },
             },
         },
+        status.HTTP_502_BAD_GATEWAY: {
+            "description": "The generated image could not be downloaded from the provider, or is too large.",
+        },
     },
 )
 async def generate_image_completion(
     request: Request,
     response: Response,
-    query_params: Annotated[GeneratedImagesQueryParams, Depends()], 
+    query_params: Annotated[GeneratedImagesQueryParams, Depends()],
+    s3_backend: S3Backend = Depends(get_s3_backend),
+    openai_client: Optional[AsyncOpenAI] = Depends(get_openai_client),
+    download_client: httpx.AsyncClient = Depends(get_download_client),
+    generation_cache: Optional[GenerationCache] = Depends(get_generation_cache),
+    single_flight: Optional[SingleFlight] = Depends(get_generation_single_flight),
 ) -> PutGeneratedFileResponse:
     """
     Generate an Image using AI.
@@ -358,19 +1534,35 @@ async def generate_image_completion(
     s3_bucket_name = settings.s3_bucket_name
     content_type = None
 
-    image_url = await generate_image(prompt=query_params.prompt)
-    async with httpx.AsyncClient() as client:
-        image_response = await client.get(image_url)  # pylint: disable=missing-timeout
-    file_content_bytes = image_response.content
+    content_type: str | None = content_type or mimetypes.guess_type(query_params.file_path)[0]  # type: ignore
 
-    content_type: str |None = content_type or mimetypes.guess_type(query_params.file_path)[0] # type: ignore
+    cache_key = None
+    if generation_cache is not None:
+        cache_key = generation_cache_key(
+            {"content_type": content_type, **IMAGE_GENERATION_PARAMETERS}, query_params.prompt
+        )
+    if cache_key is None or not await generation_cache.copy_to(cache_key, query_params.file_path):
+        image_url = await call_coalesced(
+            single_flight,
+            ("generate_image", query_params.prompt),
+            partial(generate_image, prompt=query_params.prompt, client=openai_client),
+        )
 
-    upload_s3_object(
-        bucket_name=s3_bucket_name,
-        object_key=query_params.file_path,
-        file_content=file_content_bytes,
-        content_type=content_type,
-    )
+        # stream the image from the provider into S3, so it is never held in memory as a whole
+        try:
+            size_bytes, etag = await s3_backend.upload_s3_stream(
+                bucket_name=s3_bucket_name,
+                object_key=query_params.file_path,
+                chunks=stream_download(download_client, image_url, settings.generated_image_max_size_bytes),
+                content_type=content_type,
+            )
+        except (httpx.HTTPError, DownloadTooLargeError) as err:
+            logger.warning("Failed to download the generated image: {err}", err=err)
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY, detail="Failed to download the generated image."
+            )
+        if cache_key is not None:
+            await generation_cache.store(cache_key, query_params.file_path, size_bytes, etag)
 
     response.status_code = status.HTTP_201_CREATED
     return PutGeneratedFileResponse(
@@ -378,4 +1570,3 @@ async def generate_image_completion(
         # message=f"New {query_params.file_type.value} file generated and uploaded at path: {query_params.file_path}",
         message=f"New {GeneratedFileType.IMAGE.value} file generated and uploaded at path: {query_params.file_path}",
     )
-
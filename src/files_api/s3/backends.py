@@ -0,0 +1,1102 @@
+"""Storage backends that expose the `files_api.s3` helpers to the (async) route handlers.
+
+Both backends share the same awaitable interface, so the routes do not need to know whether
+a boto3 call runs inline on the event loop or on a worker thread.
+"""
+
+import io
+from contextlib import (
+    aclosing,
+    asynccontextmanager,
+    suppress,
+)
+from datetime import datetime
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+try:
+    from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import (
+        ErrorTypeDef,
+        GetObjectOutputTypeDef,
+        HeadObjectOutputTypeDef,
+        ObjectTypeDef,
+        PartTypeDef,
+    )
+except ImportError:
+    pass
+
+import anyio
+from anyio.abc import TaskGroup
+from anyio.streams.memory import MemoryObjectSendStream
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from files_api.metadata_index import (
+    Cursor,
+    IndexedFile,
+    MetadataIndex,
+    SortBy,
+)
+from files_api.s3 import (
+    delete_objects,
+    multipart_uploads,
+    presigned_urls,
+    read_objects,
+    sharded_listing,
+    write_objects,
+)
+from files_api.s3.client import (
+    create_copy_transfer_config,
+    create_transfer_config,
+)
+from files_api.s3.directory_stats import (
+    DirectoryStats,
+    DirectoryStatsCache,
+)
+from files_api.s3.metadata_cache import MetadataCache
+from files_api.s3.negative_cache import (
+    BloomFilter,
+    NegativeLookupCache,
+)
+from files_api.s3.pending_uploads import PendingUploads
+from files_api.settings import Settings
+from files_api.single_flight import (
+    SingleFlight,
+    call_coalesced,
+)
+
+T = TypeVar("T")
+
+# the size of an object that was not looked up before it changed
+UNKNOWN_SIZE = -1
+
+
+class _SizeBeforeChange(NamedTuple):
+    """The size of an object before it was written or deleted, see `S3Backend._size_before_change`."""
+
+    # None if the object did not exist, `UNKNOWN_SIZE` if it was not looked up
+    size_bytes: Optional[int]
+    # the version of the directory statistics from before the size was looked up
+    directory_stats_version: Optional[int] = None
+
+
+class _SharedResponse:
+    """
+    A `get_object` response shared by the coalesced callers of `S3Backend.fetch_s3_object`.
+
+    If the content was read into memory, every caller gets a copy of the response with its own body.
+    Otherwise the body is a live stream, which only the first caller gets.
+    """
+
+    def __init__(self, response: "GetObjectOutputTypeDef", content: Optional[bytes] = None):
+        self._response: Optional["GetObjectOutputTypeDef"] = response
+        self._content = content
+
+    def take(self) -> Optional["GetObjectOutputTypeDef"]:
+        """Return the response for the next caller, or None if its body was already taken."""
+        if self._content is not None:
+            return {**self._response, "Body": StreamingBody(io.BytesIO(self._content), len(self._content))}
+        response, self._response = self._response, None
+        return response
+
+
+class S3Backend:
+    """
+    The sync backend: call the blocking boto3 helpers directly on the event loop.
+
+    If a `metadata_cache` is given, existence checks and unconditional metadata lookups are
+    answered from it when possible, and writes and deletes invalidate the affected entry.
+
+    If a `negative_cache` is given, reads of objects it knows to be missing fail right away with
+    the same error S3 would have raised, and writes clear the written key from it.
+
+    If a `metadata_index` is given, every write and delete is mirrored into it, so that
+    listings answered from the index include the change right away.
+
+    If a `directory_stats` cache is given, the statistics of the directories it holds are updated
+    with every write and delete, so they are only computed from a full listing when missing.
+
+    If a `single_flight` is given, concurrent identical reads and existence checks share one S3 call.
+    The content of objects up to `single_flight_max_body_bytes` is read once and handed to every caller;
+    callers that join the read of a larger object fetch it themselves.
+
+    Objects that clients may upload to with a presigned URL are not cached until the URL expires,
+    see `PendingUploads`.
+    """
+
+    def __init__(
+        self,
+        s3_client: "S3Client",
+        transfer_config: Optional[TransferConfig] = None,
+        download_chunk_size: int = 1024 * 1024,
+        metadata_cache: Optional[MetadataCache] = None,
+        negative_cache: Optional[NegativeLookupCache] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        directory_stats: Optional[DirectoryStatsCache] = None,
+        copy_transfer_config: Optional[TransferConfig] = None,
+        single_flight: Optional[SingleFlight] = None,
+        single_flight_max_body_bytes: int = 1024 * 1024,
+    ):
+        self.s3_client = s3_client
+        self.transfer_config = transfer_config
+        self.download_chunk_size = download_chunk_size
+        self.metadata_cache = metadata_cache
+        self.negative_cache = negative_cache
+        self.metadata_index = metadata_index
+        self.directory_stats = directory_stats
+        self.copy_transfer_config = copy_transfer_config or TransferConfig()
+        self.single_flight = single_flight
+        self.single_flight_max_body_bytes = single_flight_max_body_bytes
+        self.pending_uploads = PendingUploads()
+
+    async def run_blocking(self, func: Callable[[], T]) -> T:
+        """Call a blocking function, e.g. a boto3 call or a read from an S3 response."""
+        return func()
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call one of the `files_api.s3` helpers with the backend's S3 client."""
+        return await self.run_blocking(partial(func, *args, s3_client=self.s3_client, **kwargs))
+
+    async def object_exists_in_s3(self, bucket_name: str, object_key: str) -> bool:
+        return await call_coalesced(
+            self.single_flight,
+            ("object_exists_in_s3", bucket_name, object_key),
+            partial(self._object_exists_in_s3, bucket_name, object_key),
+        )
+
+    async def _object_exists_in_s3(self, bucket_name: str, object_key: str) -> bool:
+        if self.metadata_cache is None and self.negative_cache is None:
+            return await self.run(read_objects.object_exists_in_s3, bucket_name, object_key)
+        try:
+            await self.fetch_s3_object_metadata(bucket_name, object_key)
+        except ClientError as err:
+            if read_objects.is_missing_object_error(err):
+                return False
+            raise
+        return True
+
+    async def fetch_s3_object_metadata(
+        self,
+        bucket_name: str,
+        object_key: str,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None,
+    ) -> "HeadObjectOutputTypeDef":
+        conditional = bool(if_none_match or if_modified_since)
+        if self.metadata_cache is not None and not conditional:
+            cached_metadata = self.metadata_cache.get(bucket_name, object_key)
+            if cached_metadata is not None:
+                return cached_metadata
+        cache_version = self.metadata_cache.version() if self.metadata_cache is not None else None
+        async with self._negative_lookup(bucket_name, object_key, "HeadObject"):
+            response = await self.run(
+                read_objects.fetch_s3_object_metadata,
+                bucket_name,
+                object_key,
+                if_none_match=if_none_match,
+                if_modified_since=if_modified_since,
+            )
+        if self.metadata_cache is not None and not self.pending_uploads.contains(bucket_name, object_key):
+            self.metadata_cache.put(bucket_name, object_key, response, version=cache_version)
+        return response
+
+    async def fetch_s3_object(
+        self,
+        bucket_name: str,
+        object_key: str,
+        byte_range: Optional[str] = None,
+        if_match: Optional[str] = None,
+        if_unmodified_since: Optional[datetime] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None,
+    ) -> "GetObjectOutputTypeDef":
+        fetch = partial(
+            self._fetch_s3_object,
+            bucket_name,
+            object_key,
+            byte_range=byte_range,
+            if_match=if_match,
+            if_unmodified_since=if_unmodified_since,
+            if_none_match=if_none_match,
+            if_modified_since=if_modified_since,
+        )
+        if self.single_flight is None:
+            return await fetch()
+        key = (
+            "fetch_s3_object",
+            bucket_name,
+            object_key,
+            byte_range,
+            if_match,
+            if_unmodified_since,
+            if_none_match,
+            if_modified_since,
+        )
+        shared_response = await self.single_flight.do(key, partial(self._fetch_shareable_s3_object, fetch))
+        # the body of a large object can only be read by one caller, the others fetch their own
+        return shared_response.take() or await fetch()
+
+    async def _fetch_shareable_s3_object(
+        self, fetch: Callable[[], Awaitable["GetObjectOutputTypeDef"]]
+    ) -> "_SharedResponse":
+        """Fetch an object, reading its content into memory if it is small enough to be handed to many callers."""
+        response = await fetch()
+        if response["ContentLength"] > self.single_flight_max_body_bytes:
+            return _SharedResponse(response)
+        content = await self.run_blocking(partial(read_objects.read_s3_object_body, response["Body"]))
+        return _SharedResponse(response, content)
+
+    async def _fetch_s3_object(
+        self,
+        bucket_name: str,
+        object_key: str,
+        byte_range: Optional[str] = None,
+        if_match: Optional[str] = None,
+        if_unmodified_since: Optional[datetime] = None,
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[datetime] = None,
+    ) -> "GetObjectOutputTypeDef":
+        cache_version = self.metadata_cache.version() if self.metadata_cache is not None else None
+        async with self._negative_lookup(bucket_name, object_key, "GetObject"):
+            response = await self.run(
+                read_objects.fetch_s3_object,
+                bucket_name,
+                object_key,
+                byte_range=byte_range,
+                if_match=if_match,
+                if_unmodified_since=if_unmodified_since,
+                if_none_match=if_none_match,
+                if_modified_since=if_modified_since,
+            )
+        # the metadata of a byte range response describes the range, not the object
+        if (
+            self.metadata_cache is not None
+            and not byte_range
+            and not self.pending_uploads.contains(bucket_name, object_key)
+        ):
+            self.metadata_cache.put(bucket_name, object_key, response, version=cache_version)
+        return response
+
+    @asynccontextmanager
+    async def _negative_lookup(self, bucket_name: str, object_key: str, operation_name: str) -> AsyncIterator[None]:
+        """
+        Wrap a read of an object: fail fast if the negative cache knows it is missing, remember it if S3 says so.
+
+        :raises ClientError: The error S3 raises for a missing object (see `is_missing_object_error`).
+        """
+        if self.negative_cache is None:
+            yield
+            return
+        if self.negative_cache.is_known_missing(bucket_name, object_key):
+            # head_object reports a missing key as a bare "404", get_object as "NoSuchKey"
+            code = "404" if operation_name == "HeadObject" else "NoSuchKey"
+            error = {"Code": code, "Message": "The specified key does not exist."}
+            raise ClientError({"Error": error}, operation_name)
+        version = self.negative_cache.version()
+        try:
+            yield
+        except ClientError as err:
+            pending_upload = self.pending_uploads.contains(bucket_name, object_key)
+            if read_objects.is_missing_object_error(err) and not pending_upload:
+                self.negative_cache.record_missing(bucket_name, object_key, version=version)
+            raise
+
+    async def load_bloom_filter(self, bucket_name: str, prefix: str, false_positive_rate: float = 0.01) -> int:
+        """
+        List every key under `prefix` and hand a Bloom filter of them to the negative cache.
+
+        :return: Number of keys in the filter.
+        """
+        if self.negative_cache is None:
+            raise ValueError("A Bloom filter needs a negative cache.")
+        self.negative_cache.begin_bloom_filter_build(bucket_name)
+        object_keys = await self.fetch_s3_object_keys(bucket_name, prefix)
+        bloom_filter = await self.run_blocking(
+            partial(BloomFilter.from_items, object_keys, len(object_keys), false_positive_rate)
+        )
+        self.negative_cache.load_bloom_filter(bucket_name, prefix, bloom_filter)
+        return len(object_keys)
+
+    async def rebuild_metadata_index(self, bucket_name: str, max_concurrency: int = 8) -> int:
+        """
+        Reconcile the metadata index with a full (sharded) listing of the bucket, see `MetadataIndex.rebuild`.
+
+        :return: Number of files in the bucket.
+        """
+        if self.metadata_index is None:
+            raise ValueError("No metadata index to rebuild.")
+        pages = sharded_listing.iter_s3_objects_sharded(
+            bucket_name, max_concurrency=max_concurrency, s3_client=self.s3_client
+        )
+        return await self.run_blocking(partial(self.metadata_index.rebuild, bucket_name, pages))
+
+    async def query_metadata_index(  # pylint: disable=too-many-arguments
+        self,
+        bucket_name: str,
+        directory: str = "",
+        page_size: int = 10,
+        sort: SortBy = "file_path",
+        min_size: Optional[int] = None,
+        modified_since: Optional[datetime] = None,
+        after: Optional[Cursor] = None,
+    ) -> Tuple[List[IndexedFile], bool]:
+        """List a page of files from the metadata index; see `MetadataIndex.query`."""
+        if self.metadata_index is None:
+            raise ValueError("No metadata index to query.")
+        return await self.run_blocking(
+            partial(
+                self.metadata_index.query,
+                bucket_name,
+                directory,
+                page_size,
+                sort=sort,
+                min_size=min_size,
+                modified_since=modified_since,
+                after=after,
+            )
+        )
+
+    async def fetch_directory_stats(
+        self, bucket_name: str, directory: str, max_concurrency: int = 8
+    ) -> DirectoryStats:
+        """
+        Return the statistics of a directory: from the cache if possible, otherwise from a full listing of it.
+
+        The listing is read from the metadata index if there is one, otherwise from S3 (sharded, see
+        `iter_s3_objects_sharded`).
+        """
+        if self.directory_stats is None:
+            return await self.run_blocking(
+                partial(self._compute_directory_stats, bucket_name, directory, max_concurrency)
+            )
+        cached_stats = self.directory_stats.get(bucket_name, directory)
+        if cached_stats is not None:
+            return cached_stats
+        version = self.directory_stats.version()
+        stats = await self.run_blocking(
+            partial(self._compute_directory_stats, bucket_name, directory, max_concurrency)
+        )
+        if not self.pending_uploads.any_under(bucket_name, directory):
+            self.directory_stats.put(bucket_name, stats, version=version)
+        return stats
+
+    def _compute_directory_stats(self, bucket_name: str, directory: str, max_concurrency: int) -> DirectoryStats:
+        if self.metadata_index is not None:
+            indexed_files = self.metadata_index.iter_files(bucket_name, directory)
+            return DirectoryStats.from_files(directory, ((file.file_path, file.size_bytes) for file in indexed_files))
+        pages = sharded_listing.iter_s3_objects_sharded(
+            bucket_name, directory, max_concurrency=max_concurrency, s3_client=self.s3_client
+        )
+        return DirectoryStats.from_files(directory, ((obj["Key"], obj["Size"]) for page in pages for obj in page))
+
+    async def stream_s3_object_body(self, body: StreamingBody) -> AsyncIterator[bytes]:
+        """
+        Stream the content of a fetched object in chunks of `download_chunk_size` bytes.
+
+        The S3 response is closed when the stream ends, including when the consumer stops early,
+        e.g. because the client disconnected and the response task was cancelled.
+        """
+        chunks = read_objects.iter_s3_object_body(body, self.download_chunk_size)
+        async with aclosing(self.iterate(chunks)) as chunks_read:
+            async for chunk in chunks_read:
+                yield chunk
+
+    async def iterate(self, iterator: Generator[T, None, None]) -> AsyncIterator[T]:
+        """
+        Consume a blocking generator, e.g. one that makes an S3 call per item, one item at a time.
+
+        The generator is closed when the iteration ends, including when the consumer stops early.
+        """
+        try:
+            while (item := await self.run_blocking(partial(next, iterator, None))) is not None:
+                yield item
+        finally:
+            # closing the generator may block too, e.g. on the S3 response or the threads it reads from
+            with anyio.CancelScope(shield=True):
+                await self.run_blocking(iterator.close)
+
+    async def iter_s3_objects_pages(
+        self,
+        bucket_name: str,
+        prefix: str = "",
+        delimiter: Optional[str] = None,
+        max_keys: int = read_objects.DEFAULT_MAX_KEYS,
+    ) -> AsyncIterator[Tuple[List["ObjectTypeDef"], List[str]]]:
+        """Walk every page of a listing; see `read_objects.iter_s3_objects_pages`."""
+        pages = read_objects.iter_s3_objects_pages(
+            bucket_name, prefix, delimiter=delimiter, max_keys=max_keys, s3_client=self.s3_client
+        )
+        async with aclosing(self.iterate(pages)) as pages_read:
+            async for page in pages_read:
+                yield page
+
+    async def iter_s3_objects_sharded(
+        self, bucket_name: str, prefix: str = "", max_concurrency: int = 8
+    ) -> AsyncIterator[List["ObjectTypeDef"]]:
+        """List every object under a prefix, one subdirectory per thread; see `sharded_listing`."""
+        pages = sharded_listing.iter_s3_objects_sharded(
+            bucket_name, prefix, max_concurrency=max_concurrency, s3_client=self.s3_client
+        )
+        async with aclosing(self.iterate(pages)) as pages_read:
+            async for page in pages_read:
+                yield page
+
+    async def send_s3_objects_prefetched(
+        self,
+        bucket_name: str,
+        prefix: str,
+        send_stream: "MemoryObjectSendStream[Tuple[ObjectTypeDef, GetObjectOutputTypeDef]]",
+        prefetch: int = 4,
+    ) -> None:
+        """
+        Fetch every object under a prefix, with the next objects requested ahead, and send them in listing order.
+
+        While the receiver reads the body of one object, the `get_object` calls of up to `prefetch` following
+        objects are already under way, so their latency is hidden for directories of many small files.
+        The receiver must consume each body, e.g. with `stream_s3_object_body`, before receiving the next
+        object. Objects that are deleted after they were listed are skipped. The send stream is closed
+        once every object has been sent.
+
+        Run this as a task, e.g. the producer of a `ProducerStreamingResponse`, rather than iterating
+        over it: the `get_object` calls run in a task group, which a generator must not yield from.
+
+        :param send_stream: Receives every object with its `get_object` response.
+        """
+        fetched_stream, fetched_receive_stream = anyio.create_memory_object_stream(max_buffer_size=prefetch)
+
+        async def fetch(obj: "ObjectTypeDef", fetched: Dict[str, Any]) -> None:
+            try:
+                fetched["response"] = await self.fetch_s3_object(bucket_name, obj["Key"])
+            except ClientError as err:
+                fetched["error"] = err
+            finally:
+                fetched["done"].set()
+
+        async def fetch_ahead(task_group: TaskGroup) -> None:
+            async with fetched_stream:
+                async for objects, _ in self.iter_s3_objects_pages(bucket_name, prefix):
+                    for obj in objects:
+                        fetched = {"object": obj, "done": anyio.Event()}
+                        task_group.start_soon(fetch, obj, fetched)
+                        await fetched_stream.send(fetched)
+
+        async with send_stream, anyio.create_task_group() as task_group:
+            task_group.start_soon(fetch_ahead, task_group)
+            async with fetched_receive_stream:
+                async for fetched in fetched_receive_stream:
+                    await fetched["done"].wait()
+                    if "error" in fetched:
+                        if read_objects.is_missing_object_error(fetched["error"]):
+                            continue
+                        raise fetched["error"]
+                    await send_stream.send((fetched["object"], fetched["response"]))
+
+    async def fetch_s3_objects_metadata(
+        self,
+        bucket_name: str,
+        prefix: Optional[str] = None,
+        max_keys: Optional[int] = read_objects.DEFAULT_MAX_KEYS,
+        start_after: Optional[str] = None,
+    ) -> tuple[list["ObjectTypeDef"], Optional[str]]:
+        return await self.run(
+            read_objects.fetch_s3_objects_metadata,
+            bucket_name,
+            prefix=prefix,
+            max_keys=max_keys,
+            start_after=start_after,
+        )
+
+    async def fetch_s3_object_keys(self, bucket_name: str, prefix: str = "") -> List[str]:
+        return await self.run(read_objects.fetch_s3_object_keys, bucket_name, prefix)
+
+    async def upload_s3_object(
+        self, bucket_name: str, object_key: str, file_content: bytes, content_type: Optional[str] = None
+    ) -> str:
+        """Upload an object; see `write_objects.upload_s3_object`. Returns the ETag of the object."""
+        previous_size = await self._size_before_change(bucket_name, object_key)
+        try:
+            etag = await self.run(write_objects.upload_s3_object, bucket_name, object_key, file_content, content_type)
+        finally:
+            self._object_written(bucket_name, object_key)
+        await self._object_stored(bucket_name, object_key, previous_size, size_bytes=len(file_content))
+        return etag
+
+    async def upload_s3_fileobj(
+        self, bucket_name: str, object_key: str, fileobj: BinaryIO, content_type: Optional[str] = None
+    ) -> None:
+        previous_size = await self._size_before_change(bucket_name, object_key)
+        size_bytes = write_objects.remaining_size(fileobj)
+        try:
+            await self.run(
+                write_objects.upload_s3_fileobj,
+                bucket_name,
+                object_key,
+                fileobj,
+                content_type,
+                transfer_config=self.transfer_config,
+            )
+        finally:
+            self._object_written(bucket_name, object_key)
+        await self._object_stored(bucket_name, object_key, previous_size, size_bytes=size_bytes)
+
+    async def upload_s3_stream(
+        self,
+        bucket_name: str,
+        object_key: str,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+    ) -> Tuple[int, str]:
+        """
+        Upload an object whose content arrives in chunks of unknown total size, e.g. from an HTTP download.
+
+        At most one part (the multipart chunk size of the transfer config) is held in memory. Content
+        smaller than one part is uploaded with a single `put_object`; larger content is uploaded part
+        by part as it arrives, and the multipart upload is aborted if the stream fails.
+
+        :return: The size and the ETag of the object.
+        """
+        part_size = (self.transfer_config or TransferConfig()).multipart_chunksize
+        buffer = bytearray()
+        size_bytes = 0
+        upload_id: Optional[str] = None
+        parts: List["PartTypeDef"] = []
+
+        async def upload_buffered_part(part: bytes) -> None:
+            etag = await self.upload_part(bucket_name, object_key, upload_id, len(parts) + 1, io.BytesIO(part))
+            parts.append({"PartNumber": len(parts) + 1, "ETag": etag})
+
+        try:
+            async for chunk in chunks:
+                size_bytes += len(chunk)
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = await self.create_multipart_upload(bucket_name, object_key, content_type)
+                    await upload_buffered_part(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+            if upload_id is None:
+                etag = await self.upload_s3_object(bucket_name, object_key, bytes(buffer), content_type)
+                return size_bytes, etag
+            if buffer:
+                await upload_buffered_part(bytes(buffer))
+            etag = await self.complete_multipart_upload(
+                bucket_name, object_key, upload_id, parts, size_bytes=size_bytes
+            )
+        except BaseException:
+            if upload_id is not None:
+                with anyio.CancelScope(shield=True), suppress(ClientError):
+                    # if this fails too, the upload is aborted once it is stale, see `abort_stale_multipart_uploads`
+                    await self.abort_multipart_upload(bucket_name, object_key, upload_id)
+            raise
+        return size_bytes, etag
+
+    async def upload_s3_fileobjs(
+        self, bucket_name: str, files: List[Tuple[str, BinaryIO, Optional[str]]], max_concurrency: int = 16
+    ) -> List["ErrorTypeDef"]:
+        """
+        Upload many (small) objects concurrently.
+
+        Unlike `upload_s3_fileobj`, the size an object had before is not looked up, since that would
+        cost a call per object; the statistics of the directories that contain it are recomputed instead.
+
+        :param files: The key, content and content type of every object.
+        :param max_concurrency: Number of objects uploaded at once.
+
+        :return: The keys that could not be uploaded and why.
+        """
+        errors: List["ErrorTypeDef"] = []
+        limiter = anyio.CapacityLimiter(max_concurrency)
+
+        async def upload(object_key: str, fileobj: BinaryIO, content_type: Optional[str]) -> None:
+            async with limiter:
+                try:
+                    await self.run(
+                        write_objects.upload_s3_fileobj,
+                        bucket_name,
+                        object_key,
+                        fileobj,
+                        content_type,
+                        transfer_config=self.transfer_config,
+                    )
+                except ClientError as err:
+                    error = err.response["Error"]
+                    errors.append(
+                        {"Key": object_key, "Code": error.get("Code", ""), "Message": error.get("Message", "")}
+                    )
+                    return
+                finally:
+                    self._object_written(bucket_name, object_key)
+                await self._object_stored(bucket_name, object_key, _SizeBeforeChange(UNKNOWN_SIZE))
+
+        async with anyio.create_task_group() as task_group:
+            for object_key, fileobj, content_type in files:
+                task_group.start_soon(upload, object_key, fileobj, content_type)
+        return errors
+
+    async def create_multipart_upload(
+        self, bucket_name: str, object_key: str, content_type: Optional[str] = None
+    ) -> str:
+        return await self.run(multipart_uploads.create_multipart_upload, bucket_name, object_key, content_type)
+
+    async def upload_part(  # pylint: disable=too-many-arguments
+        self, bucket_name: str, object_key: str, upload_id: str, part_number: int, fileobj: BinaryIO
+    ) -> str:
+        return await self.run(multipart_uploads.upload_part, bucket_name, object_key, upload_id, part_number, fileobj)
+
+    async def list_uploaded_parts(self, bucket_name: str, object_key: str, upload_id: str) -> List["PartTypeDef"]:
+        return await self.run(multipart_uploads.list_uploaded_parts, bucket_name, object_key, upload_id)
+
+    async def complete_multipart_upload(  # pylint: disable=too-many-arguments
+        self,
+        bucket_name: str,
+        object_key: str,
+        upload_id: str,
+        parts: List["PartTypeDef"],
+        size_bytes: Optional[int] = None,
+    ) -> str:
+        """
+        Join the parts of a multipart upload into the object; see `multipart_uploads.complete_multipart_upload`.
+
+        :param size_bytes: The size of the object, if known; spares looking it up to update directory statistics.
+
+        :return: The ETag of the object.
+        """
+        previous_size = await self._size_before_change(bucket_name, object_key)
+        try:
+            etag = await self.run(
+                multipart_uploads.complete_multipart_upload, bucket_name, object_key, upload_id, parts
+            )
+        finally:
+            self._object_written(bucket_name, object_key)
+        await self._object_stored(bucket_name, object_key, previous_size, size_bytes=size_bytes)
+        return etag
+
+    async def abort_multipart_upload(self, bucket_name: str, object_key: str, upload_id: str) -> None:
+        await self.run(multipart_uploads.abort_multipart_upload, bucket_name, object_key, upload_id)
+
+    async def abort_stale_multipart_uploads(self, bucket_name: str, initiated_before: datetime) -> List[str]:
+        return await self.run(multipart_uploads.abort_stale_multipart_uploads, bucket_name, initiated_before)
+
+    async def create_presigned_download_url(self, bucket_name: str, object_key: str, expires_in_seconds: int) -> str:
+        return await self.run(
+            presigned_urls.create_presigned_download_url, bucket_name, object_key, expires_in_seconds
+        )
+
+    async def create_presigned_upload_url(
+        self, bucket_name: str, object_key: str, expires_in_seconds: int, content_type: Optional[str] = None
+    ) -> str:
+        """
+        Create a URL that uploads an object; see `presigned_urls.create_presigned_upload_url`.
+
+        The object is written without this process seeing it, so what the caches know about it is dropped
+        now and it is not cached again until the URL expires. It joins the metadata index with the next
+        rebuild of the index.
+        """
+        url = await self.run(
+            presigned_urls.create_presigned_upload_url, bucket_name, object_key, expires_in_seconds, content_type
+        )
+        self._presigned_for_upload(bucket_name, object_key, expires_in_seconds)
+        return url
+
+    async def create_presigned_multipart_upload(  # pylint: disable=too-many-arguments
+        self,
+        bucket_name: str,
+        object_key: str,
+        part_numbers: List[int],
+        expires_in_seconds: int,
+        upload_id: Optional[str] = None,
+        content_type: Optional[str] = None,
+    ) -> Tuple[str, List[str], str, str]:
+        """
+        Create the URLs of a multipart upload that the client runs against S3 directly.
+
+        :param upload_id: The upload to sign more part URLs for; by default, a new upload is started.
+
+        :return: The ID of the upload, the URLs of the parts, and the URLs that complete and abort it.
+        """
+        if upload_id is None:
+            upload_id = await self.create_multipart_upload(bucket_name, object_key, content_type)
+
+        def create_urls() -> Tuple[str, List[str], str, str]:
+            args = (bucket_name, object_key, upload_id)
+            return (
+                upload_id,
+                presigned_urls.create_presigned_upload_part_urls(
+                    *args, part_numbers, expires_in_seconds, s3_client=self.s3_client
+                ),
+                presigned_urls.create_presigned_complete_url(*args, expires_in_seconds, s3_client=self.s3_client),
+                presigned_urls.create_presigned_abort_url(*args, expires_in_seconds, s3_client=self.s3_client),
+            )
+
+        urls = await self.run_blocking(create_urls)
+        self._presigned_for_upload(bucket_name, object_key, expires_in_seconds)
+        return urls
+
+    async def copy_s3_object(
+        self,
+        bucket_name: str,
+        source_key: str,
+        destination_key: str,
+        size_bytes: Optional[int] = None,
+        source_etag: Optional[str] = None,
+        source_bucket_name: Optional[str] = None,
+    ) -> None:
+        """Copy an object server-side; see `write_objects.copy_s3_object`."""
+        previous_size = await self._size_before_change(bucket_name, destination_key)
+        try:
+            await self.run(
+                write_objects.copy_s3_object,
+                bucket_name,
+                source_key,
+                destination_key,
+                size_bytes=size_bytes,
+                source_etag=source_etag,
+                transfer_config=self.copy_transfer_config,
+                source_bucket_name=source_bucket_name,
+            )
+        finally:
+            self._object_written(bucket_name, destination_key)
+        await self._object_stored(bucket_name, destination_key, previous_size, size_bytes=size_bytes)
+
+    async def move_s3_object(self, bucket_name: str, source_key: str, destination_key: str) -> None:
+        """
+        Move an object server-side: copy it, then delete the source.
+
+        The copy and the delete are both conditional on the ETag the source had when the move started,
+        so a source that is overwritten during the move is neither half-copied nor lost.
+
+        :raises ClientError: "404" if the source does not exist, "PreconditionFailed" if it changed during
+            the move. In the latter case the destination holds the version of the source that was copied.
+        """
+        metadata = await self.run(read_objects.fetch_s3_object_metadata, bucket_name, source_key)
+        await self.copy_s3_object(
+            bucket_name,
+            source_key,
+            destination_key,
+            size_bytes=metadata["ContentLength"],
+            source_etag=metadata["ETag"],
+        )
+        await self.delete_s3_object(bucket_name, source_key, if_match=metadata["ETag"])
+
+    async def move_s3_prefix(
+        self, bucket_name: str, source_prefix: str, destination_prefix: str, max_concurrency: int = 10
+    ) -> Tuple[List[str], List["ErrorTypeDef"]]:
+        """
+        Move every object under a prefix to another prefix, keeping the rest of their keys.
+
+        The prefix is listed a page at a time; the objects of a page are copied concurrently, and the
+        sources that were copied are then deleted with `delete_s3_objects`. Both the copy and the delete
+        are conditional on the ETag the source was listed with, so a source that is overwritten during
+        the move is reported with the code "PreconditionFailed" and kept instead of being lost.
+
+        :param max_concurrency: Number of objects copied at once.
+
+        :return: The keys of the moved objects, and the keys that could not be copied or deleted and why.
+        """
+        moved_keys: List[str] = []
+        errors: List["ErrorTypeDef"] = []
+        limiter = anyio.CapacityLimiter(max_concurrency)
+
+        async def copy(obj: "ObjectTypeDef") -> None:
+            destination_key = destination_prefix + obj["Key"][len(source_prefix) :]
+            async with limiter:
+                try:
+                    await self.copy_s3_object(
+                        bucket_name, obj["Key"], destination_key, size_bytes=obj["Size"], source_etag=obj["ETag"]
+                    )
+                except ClientError as err:
+                    error = err.response["Error"]
+                    errors.append(
+                        {"Key": obj["Key"], "Code": error.get("Code", ""), "Message": error.get("Message", "")}
+                    )
+
+        async for objects, _ in self.iter_s3_objects_pages(bucket_name, source_prefix):
+            n_errors = len(errors)
+            async with anyio.create_task_group() as task_group:
+                for obj in objects:
+                    task_group.start_soon(copy, obj)
+            failed_keys = {error["Key"] for error in errors[n_errors:]}
+            copied_etags = {obj["Key"]: obj["ETag"] for obj in objects if obj["Key"] not in failed_keys}
+            copied_keys = list(copied_etags)
+            delete_errors = await self.delete_s3_objects(bucket_name, copied_keys, etags=copied_etags)
+            errors.extend(delete_errors)
+            failed_keys.update(error["Key"] for error in delete_errors)
+            moved_keys.extend(key for key in copied_keys if key not in failed_keys)
+        return moved_keys, errors
+
+    async def delete_s3_object(self, bucket_name: str, object_key: str, if_match: Optional[str] = None) -> None:
+        previous_size = await self._size_before_change(bucket_name, object_key)
+        try:
+            await self.run(delete_objects.delete_s3_object, bucket_name, object_key, if_match=if_match)
+        except ClientError as err:
+            if read_objects.is_missing_object_error(err):
+                await self._object_removed(bucket_name, object_key, previous_size)
+            raise
+        finally:
+            self._object_deleted(bucket_name, object_key)
+        await self._object_removed(bucket_name, object_key, previous_size)
+
+    async def delete_s3_objects(
+        self, bucket_name: str, object_keys: List[str], etags: Optional[Dict[str, str]] = None
+    ) -> List["ErrorTypeDef"]:
+        """
+        Delete any number of objects with one `delete_objects` call per batch of 1000 keys.
+
+        The batches are deleted concurrently (up to the backend's concurrency limit).
+
+        :param etags: Optional ETags by key that the objects must still have to be deleted.
+
+        :return: The keys that could not be deleted and why, see `delete_objects.delete_s3_objects`.
+        """
+        errors: List["ErrorTypeDef"] = []
+
+        async def delete_batch(batch: List[str]) -> None:
+            try:
+                batch_errors = await self.run(delete_objects.delete_s3_objects, bucket_name, batch, etags=etags)
+            finally:
+                for object_key in batch:
+                    self._object_deleted(bucket_name, object_key)
+                    # looking up the size of every key first would cost a call per key
+                    if self.directory_stats is not None:
+                        self.directory_stats.invalidate_file(bucket_name, object_key)
+            errors.extend(batch_errors)
+            failed_object_keys = {error["Key"] for error in batch_errors}
+            await self._unindex_objects(bucket_name, [key for key in batch if key not in failed_object_keys])
+
+        async with anyio.create_task_group() as task_group:
+            for batch in delete_objects.iter_delete_batches(object_keys):
+                task_group.start_soon(delete_batch, batch)
+        return errors
+
+    async def _size_before_change(self, bucket_name: str, object_key: str) -> _SizeBeforeChange:
+        """Look up the size of an object that is about to be written or deleted, if directory statistics need it."""
+        if self.directory_stats is None:
+            return _SizeBeforeChange(UNKNOWN_SIZE)
+        version = self.directory_stats.version()
+        if not self.directory_stats.covers(bucket_name, object_key):
+            return _SizeBeforeChange(UNKNOWN_SIZE, version)
+        if self.metadata_index is not None:
+            indexed_file = await self.run_blocking(partial(self.metadata_index.get, bucket_name, object_key))
+            return _SizeBeforeChange(indexed_file.size_bytes if indexed_file else None, version)
+        try:
+            metadata = await self.run(read_objects.fetch_s3_object_metadata, bucket_name, object_key)
+        except ClientError as err:
+            if read_objects.is_missing_object_error(err):
+                return _SizeBeforeChange(None, version)
+            raise
+        return _SizeBeforeChange(metadata["ContentLength"], version)
+
+    async def _object_stored(
+        self, bucket_name: str, object_key: str, previous_size: _SizeBeforeChange, size_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Mirror an object that was written by this process into the metadata index and directory statistics.
+
+        :param size_bytes: The size of the object, if the write knew it, e.g. the length of an uploaded body.
+            Without a metadata index, it spares looking the object up after the write.
+        """
+        if self.metadata_index is None:
+            if self.directory_stats is None:
+                return
+            # the directory statistics only need the new size if they knew the old one
+            if previous_size.size_bytes == UNKNOWN_SIZE or not self.directory_stats.covers(bucket_name, object_key):
+                self.directory_stats.invalidate_file(bucket_name, object_key)
+                return
+            if size_bytes is not None:
+                self.directory_stats.file_written(
+                    bucket_name,
+                    object_key,
+                    previous_size.size_bytes,
+                    size_bytes,
+                    version=previous_size.directory_stats_version,
+                )
+                return
+        try:
+            metadata = await self.run(read_objects.fetch_s3_object_metadata, bucket_name, object_key)
+        except ClientError as err:
+            if not read_objects.is_missing_object_error(err):
+                raise
+            # deleted again in the meantime
+            await self._object_removed(bucket_name, object_key, previous_size)
+            return
+        if self.metadata_index is not None:
+            await self.run_blocking(
+                partial(
+                    self.metadata_index.upsert,
+                    bucket_name,
+                    object_key,
+                    size_bytes=metadata["ContentLength"],
+                    last_modified=metadata["LastModified"],
+                    etag=metadata.get("ETag"),
+                )
+            )
+        if self.directory_stats is not None:
+            if previous_size.size_bytes == UNKNOWN_SIZE:
+                self.directory_stats.invalidate_file(bucket_name, object_key)
+            else:
+                self.directory_stats.file_written(
+                    bucket_name,
+                    object_key,
+                    previous_size.size_bytes,
+                    metadata["ContentLength"],
+                    version=previous_size.directory_stats_version,
+                )
+
+    async def _object_removed(self, bucket_name: str, object_key: str, previous_size: _SizeBeforeChange) -> None:
+        """Remove an object that was deleted by this process from the metadata index and directory statistics."""
+        await self._unindex_objects(bucket_name, [object_key])
+        if self.directory_stats is not None:
+            if previous_size.size_bytes == UNKNOWN_SIZE:
+                self.directory_stats.invalidate_file(bucket_name, object_key)
+            elif previous_size.size_bytes is not None:
+                self.directory_stats.file_deleted(
+                    bucket_name, object_key, previous_size.size_bytes, version=previous_size.directory_stats_version
+                )
+
+    async def _unindex_objects(self, bucket_name: str, object_keys: List[str]) -> None:
+        """Remove objects that were deleted by this process from the metadata index."""
+        if self.metadata_index is not None and object_keys:
+            await self.run_blocking(partial(self.metadata_index.delete, bucket_name, object_keys))
+
+    def _object_deleted(self, bucket_name: str, object_key: str) -> None:
+        """Forget the cached metadata of an object that was (possibly) deleted by this process."""
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(bucket_name, object_key)
+        self._forget_reads_in_flight(bucket_name, object_key)
+
+    def _object_written(self, bucket_name: str, object_key: str) -> None:
+        """Forget what the caches know about an object that was (possibly) written by this process."""
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(bucket_name, object_key)
+        if self.negative_cache is not None:
+            self.negative_cache.record_written(bucket_name, object_key)
+        self._forget_reads_in_flight(bucket_name, object_key)
+
+    def _presigned_for_upload(self, bucket_name: str, object_key: str, expires_in_seconds: int) -> None:
+        """Stop caching an object that clients may now upload to directly, until the upload URL expires."""
+        self.pending_uploads.add(bucket_name, object_key, expires_in_seconds)
+        self._object_written(bucket_name, object_key)
+        if self.directory_stats is not None:
+            self.directory_stats.invalidate_file(bucket_name, object_key)
+
+    def _forget_reads_in_flight(self, bucket_name: str, object_key: str) -> None:
+        """Make later reads of a changed object call S3 themselves, not join a read from before the change."""
+        if self.single_flight is not None:
+            self.single_flight.forget(lambda key: key[1:3] == (bucket_name, object_key))
+
+
+class AsyncS3Backend(S3Backend):
+    """
+    Run the blocking boto3 helpers on worker threads so a slow S3 call never stalls the event loop.
+
+    The number of concurrent S3 calls is capped at the size of the S3 client's connection pool;
+    more threads than pooled connections would only queue inside botocore.
+    """
+
+    def __init__(
+        self,
+        s3_client: "S3Client",
+        max_concurrency: int,
+        transfer_config: Optional[TransferConfig] = None,
+        download_chunk_size: int = 1024 * 1024,
+        metadata_cache: Optional[MetadataCache] = None,
+        negative_cache: Optional[NegativeLookupCache] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        directory_stats: Optional[DirectoryStatsCache] = None,
+        copy_transfer_config: Optional[TransferConfig] = None,
+        single_flight: Optional[SingleFlight] = None,
+        single_flight_max_body_bytes: int = 1024 * 1024,
+    ):
+        super().__init__(
+            s3_client,
+            transfer_config,
+            download_chunk_size,
+            metadata_cache,
+            negative_cache,
+            metadata_index,
+            directory_stats,
+            copy_transfer_config,
+            single_flight,
+            single_flight_max_body_bytes,
+        )
+        self._limiter = anyio.CapacityLimiter(max_concurrency)
+
+    async def run_blocking(self, func: Callable[[], T]) -> T:
+        return await anyio.to_thread.run_sync(func, limiter=self._limiter)
+
+
+def create_s3_backend(settings: Settings, s3_client: "S3Client") -> S3Backend:
+    """
+    Create the storage backend selected by `settings.s3_backend`.
+
+    :param settings: The settings of the app.
+    :param s3_client: The shared S3 client the backend makes its calls with.
+
+    :return: The storage backend used by the route handlers.
+    """
+    transfer_config = create_transfer_config(settings)
+    copy_transfer_config = create_copy_transfer_config(settings)
+    download_chunk_size = settings.s3_download_chunk_size_bytes
+    metadata_cache = None
+    if settings.metadata_cache_enabled:
+        metadata_cache = MetadataCache(
+            max_entries=settings.metadata_cache_max_entries, ttl_seconds=settings.metadata_cache_ttl_seconds
+        )
+    negative_cache = None
+    if settings.negative_cache_enabled:
+        negative_cache = NegativeLookupCache(
+            max_entries=settings.negative_cache_max_entries,
+            ttl_seconds=settings.negative_cache_ttl_seconds,
+            bloom_max_age_seconds=settings.negative_cache_bloom_max_age_seconds,
+        )
+    metadata_index = None
+    if settings.metadata_index_path is not None:
+        metadata_index = MetadataIndex(settings.metadata_index_path)
+    directory_stats = None
+    if settings.directory_stats_enabled:
+        directory_stats = DirectoryStatsCache(
+            max_entries=settings.directory_stats_cache_max_entries,
+            ttl_seconds=settings.directory_stats_cache_ttl_seconds,
+        )
+    single_flight = SingleFlight() if settings.single_flight_enabled else None
+    if settings.s3_backend == "sync":
+        return S3Backend(
+            s3_client,
+            transfer_config,
+            download_chunk_size,
+            metadata_cache,
+            negative_cache,
+            metadata_index,
+            directory_stats,
+            copy_transfer_config,
+            single_flight,
+            settings.single_flight_max_body_bytes,
+        )
+    return AsyncS3Backend(
+        s3_client,
+        max_concurrency=settings.s3_max_pool_connections,
+        transfer_config=transfer_config,
+        download_chunk_size=download_chunk_size,
+        metadata_cache=metadata_cache,
+        negative_cache=negative_cache,
+        metadata_index=metadata_index,
+        directory_stats=directory_stats,
+        copy_transfer_config=copy_transfer_config,
+        single_flight=single_flight,
+        single_flight_max_body_bytes=settings.single_flight_max_body_bytes,
+    )
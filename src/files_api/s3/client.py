@@ -0,0 +1,76 @@
+"""Construct the S3 client shared by every request the API serves."""
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    pass
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from files_api.settings import Settings
+
+
+def create_s3_client(settings: Settings) -> "S3Client":
+    """
+    Create a pooled S3 client configured from the app settings.
+
+    boto3 clients are thread-safe, so one client (and its connection pool) can be reused
+    across requests instead of paying for credential resolution and new TLS connections
+    on every call.
+
+    :param settings: The settings of the app.
+
+    :return: A boto3 S3 client.
+    """
+    config = Config(
+        max_pool_connections=settings.s3_max_pool_connections,
+        tcp_keepalive=settings.s3_tcp_keepalive,
+        connect_timeout=settings.s3_connect_timeout_seconds,
+        read_timeout=settings.s3_read_timeout_seconds,
+        retries={
+            "max_attempts": settings.s3_max_retry_attempts,
+            "mode": settings.s3_retry_mode,
+        },
+    )
+    session = boto3.session.Session()
+    return session.client("s3", config=config)
+
+
+def create_transfer_config(settings: Settings) -> TransferConfig:
+    """
+    Create the config for boto3's managed (multipart) transfers from the app settings.
+
+    The managed transfer reads the source one part at a time, so at most a few parts per upload
+    are held in memory regardless of the size of the file.
+
+    :param settings: The settings of the app.
+
+    :return: A boto3 transfer config.
+    """
+    return TransferConfig(
+        multipart_threshold=settings.s3_multipart_threshold_bytes,
+        multipart_chunksize=settings.s3_multipart_part_size_bytes,
+        max_concurrency=settings.s3_multipart_max_concurrency,
+        use_threads=True,
+    )
+
+
+def create_copy_transfer_config(settings: Settings) -> TransferConfig:
+    """
+    Create the config for boto3's managed copies from the app settings.
+
+    Copies happen inside S3, so unlike uploads they do not need small parts to bound memory; the parts
+    are only there to copy objects over the 5 GiB limit of `copy_object`, and to copy them in parallel.
+
+    :param settings: The settings of the app.
+
+    :return: A boto3 transfer config.
+    """
+    return TransferConfig(
+        multipart_threshold=settings.s3_copy_multipart_threshold_bytes,
+        multipart_chunksize=settings.s3_copy_part_size_bytes,
+        max_concurrency=settings.s3_copy_max_concurrency,
+        use_threads=True,
+    )
@@ -1,22 +1,93 @@
 """Functions for deleting objects from an S3 bucket--the "D" in CRUD."""
 
-from typing import Optional
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+)
 
 try:
     from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import (
+        ErrorTypeDef,
+        ObjectIdentifierTypeDef,
+    )
 except ImportError:
     pass
 
 import boto3
 
+# the most keys a single `delete_objects` call accepts
+DELETE_OBJECTS_MAX_KEYS = 1_000
 
-def delete_s3_object(bucket_name: str, object_key: str, s3_client: Optional["S3Client"] = None) -> None:
+
+def delete_s3_object(
+    bucket_name: str,
+    object_key: str,
+    if_match: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> None:
     """
     Delete an object from the S3 bucket.
 
     :param bucket_name: Name of the S3 bucket.
     :param object_key: Key of the object to delete.
+    :param if_match: Optional ETag. If provided, the object is only deleted if its ETag matches,
+        otherwise S3 fails the call with "PreconditionFailed". A missing object fails with "NoSuchKey".
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    if if_match:
+        s3_client.delete_object(Bucket=bucket_name, Key=object_key, IfMatch=if_match)
+    else:
+        s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+
+
+def delete_s3_objects(
+    bucket_name: str,
+    object_keys: List[str],
+    etags: Optional[Dict[str, str]] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> List["ErrorTypeDef"]:
+    """
+    Delete up to `DELETE_OBJECTS_MAX_KEYS` objects from the S3 bucket with a single `delete_objects` call.
+
+    Like `delete_object`, deleting a key that does not exist succeeds.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param object_keys: Keys of the objects to delete.
+    :param etags: Optional ETags by key. A key with an ETag is only deleted if the object still has it,
+        otherwise S3 reports it with the code "PreconditionFailed".
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: The keys that could not be deleted, each with the error S3 reported for it,
+        e.g. {"Key": "a.txt", "Code": "AccessDenied", "Message": "Access Denied"}. Every other key was deleted.
     """
     s3_client = s3_client or boto3.client("s3")
-    s3_client.delete_object(Bucket=bucket_name, Key=object_key)
+    if not object_keys:
+        return []
+    etags = etags or {}
+    objects: List["ObjectIdentifierTypeDef"] = []
+    for object_key in object_keys:
+        if object_key in etags:
+            objects.append({"Key": object_key, "ETag": etags[object_key]})
+        else:
+            objects.append({"Key": object_key})
+    response = s3_client.delete_objects(
+        Bucket=bucket_name,
+        # in quiet mode, S3 only reports the keys that could not be deleted
+        Delete={"Objects": objects, "Quiet": True},
+    )
+    return response.get("Errors", [])
+
+
+def iter_delete_batches(object_keys: List[str], batch_size: int = DELETE_OBJECTS_MAX_KEYS) -> Iterator[List[str]]:
+    """
+    Split keys into batches that can each be deleted with a single `delete_s3_objects` call.
+
+    :param object_keys: Keys of the objects to delete.
+    :param batch_size: Number of keys per batch, at most `DELETE_OBJECTS_MAX_KEYS`.
+    """
+    for start in range(0, len(object_keys), batch_size):
+        yield object_keys[start : start + batch_size]
@@ -0,0 +1,230 @@
+"""Per-directory usage statistics that are computed once and then kept up to date as files change."""
+
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+# upper bounds (exclusive) of the buckets of the size histogram; the last bucket has no upper bound
+SIZE_HISTOGRAM_BOUNDARIES = (
+    1024,
+    64 * 1024,
+    1024 * 1024,
+    16 * 1024 * 1024,
+    256 * 1024 * 1024,
+    1024 * 1024 * 1024,
+)
+LARGEST_FILES_COUNT = 10
+# number of recently changed files whose version is remembered, see `DirectoryStatsCache.version`
+MAX_TRACKED_CHANGES = 10_000
+
+
+class DirectoryStats:
+    """
+    The number, total size, size histogram and largest files of the files under a directory.
+
+    :param directory: The prefix the files share.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.file_count = 0
+        self.total_bytes = 0
+        self.size_histogram = [0] * (len(SIZE_HISTOGRAM_BOUNDARIES) + 1)
+        # (size, path) of the largest files, largest first
+        self.largest_files: List[Tuple[int, str]] = []
+
+    @classmethod
+    def from_files(cls, directory: str, files: Iterable[Tuple[str, int]]) -> "DirectoryStats":
+        """Aggregate the (path, size) of every file under `directory`."""
+        stats = cls(directory)
+        for file_path, size_bytes in files:
+            stats.add(file_path, size_bytes)
+        return stats
+
+    def add(self, file_path: str, size_bytes: int) -> None:
+        """Count a file that was added to the directory."""
+        self.file_count += 1
+        self.total_bytes += size_bytes
+        self.size_histogram[bisect.bisect_right(SIZE_HISTOGRAM_BOUNDARIES, size_bytes)] += 1
+        if len(self.largest_files) < LARGEST_FILES_COUNT or size_bytes > self.largest_files[-1][0]:
+            self.largest_files.append((size_bytes, file_path))
+            self.largest_files.sort(key=lambda file: (-file[0], file[1]))
+            del self.largest_files[LARGEST_FILES_COUNT:]
+
+    def remove(self, file_path: str, size_bytes: int) -> bool:
+        """
+        Stop counting a file that was removed from the directory.
+
+        :return: False if the statistics can no longer be kept up to date and must be recomputed: the file
+            was one of the largest files, and the next largest file is not known.
+        """
+        self.file_count -= 1
+        self.total_bytes -= size_bytes
+        self.size_histogram[bisect.bisect_right(SIZE_HISTOGRAM_BOUNDARIES, size_bytes)] -= 1
+        if (size_bytes, file_path) in self.largest_files:
+            self.largest_files.remove((size_bytes, file_path))
+            # the list held every file of the directory, so it is still complete
+            return self.file_count == len(self.largest_files)
+        return True
+
+    def copy(self) -> "DirectoryStats":
+        stats = DirectoryStats(self.directory)
+        stats.file_count = self.file_count
+        stats.total_bytes = self.total_bytes
+        stats.size_histogram = list(self.size_histogram)
+        stats.largest_files = list(self.largest_files)
+        return stats
+
+
+class DirectoryStatsCache:
+    """
+    A size-bounded LRU cache of directory statistics, keyed by bucket and directory, whose entries expire after a TTL.
+
+    Writes and deletes made through this process update every cached directory that contains the file,
+    so a directory is only listed when its statistics are first requested, after they expire, and when
+    an update cannot be applied incrementally. Changes made by anyone else are picked up once the entry
+    expires.
+
+    Every change bumps the version of the cache. A change, or a full listing, that started before
+    another change of the same file was applied can not be applied, or cached, since it may be
+    outdated (see `version`); the affected directories are recomputed on demand instead.
+
+    The cache is safe to use from the worker threads of the async backend.
+
+    :param max_entries: Number of directories to keep statistics for; the least recently used one is evicted first.
+    :param ttl_seconds: Time after which an entry is recomputed.
+    :param clock: Returns the current time in seconds, `time.monotonic` by default.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, DirectoryStats]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        # the version at which each recently changed file was changed last
+        self._changed_at: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # changes and listings from before this version may have missed a change that is no longer tracked
+        self._oldest_tracked_version = 0
+
+    def version(self) -> int:
+        """Return the current version, to pass along with a change or listing whose size lookups start now."""
+        with self._lock:
+            return self._version
+
+    def get(self, bucket_name: str, directory: str) -> Optional[DirectoryStats]:
+        """Return a copy of the cached statistics of a directory, or None if they are not cached or have expired."""
+        with self._lock:
+            entry = self._entries.get((bucket_name, directory))
+            if entry is None or entry[0] <= self._clock():
+                self._entries.pop((bucket_name, directory), None)
+                return None
+            self._entries.move_to_end((bucket_name, directory))
+            return entry[1].copy()
+
+    def put(self, bucket_name: str, stats: DirectoryStats, version: Optional[int] = None) -> None:
+        """
+        Cache the statistics of a directory.
+
+        :param version: The `version` from before the files were listed. If a file of the directory
+            changed since, the listing may have missed the change and is not cached.
+        """
+        with self._lock:
+            if version is not None and self._directory_changed_since(bucket_name, stats.directory, version):
+                return
+            self._entries[(bucket_name, stats.directory)] = (self._clock() + self.ttl_seconds, stats.copy())
+            self._entries.move_to_end((bucket_name, stats.directory))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def covers(self, bucket_name: str, file_path: str) -> bool:
+        """Whether the statistics of any cached directory include `file_path`."""
+        with self._lock:
+            return any(self._containing_entries(bucket_name, file_path))
+
+    def file_written(  # pylint: disable=too-many-arguments
+        self,
+        bucket_name: str,
+        file_path: str,
+        old_size_bytes: Optional[int],
+        new_size_bytes: int,
+        version: Optional[int] = None,
+    ) -> None:
+        """
+        Update the directories that contain a file that was written.
+
+        :param old_size_bytes: The size of the file it replaced, or None if the file is new.
+        :param version: The `version` from before `old_size_bytes` was looked up. If the file changed
+            since, e.g. it was overwritten concurrently, the directories are dropped instead.
+        """
+        with self._lock:
+            if version is not None and self._file_changed_since(bucket_name, file_path, version):
+                self._drop_containing_entries(bucket_name, file_path)
+            else:
+                for key, stats in self._containing_entries(bucket_name, file_path):
+                    if old_size_bytes is not None and not stats.remove(file_path, old_size_bytes):
+                        del self._entries[key]
+                        continue
+                    stats.add(file_path, new_size_bytes)
+            self._record_change(bucket_name, file_path)
+
+    def file_deleted(self, bucket_name: str, file_path: str, size_bytes: int, version: Optional[int] = None) -> None:
+        """Update the directories that contained a file that was deleted, see `file_written`."""
+        with self._lock:
+            if version is not None and self._file_changed_since(bucket_name, file_path, version):
+                self._drop_containing_entries(bucket_name, file_path)
+            else:
+                for key, stats in self._containing_entries(bucket_name, file_path):
+                    if not stats.remove(file_path, size_bytes):
+                        del self._entries[key]
+            self._record_change(bucket_name, file_path)
+
+    def invalidate_file(self, bucket_name: str, file_path: str) -> None:
+        """Drop the directories that contain a file that changed in an unknown way; they are recomputed on demand."""
+        with self._lock:
+            self._drop_containing_entries(bucket_name, file_path)
+            self._record_change(bucket_name, file_path)
+
+    def _drop_containing_entries(self, bucket_name: str, file_path: str) -> None:
+        for key, _ in self._containing_entries(bucket_name, file_path):
+            del self._entries[key]
+
+    def _record_change(self, bucket_name: str, file_path: str) -> None:
+        self._version += 1
+        self._changed_at[(bucket_name, file_path)] = self._version
+        self._changed_at.move_to_end((bucket_name, file_path))
+        while len(self._changed_at) > MAX_TRACKED_CHANGES:
+            _, self._oldest_tracked_version = self._changed_at.popitem(last=False)
+
+    def _file_changed_since(self, bucket_name: str, file_path: str, version: int) -> bool:
+        if version < self._oldest_tracked_version:
+            return True
+        return self._changed_at.get((bucket_name, file_path), version) > version
+
+    def _directory_changed_since(self, bucket_name: str, directory: str, version: int) -> bool:
+        if version < self._oldest_tracked_version:
+            return True
+        return any(
+            changed_at > version
+            for (changed_bucket_name, file_path), changed_at in self._changed_at.items()
+            if changed_bucket_name == bucket_name and file_path.startswith(directory)
+        )
+
+    def _containing_entries(self, bucket_name: str, file_path: str) -> List[Tuple[Tuple[str, str], DirectoryStats]]:
+        return [
+            (key, stats)
+            for key, (_, stats) in self._entries.items()
+            if key[0] == bucket_name and file_path.startswith(key[1])
+        ]
+
+    def __len__(self) -> int:
+        return len(self._entries)
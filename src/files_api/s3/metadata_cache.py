@@ -0,0 +1,109 @@
+"""An in-process cache of object metadata, so hot keys can be described without an S3 round trip."""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+# the subset of a head_object/get_object response that describes the object itself
+CACHED_METADATA_KEYS = ("ContentType", "ContentLength", "ETag", "LastModified")
+
+
+class MetadataCache:
+    """
+    A size-bounded LRU cache of object metadata, keyed by bucket and key, whose entries expire after a TTL.
+
+    Writes and deletes made through this process invalidate their entry right away, and a read that was
+    in flight during the invalidation can not cache what it read, see `version`. Changes made by
+    anyone else (other workers, other services) are picked up once the entry expires, so the TTL is
+    the upper bound on how stale a cached entry can be.
+
+    The cache is safe to use from the worker threads of the async backend.
+
+    :param max_entries: Number of objects to keep metadata for; the least recently used one is evicted first.
+    :param ttl_seconds: Time after which an entry is no longer served.
+    :param clock: Returns the current time in seconds, `time.monotonic` by default.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        # the version at which each recently invalidated key was invalidated last
+        self._invalidated_at: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # reads from before this version may have missed an invalidation that is no longer tracked
+        self._oldest_tracked_version = 0
+
+    def version(self) -> int:
+        """Return the current version of the cache, to `put` the response of a read that starts now with."""
+        with self._lock:
+            return self._version
+
+    def get(self, bucket_name: str, object_key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached metadata of an object, or None if it is not cached or has expired."""
+        with self._lock:
+            entry = self._entries.get((bucket_name, object_key))
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[(bucket_name, object_key)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((bucket_name, object_key))
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, bucket_name: str, object_key: str, response: Dict[str, Any], version: Optional[int] = None) -> None:
+        """
+        Cache the metadata of an object from a `head_object` or (whole-object) `get_object` response.
+
+        :param version: The `version` of the cache from before the read. If the object was invalidated
+            since, e.g. because it was overwritten while the read was in flight, the response may be
+            stale and is not cached.
+        """
+        metadata = {key: response[key] for key in CACHED_METADATA_KEYS if key in response}
+        with self._lock:
+            if version is not None and self._invalidated_since(bucket_name, object_key, version):
+                return
+            self._entries[(bucket_name, object_key)] = (self._clock() + self.ttl_seconds, metadata)
+            self._entries.move_to_end((bucket_name, object_key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bucket_name: str, object_key: str) -> None:
+        """Drop the cached metadata of an object, e.g. because it was overwritten or deleted."""
+        with self._lock:
+            self._entries.pop((bucket_name, object_key), None)
+            self._version += 1
+            self._invalidated_at[(bucket_name, object_key)] = self._version
+            self._invalidated_at.move_to_end((bucket_name, object_key))
+            while len(self._invalidated_at) > self.max_entries:
+                _, self._oldest_tracked_version = self._invalidated_at.popitem(last=False)
+
+    def _invalidated_since(self, bucket_name: str, object_key: str, version: int) -> bool:
+        if version < self._oldest_tracked_version:
+            return True
+        return self._invalidated_at.get((bucket_name, object_key), version) > version
+
+    def clear(self) -> None:
+        """Drop every entry; the hit and miss counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters and the current number of entries."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,143 @@
+"""Functions for running S3 multipart uploads one call at a time, so an upload can span many requests.
+
+S3 keeps the parts of an upload until it is completed or aborted, so an upload that is neither
+keeps using storage. `abort_stale_multipart_uploads` cleans those up.
+"""
+
+from datetime import datetime
+from typing import (
+    BinaryIO,
+    List,
+    Optional,
+)
+
+import boto3
+from botocore.exceptions import ClientError
+
+try:
+    from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import PartTypeDef
+except ImportError:
+    pass
+
+
+def create_multipart_upload(
+    bucket_name: str, object_key: str, content_type: Optional[str] = None, s3_client: Optional["S3Client"] = None
+) -> str:
+    """
+    Start a multipart upload.
+
+    :return: The ID of the upload, which its parts, completion and abortion refer to.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    response = s3_client.create_multipart_upload(
+        Bucket=bucket_name, Key=object_key, ContentType=content_type or "application/octet-stream"
+    )
+    return response["UploadId"]
+
+
+def upload_part(  # pylint: disable=too-many-arguments
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    part_number: int,
+    fileobj: BinaryIO,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Upload one part of a multipart upload, replacing any part uploaded before with the same number.
+
+    :param part_number: The position of the part in the object, from 1 to 10000.
+    :param fileobj: The content of the part; at least 5 MiB, unless it is the last part.
+
+    :return: The ETag of the part.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    response = s3_client.upload_part(
+        Bucket=bucket_name, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=fileobj
+    )
+    return response["ETag"]
+
+
+def list_uploaded_parts(
+    bucket_name: str, object_key: str, upload_id: str, s3_client: Optional["S3Client"] = None
+) -> List["PartTypeDef"]:
+    """Return the parts of a multipart upload that have been uploaded so far, in order of their numbers."""
+    s3_client = s3_client or boto3.client("s3")
+    paginator = s3_client.get_paginator("list_parts")
+    parts: List["PartTypeDef"] = []
+    for page in paginator.paginate(Bucket=bucket_name, Key=object_key, UploadId=upload_id):
+        parts.extend(page.get("Parts", []))
+    return parts
+
+
+def complete_multipart_upload(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    parts: List["PartTypeDef"],
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Join the parts of a multipart upload into the object.
+
+    :param parts: The parts to join, in order; see `list_uploaded_parts`.
+
+    :return: The ETag of the object.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    response = s3_client.complete_multipart_upload(
+        Bucket=bucket_name,
+        Key=object_key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in parts]},
+    )
+    return response["ETag"]
+
+
+def abort_multipart_upload(
+    bucket_name: str, object_key: str, upload_id: str, s3_client: Optional["S3Client"] = None
+) -> None:
+    """Abort a multipart upload and discard its parts."""
+    s3_client = s3_client or boto3.client("s3")
+    s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+
+
+def abort_stale_multipart_uploads(
+    bucket_name: str, initiated_before: datetime, s3_client: Optional["S3Client"] = None
+) -> List[str]:
+    """
+    Abort every multipart upload of the bucket that was started before `initiated_before`.
+
+    Uploads that are completed or aborted by someone else in the meantime are skipped.
+
+    :param initiated_before: An aware datetime.
+
+    :return: The keys of the objects whose uploads were aborted.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    paginator = s3_client.get_paginator("list_multipart_uploads")
+    aborted_keys: List[str] = []
+    for page in paginator.paginate(Bucket=bucket_name):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] >= initiated_before:
+                continue
+            try:
+                abort_multipart_upload(bucket_name, upload["Key"], upload["UploadId"], s3_client=s3_client)
+            except ClientError as err:
+                if is_missing_upload_error(err):
+                    continue
+                raise
+            aborted_keys.append(upload["Key"])
+    return aborted_keys
+
+
+def is_missing_upload_error(err: ClientError) -> bool:
+    """
+    Check if an error raised by an S3 call means that the multipart upload does not exist.
+
+    :param err: Error raised by boto3.
+
+    :return: True if the upload was never started, or has been completed or aborted.
+    """
+    return err.response["Error"]["Code"] == "NoSuchUpload"
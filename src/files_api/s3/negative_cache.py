@@ -0,0 +1,190 @@
+"""Remember which objects do not exist, so repeated lookups of missing keys do not each cost an S3 call."""
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+
+class BloomFilter:
+    """
+    A set of strings that answers "definitely not a member" exactly and "maybe a member" with a
+    small false positive rate, in a fraction of the memory of the set itself.
+
+    :param n_bits: Size of the bit array.
+    :param n_hashes: Number of bits set per item.
+    """
+
+    def __init__(self, n_bits: int, n_hashes: int):
+        self.n_bits = n_bits
+        self.n_hashes = n_hashes
+        self._bits = bytearray((n_bits + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items: Iterable[str], n_items: int, false_positive_rate: float) -> "BloomFilter":
+        """
+        Create a filter sized for `n_items` at the given false positive rate and add `items` to it.
+
+        :param items: The members of the filter.
+        :param n_items: Number of items the filter is sized for; adding more raises the false positive rate.
+        :param false_positive_rate: Target probability that a non-member is reported as "maybe a member".
+        """
+        n_items = max(n_items, 1)
+        n_bits = math.ceil(-n_items * math.log(false_positive_rate) / math.log(2) ** 2)
+        bloom_filter = cls(n_bits=n_bits, n_hashes=max(1, round(n_bits / n_items * math.log(2))))
+        for item in items:
+            bloom_filter.add(item)
+        return bloom_filter
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # double hashing: derive all n_hashes positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.n_bits for i in range(self.n_hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+
+class NegativeLookupCache:
+    """
+    Remember which objects were found missing, so that a burst of lookups of a missing key costs one S3 call.
+
+    Missing keys are remembered for a short TTL. Optionally, a Bloom filter of every key under a prefix
+    (see `load_bloom_filter`) answers lookups of keys under that prefix that were never seen before:
+    a key the filter definitely does not contain is reported as missing without asking S3.
+
+    Writes made through this process must call `record_written` so that a new object is never reported
+    as missing, not even by a lookup that was in flight during the write (see `version`). Objects created
+    by anyone else are seen once their negative entry expires, or once the Bloom filter is older than
+    `bloom_max_age_seconds` (until then, they may be reported as missing).
+
+    :param max_entries: Number of missing keys to remember; the oldest one is forgotten first.
+    :param ttl_seconds: Time for which a missing key is remembered.
+    :param bloom_max_age_seconds: Time after which a Bloom filter is no longer used.
+    :param clock: Returns the current time in seconds, `time.monotonic` by default.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        bloom_max_age_seconds: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bloom_max_age_seconds = bloom_max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._missing_keys: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # bucket name -> (prefix, filter of the keys under the prefix, time after which the filter is stale)
+        self._bloom_filters: Dict[str, Tuple[str, BloomFilter, float]] = {}
+        # bucket name -> keys written while a new Bloom filter of the bucket is being built
+        self._writes_during_build: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        # the version at which each recently written key was written last
+        self._written_at: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # lookups from before this version may have missed a write that is no longer tracked
+        self._oldest_tracked_version = 0
+
+    def version(self) -> int:
+        """Return the current version of the cache, to record the outcome of a lookup that starts now with."""
+        with self._lock:
+            return self._version
+
+    def is_known_missing(self, bucket_name: str, object_key: str) -> bool:
+        """Check if an object is known not to exist, in which case S3 does not need to be asked."""
+        with self._lock:
+            now = self._clock()
+            expires_at = self._missing_keys.get((bucket_name, object_key))
+            if expires_at is not None and expires_at <= now:
+                del self._missing_keys[(bucket_name, object_key)]
+                expires_at = None
+            known_missing = expires_at is not None or self._bloom_filter_excludes(bucket_name, object_key, now)
+            if known_missing:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return known_missing
+
+    def _bloom_filter_excludes(self, bucket_name: str, object_key: str, now: float) -> bool:
+        prefix, bloom_filter, stale_at = self._bloom_filters.get(bucket_name, ("", None, 0.0))
+        if bloom_filter is None or stale_at <= now or not object_key.startswith(prefix):
+            return False
+        return object_key not in bloom_filter
+
+    def record_missing(self, bucket_name: str, object_key: str, version: Optional[int] = None) -> None:
+        """
+        Remember that S3 reported an object as missing.
+
+        :param version: The `version` of the cache from before the lookup. If the object was written
+            since, e.g. while the lookup was in flight, it is not remembered as missing.
+        """
+        with self._lock:
+            if version is not None and self._written_since(bucket_name, object_key, version):
+                return
+            self._missing_keys[(bucket_name, object_key)] = self._clock() + self.ttl_seconds
+            self._missing_keys.move_to_end((bucket_name, object_key))
+            while len(self._missing_keys) > self.max_entries:
+                self._missing_keys.popitem(last=False)
+
+    def record_written(self, bucket_name: str, object_key: str) -> None:
+        """Forget that an object was missing, because it was (or is being) written."""
+        with self._lock:
+            self._missing_keys.pop((bucket_name, object_key), None)
+            self._version += 1
+            self._written_at[(bucket_name, object_key)] = self._version
+            self._written_at.move_to_end((bucket_name, object_key))
+            while len(self._written_at) > self.max_entries:
+                _, self._oldest_tracked_version = self._written_at.popitem(last=False)
+            prefix, bloom_filter, _ = self._bloom_filters.get(bucket_name, ("", None, 0.0))
+            if bloom_filter is not None and object_key.startswith(prefix):
+                bloom_filter.add(object_key)
+            if bucket_name in self._writes_during_build:
+                self._writes_during_build[bucket_name].add(object_key)
+
+    def _written_since(self, bucket_name: str, object_key: str, version: int) -> bool:
+        if version < self._oldest_tracked_version:
+            return True
+        return self._written_at.get((bucket_name, object_key), version) > version
+
+    def begin_bloom_filter_build(self, bucket_name: str) -> None:
+        """
+        Start tracking the keys written to a bucket, before listing the keys for a new Bloom filter.
+
+        The listing may miss objects written while it runs; `load_bloom_filter` adds them back.
+        """
+        with self._lock:
+            self._writes_during_build[bucket_name] = set()
+
+    def load_bloom_filter(self, bucket_name: str, prefix: str, bloom_filter: BloomFilter) -> None:
+        """
+        Use a Bloom filter of every key under `prefix` to answer lookups of keys under it.
+
+        The filter replaces any previous filter of the bucket and is used for `bloom_max_age_seconds`.
+        """
+        with self._lock:
+            for object_key in self._writes_during_build.pop(bucket_name, ()):
+                bloom_filter.add(object_key)
+            self._bloom_filters[bucket_name] = (prefix, bloom_filter, self._clock() + self.bloom_max_age_seconds)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit and miss counters and the current number of remembered missing keys."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._missing_keys)}
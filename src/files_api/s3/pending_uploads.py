@@ -0,0 +1,61 @@
+"""The keys that clients may still upload to with presigned URLs, which the caches must not describe."""
+
+import heapq
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+
+
+class PendingUploads:
+    """
+    The objects that clients may write directly to S3 until their presigned upload URLs expire.
+
+    Those writes bypass this process, so nothing invalidates what the caches know about the objects.
+    The backend therefore does not cache the metadata, absence, or directory statistics of an object
+    while an upload URL for it is valid.
+
+    The set is safe to use from the worker threads of the async backend.
+
+    :param clock: Returns the current time in seconds, `time.monotonic` by default.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._expires_at: Dict[Tuple[str, str], float] = {}
+        # (expiry, bucket, key) of every URL handed out, to drop expired keys without scanning them all
+        self._expiries: List[Tuple[float, str, str]] = []
+        self._lock = threading.Lock()
+
+    def add(self, bucket_name: str, object_key: str, expires_in_seconds: float) -> None:
+        """Remember that an object may be uploaded to with a URL that expires in `expires_in_seconds`."""
+        with self._lock:
+            self._drop_expired()
+            expires_at = self._clock() + expires_in_seconds
+            if expires_at > self._expires_at.get((bucket_name, object_key), 0.0):
+                self._expires_at[(bucket_name, object_key)] = expires_at
+                heapq.heappush(self._expiries, (expires_at, bucket_name, object_key))
+
+    def contains(self, bucket_name: str, object_key: str) -> bool:
+        """Return whether an object may still be uploaded to with a presigned URL."""
+        with self._lock:
+            expires_at = self._expires_at.get((bucket_name, object_key))
+            return expires_at is not None and expires_at > self._clock()
+
+    def any_under(self, bucket_name: str, prefix: str) -> bool:
+        """Return whether any object under `prefix` may still be uploaded to with a presigned URL."""
+        with self._lock:
+            self._drop_expired()
+            return any(bucket == bucket_name and key.startswith(prefix) for bucket, key in self._expires_at)
+
+    def _drop_expired(self) -> None:
+        now = self._clock()
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, bucket_name, object_key = heapq.heappop(self._expiries)
+            # a later URL for the same key keeps it pending
+            if self._expires_at.get((bucket_name, object_key)) == expires_at:
+                del self._expires_at[(bucket_name, object_key)]
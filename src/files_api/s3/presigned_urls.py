@@ -0,0 +1,111 @@
+"""Presigned URLs, with which clients transfer file content straight to and from S3 instead of through the API."""
+
+from typing import (
+    List,
+    Optional,
+)
+
+import boto3
+
+try:
+    from mypy_boto3_s3 import S3Client
+except ImportError:
+    pass
+
+# SigV4 presigned URLs are valid for at most 7 days
+MAX_PRESIGNED_URL_EXPIRY_SECONDS = 7 * 24 * 3600
+
+
+def create_presigned_download_url(
+    bucket_name: str, object_key: str, expires_in_seconds: int, s3_client: Optional["S3Client"] = None
+) -> str:
+    """
+    Create a URL that downloads an object with a plain `GET`, `Range` requests included.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param expires_in_seconds: Time for which the URL is valid.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    return s3_client.generate_presigned_url(
+        "get_object", Params={"Bucket": bucket_name, "Key": object_key}, ExpiresIn=expires_in_seconds
+    )
+
+
+def create_presigned_upload_url(
+    bucket_name: str,
+    object_key: str,
+    expires_in_seconds: int,
+    content_type: Optional[str] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Create a URL that uploads an object of up to 5 GiB with a single `PUT` of its content.
+
+    :param content_type: The MIME type the object is stored with. The `PUT` must send the same `Content-Type`
+        header, since it is part of the signature.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    params = {"Bucket": bucket_name, "Key": object_key, "ContentType": content_type or "application/octet-stream"}
+    return s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in_seconds)
+
+
+def create_presigned_upload_part_urls(  # pylint: disable=too-many-arguments
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    part_numbers: List[int],
+    expires_in_seconds: int,
+    s3_client: Optional["S3Client"] = None,
+) -> List[str]:
+    """
+    Create one URL per part of a multipart upload, each of which uploads the part with a `PUT` of its content.
+
+    The `ETag` header of each `PUT` response is needed to complete the upload.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    return [
+        s3_client.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket_name, "Key": object_key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expires_in_seconds,
+        )
+        for part_number in part_numbers
+    ]
+
+
+def create_presigned_complete_url(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    expires_in_seconds: int,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Create a URL that completes a multipart upload with a `POST` of the `CompleteMultipartUpload` XML document.
+
+    See https://docs.aws.amazon.com/AmazonS3/latest/API/API_CompleteMultipartUpload.html
+    """
+    s3_client = s3_client or boto3.client("s3")
+    return s3_client.generate_presigned_url(
+        "complete_multipart_upload",
+        Params={"Bucket": bucket_name, "Key": object_key, "UploadId": upload_id},
+        ExpiresIn=expires_in_seconds,
+    )
+
+
+def create_presigned_abort_url(
+    bucket_name: str,
+    object_key: str,
+    upload_id: str,
+    expires_in_seconds: int,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """Create a URL that aborts a multipart upload, and frees the storage of its parts, with a `DELETE`."""
+    s3_client = s3_client or boto3.client("s3")
+    return s3_client.generate_presigned_url(
+        "abort_multipart_upload",
+        Params={"Bucket": bucket_name, "Key": object_key, "UploadId": upload_id},
+        ExpiresIn=expires_in_seconds,
+    )
@@ -1,19 +1,26 @@
 """Functions for reading objects from an S3 bucket--the "R" in CRUD."""
 
+from datetime import datetime
 from typing import (
     Any,
+    Iterator,
+    List,
     Optional,
+    Tuple,
 )
 
 try:
     from mypy_boto3_s3 import S3Client
     from mypy_boto3_s3.type_defs import (
         GetObjectOutputTypeDef,
+        HeadObjectOutputTypeDef,
         ObjectTypeDef,
     )
 except ImportError:
     ...
 import boto3
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
 
 DEFAULT_MAX_KEYS = 1_000
 
@@ -32,33 +39,147 @@ def object_exists_in_s3(bucket_name: str, object_key: str, s3_client: Optional["
     try:
         s3_client.head_object(Bucket=bucket_name, Key=object_key)
     except s3_client.exceptions.ClientError as err:
-        error_code = err.response["Error"]["Code"]
-        if error_code == "404":
+        if is_missing_object_error(err):
             return False
         raise
     return True
 
 
+def is_missing_object_error(err: ClientError) -> bool:
+    """
+    Check if an error raised by an S3 call means that the object does not exist.
+
+    `head_object` reports a missing key as a bare "404" since HEAD responses have no body,
+    while `get_object` and `delete_object` report it as "NoSuchKey".
+
+    :param err: Error raised by boto3.
+
+    :return: True if the object does not exist, False otherwise.
+    """
+    return err.response["Error"]["Code"] in ("404", "NoSuchKey")
+
+
+def is_not_modified_error(err: ClientError) -> bool:
+    """
+    Check if an error raised by an S3 call means that a conditional read found the object unchanged.
+
+    :param err: Error raised by boto3.
+
+    :return: True if the object was not modified, False otherwise.
+    """
+    return err.response["Error"]["Code"] == "304"
+
+
+def fetch_s3_object_metadata(
+    bucket_name: str,
+    object_key: str,
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[datetime] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> "HeadObjectOutputTypeDef":
+    """
+    Fetch metadata of an object in the S3 bucket using a single head_object call.
+
+    :param bucket_name: Name of the S3 bucket.
+    :param object_key: Key of the object to fetch.
+    :param if_none_match: Optional ETag. If it matches the object's, S3 fails the call with "304".
+    :param if_modified_since: Optional date. If the object was not modified since, S3 fails the call with "304".
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: Metadata of the object, e.g. ContentType, ContentLength, LastModified, ETag.
+
+    :raises ClientError: If the object does not exist, see `is_missing_object_error`,
+        or if it was not modified, see `is_not_modified_error`.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    params: dict[str, Any] = {"Bucket": bucket_name, "Key": object_key}
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    if if_modified_since:
+        params["IfModifiedSince"] = if_modified_since
+
+    return s3_client.head_object(**params)
+
+
 def fetch_s3_object(
     bucket_name: str,
     object_key: str,
+    byte_range: Optional[str] = None,
+    if_match: Optional[str] = None,
+    if_unmodified_since: Optional[datetime] = None,
+    if_none_match: Optional[str] = None,
+    if_modified_since: Optional[datetime] = None,
     s3_client: Optional["S3Client"] = None,
 ) -> "GetObjectOutputTypeDef":
     """
-    Fetch metadata of an object in the S3 bucket.
+    Fetch an object, i.e. its metadata and a stream of its content, from the S3 bucket.
 
     :param bucket_name: Name of the S3 bucket.
     :param object_key: Key of the object to fetch.
+    :param byte_range: Optional single byte range to fetch, e.g. "bytes=0-99". The response then
+        describes the returned range under the "ContentRange" key.
+    :param if_match: Optional ETag. If it does not match the object's, S3 fails the call with "PreconditionFailed".
+    :param if_unmodified_since: Optional date. If the object was modified since, S3 fails the call
+        with "PreconditionFailed".
+    :param if_none_match: Optional ETag. If it matches the object's, S3 fails the call with "304"
+        instead of sending the content again.
+    :param if_modified_since: Optional date. If the object was not modified since, S3 fails the call with "304".
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
 
-    :return: Metadata of the object.
+    :return: Metadata of the object and its content under the "Body" key.
+
+    :raises ClientError: If the object does not exist, see `is_missing_object_error`, if it was
+        not modified, see `is_not_modified_error`, or if the byte range is not satisfiable ("InvalidRange").
     """
     s3_client = s3_client or boto3.client("s3")
-    response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+    params: dict[str, Any] = {"Bucket": bucket_name, "Key": object_key}
+    if byte_range:
+        params["Range"] = byte_range
+    if if_match:
+        params["IfMatch"] = if_match
+    if if_unmodified_since:
+        params["IfUnmodifiedSince"] = if_unmodified_since
+    if if_none_match:
+        params["IfNoneMatch"] = if_none_match
+    if if_modified_since:
+        params["IfModifiedSince"] = if_modified_since
+
+    response = s3_client.get_object(**params)
 
     return response
 
 
+def iter_s3_object_body(body: StreamingBody, chunk_size: int) -> Iterator[bytes]:
+    """
+    Read the content of a fetched object in fixed-size chunks.
+
+    Iterating a `StreamingBody` directly splits it into lines, which turns binary content
+    into many tiny (or a few huge) reads. The connection is released once the iterator is
+    exhausted or closed early, e.g. because the client went away.
+
+    :param body: The "Body" of a `fetch_s3_object` response.
+    :param chunk_size: Number of bytes per chunk; the last chunk may be smaller.
+
+    :return: An iterator over the chunks of the content.
+    """
+    try:
+        yield from body.iter_chunks(chunk_size)
+    finally:
+        body.close()
+
+
+def read_s3_object_body(body: StreamingBody) -> bytes:
+    """
+    Read the whole content of a fetched object, and release the connection.
+
+    :param body: The "Body" of a `fetch_s3_object` response.
+    """
+    try:
+        return body.read()
+    finally:
+        body.close()
+
+
 def fetch_s3_objects_using_page_token(
     bucket_name: str,
     continuation_token: str,
@@ -93,6 +214,7 @@ def fetch_s3_objects_metadata(
     bucket_name: str,
     prefix: Optional[str] = None,
     max_keys: Optional[int] = DEFAULT_MAX_KEYS,
+    start_after: Optional[str] = None,
     s3_client: Optional["S3Client"] = None,
 ) -> tuple[list["ObjectTypeDef"], Optional[str]]:
     """
@@ -101,6 +223,7 @@ def fetch_s3_objects_metadata(
     :param bucket_name: Name of the S3 bucket to list objects from.
     :param prefix: Prefix to filter objects by.
     :param max_keys: Maximum number of keys to return within this page.
+    :param start_after: Optional key to start listing after, e.g. the last key of the previous page.
     :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
 
     :return: Tuple of a list of objects and the next continuation token.
@@ -112,9 +235,58 @@ def fetch_s3_objects_metadata(
 
     if prefix:
         params["Prefix"] = prefix
+    if start_after:
+        params["StartAfter"] = start_after
 
     response = s3_client.list_objects_v2(**params)
     objects = response.get("Contents", [])
     next_token = response.get("NextContinuationToken")
 
     return objects, next_token
+
+
+def fetch_s3_object_keys(bucket_name: str, prefix: str = "", s3_client: Optional["S3Client"] = None) -> List[str]:
+    """
+    Fetch the keys of every object under a prefix, following as many pages as needed.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by; by default, every object in the bucket is listed.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: The keys of the objects.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+    return [obj["Key"] for page in pages for obj in page.get("Contents", [])]
+
+
+def iter_s3_objects_pages(
+    bucket_name: str,
+    prefix: str = "",
+    delimiter: Optional[str] = None,
+    max_keys: int = DEFAULT_MAX_KEYS,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[Tuple[List["ObjectTypeDef"], List[str]]]:
+    """
+    Walk every page of a listing, fetching the next page only once the previous one was consumed.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by; by default, every object in the bucket is listed.
+    :param delimiter: Optional delimiter, e.g. "/". If given, objects below the next delimiter after the
+        prefix are not listed; instead, each of their "subdirectories" is listed once as a common prefix.
+    :param max_keys: Maximum number of objects and common prefixes per page.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: An iterator over pages, each a tuple of:
+        1. Possibly empty list of objects in the page.
+        2. Possibly empty list of common prefixes in the page, e.g. ["folder/subfolder/"].
+    """
+    s3_client = s3_client or boto3.client("s3")
+    params: dict[str, Any] = {"Bucket": bucket_name, "Prefix": prefix, "PaginationConfig": {"PageSize": max_keys}}
+    if delimiter:
+        params["Delimiter"] = delimiter
+
+    for page in s3_client.get_paginator("list_objects_v2").paginate(**params):
+        common_prefixes = [common_prefix["Prefix"] for common_prefix in page.get("CommonPrefixes", [])]
+        yield page.get("Contents", []), common_prefixes
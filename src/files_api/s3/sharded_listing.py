@@ -0,0 +1,203 @@
+"""List very large prefixes by splitting them into "subdirectory" shards that are listed concurrently.
+
+`list_objects_v2` pages are strictly sequential: each page needs the continuation token of the
+previous one. Keys that share a sub-prefix are contiguous in key order though, so the sub-prefixes
+S3 reports as common prefixes split a listing into independent shards whose (sorted) results can be
+concatenated back into key order.
+"""
+
+import heapq
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    Any,
+    Deque,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+try:
+    from mypy_boto3_s3 import S3Client
+    from mypy_boto3_s3.type_defs import ObjectTypeDef
+except ImportError:
+    pass
+
+import boto3
+
+from files_api.s3.read_objects import (
+    DEFAULT_MAX_KEYS,
+    iter_s3_objects_pages,
+)
+
+# a segment of the listing, in key order: either an object listed during shard discovery, or a shard's prefix
+Segment = Union["ObjectTypeDef", str]
+
+# pages of a shard listed ahead of the consumer, per shard
+SHARD_PAGES_BUFFERED = 2
+
+# how often a shard blocked on a full buffer checks whether the listing was closed
+_STOP_POLL_INTERVAL_SECONDS = 0.1
+
+# sent by a shard after its last page
+_SHARD_DONE = object()
+
+
+def discover_shards(
+    bucket_name: str,
+    prefix: str = "",
+    delimiter: str = "/",
+    depth: int = 1,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[Segment]:
+    """
+    Split a prefix into shards by listing it with a delimiter.
+
+    The listing is read one page at a time as the segments are consumed, so a flat prefix with
+    millions of objects is never held in memory at once.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to split.
+    :param delimiter: Delimiter that separates "directories" in the keys.
+    :param depth: Number of directory levels to split; 2 also splits every shard found at the first level.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: The segments of the listing in key order: the objects directly under the split
+        "directories" and the prefixes of the shards, which together cover every key under `prefix`.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    for objects, common_prefixes in iter_s3_objects_pages(
+        bucket_name, prefix, delimiter=delimiter, s3_client=s3_client
+    ):
+        # every key under a common prefix starts with it, so a key that does not sorts either before
+        # all of them (if it sorts before the prefix) or after all of them
+        for segment in heapq.merge(objects, common_prefixes, key=_segment_start):
+            if isinstance(segment, str) and depth > 1:
+                yield from discover_shards(bucket_name, segment, delimiter, depth - 1, s3_client)
+            else:
+                yield segment
+
+
+def _segment_start(segment: Segment) -> str:
+    return segment if isinstance(segment, str) else segment["Key"]
+
+
+def _list_shard(
+    bucket_name: str,
+    shard_prefix: str,
+    pages: "queue.Queue[Any]",
+    stopped: threading.Event,
+    s3_client: "S3Client",
+) -> None:
+    """
+    List a shard, handing its pages to the consumer through a bounded queue.
+
+    The pages are followed by `_SHARD_DONE`, or by the error that ended the listing. The listing
+    stops early once `stopped` is set.
+    """
+    try:
+        for objects, _ in iter_s3_objects_pages(bucket_name, shard_prefix, s3_client=s3_client):
+            if not _put_unless_stopped(pages, objects, stopped):
+                return
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        _put_unless_stopped(pages, err, stopped)
+        return
+    _put_unless_stopped(pages, _SHARD_DONE, stopped)
+
+
+def _put_unless_stopped(pages: "queue.Queue[Any]", item: Any, stopped: threading.Event) -> bool:
+    while not stopped.is_set():
+        try:
+            pages.put(item, timeout=_STOP_POLL_INTERVAL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _iter_shard(pages: "queue.Queue[Any]") -> Iterator["ObjectTypeDef"]:
+    while (page := pages.get()) is not _SHARD_DONE:
+        if isinstance(page, Exception):
+            raise page
+        yield from page
+
+
+def iter_s3_objects_sharded(
+    bucket_name: str,
+    prefix: str = "",
+    max_concurrency: int = 8,
+    delimiter: str = "/",
+    depth: int = 1,
+    page_size: int = DEFAULT_MAX_KEYS,
+    s3_client: Optional["S3Client"] = None,
+) -> Iterator[List["ObjectTypeDef"]]:
+    """
+    List every object under a prefix, listing its shards (see `discover_shards`) concurrently.
+
+    The objects are yielded in key order, in pages of up to `page_size` objects, as soon as the shards
+    they belong to are listed. At most `2 * max_concurrency` shards are listed ahead of the one being
+    yielded, each at most `SHARD_PAGES_BUFFERED` pages ahead, and at most `page_size` objects are
+    discovered ahead, so memory is bounded by a few pages per shard rather than by the listing's size.
+
+    :param bucket_name: Name of the S3 bucket to list objects from.
+    :param prefix: Prefix to filter objects by; by default, every object in the bucket is listed.
+    :param max_concurrency: Number of shards listed at once. The S3 client's connection pool
+        should be at least this large.
+    :param delimiter: Delimiter that separates "directories" in the keys.
+    :param depth: Number of directory levels to split into shards, see `discover_shards`.
+    :param page_size: Maximum number of objects per yielded page.
+    :param s3_client: Optional S3 client to use. If not provided, a new client will be created.
+
+    :return: An iterator over pages of objects, in key order.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    segments = discover_shards(bucket_name, prefix, delimiter, depth, s3_client)
+    stopped = threading.Event()
+    # the pool is not used as a context manager: its exit would wait for the shards being listed,
+    # and closing this generator, e.g. because the client disconnected, must not block until they are done
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="s3-listing")
+    # the segments discovered ahead of the consumer, with the shards replaced by the queues of their pages;
+    # the pool starts the shards in order, so the one being read is always being listed
+    ahead: Deque[Union["ObjectTypeDef", "queue.Queue[Any]"]] = deque()
+    shards_ahead = 0
+
+    def discover_ahead() -> None:
+        nonlocal shards_ahead
+        while shards_ahead < 2 * max_concurrency and len(ahead) - shards_ahead < page_size:
+            segment = next(segments, None)
+            if segment is None:
+                return
+            if isinstance(segment, str):
+                pages: "queue.Queue[Any]" = queue.Queue(maxsize=SHARD_PAGES_BUFFERED)
+                pool.submit(_list_shard, bucket_name, segment, pages, stopped, s3_client)
+                ahead.append(pages)
+                shards_ahead += 1
+            else:
+                ahead.append(segment)
+
+    def iter_objects() -> Iterator["ObjectTypeDef"]:
+        nonlocal shards_ahead
+        while True:
+            discover_ahead()
+            if not ahead:
+                return
+            segment = ahead.popleft()
+            if isinstance(segment, queue.Queue):
+                shards_ahead -= 1
+                discover_ahead()
+                yield from _iter_shard(segment)
+            else:
+                yield segment
+
+    try:
+        objects = iter_objects()
+        while page := list(islice(objects, page_size)):
+            yield page
+    finally:
+        # stop listing shards nobody is going to read
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
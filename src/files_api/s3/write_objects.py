@@ -1,8 +1,13 @@
 """Functions for writing objects from an S3 bucket--the "C" and "U" in CRUD."""
 
-from typing import Optional
+import os
+from typing import (
+    BinaryIO,
+    Optional,
+)
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 
 try:
     from mypy_boto3_s3 import S3Client
@@ -16,7 +21,7 @@ def upload_s3_object(
     file_content: bytes,
     content_type: Optional[str] = None,
     s3_client: Optional["S3Client"] = None,
-) -> None:
+) -> str:
     """
     Upload a file to an S3 bucket.
 
@@ -25,7 +30,99 @@ def upload_s3_object(
     :param file_content: The content of the file to upload.
     :param content_type: The MIME type of the file, e.g. "text/plain" for a text file.
     :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+
+    :return: The ETag of the uploaded object.
     """
     s3_client = s3_client or boto3.client("s3")
     content_type = content_type or "application/octet-stream"
-    s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=file_content, ContentType=content_type)
+    response = s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=file_content, ContentType=content_type)
+    return response["ETag"]
+
+
+def upload_s3_fileobj(
+    bucket_name: str,
+    object_key: str,
+    fileobj: BinaryIO,
+    content_type: Optional[str] = None,
+    transfer_config: Optional[TransferConfig] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> None:
+    """
+    Stream a file-like object to an S3 bucket without reading it into memory all at once.
+
+    Seekable files smaller than `transfer_config.multipart_threshold` are uploaded with a single put_object,
+    directly rather than through boto3's transfer manager, which costs threads and futures per call.
+    Larger files are uploaded as a multipart upload, several parts at a time. If any part fails,
+    the multipart upload is aborted so that no orphaned parts are left behind.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param object_key: path to the object in the S3 bucket.
+    :param fileobj: A readable, binary file-like object with the content of the file.
+    :param content_type: The MIME type of the file, e.g. "text/plain" for a text file.
+    :param transfer_config: Optional multipart threshold, part size and concurrency. Defaults to boto3's.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    content_type = content_type or "application/octet-stream"
+    transfer_config = transfer_config or TransferConfig()
+    size_bytes = remaining_size(fileobj)
+    if size_bytes is not None and size_bytes < transfer_config.multipart_threshold:
+        s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=fileobj, ContentType=content_type)
+        return
+    s3_client.upload_fileobj(
+        Fileobj=fileobj,
+        Bucket=bucket_name,
+        Key=object_key,
+        ExtraArgs={"ContentType": content_type},
+        Config=transfer_config,
+    )
+
+
+def remaining_size(fileobj: BinaryIO) -> Optional[int]:
+    """Return the number of bytes left to read from a file, or None if it is not seekable."""
+    if not fileobj.seekable():
+        return None
+    position = fileobj.tell()
+    size_bytes = fileobj.seek(0, os.SEEK_END) - position
+    fileobj.seek(position)
+    return size_bytes
+
+
+def copy_s3_object(  # pylint: disable=too-many-arguments
+    bucket_name: str,
+    source_key: str,
+    destination_key: str,
+    size_bytes: Optional[int] = None,
+    source_etag: Optional[str] = None,
+    transfer_config: Optional[TransferConfig] = None,
+    s3_client: Optional["S3Client"] = None,
+    source_bucket_name: Optional[str] = None,
+) -> None:
+    """
+    Copy an object inside an S3 bucket, or from another bucket, without its content passing through this process.
+
+    Objects smaller than `transfer_config.multipart_threshold` are copied with a single copy_object.
+    Larger ones are copied as a multipart upload whose parts are copied in parallel with upload_part_copy.
+    The content type and user metadata of the source are kept.
+
+    :param bucket_name: The name of the S3 bucket.
+    :param source_key: path to the object to copy.
+    :param destination_key: path to copy the object to.
+    :param size_bytes: The size of the source, if known; a small object of known size is copied without
+        looking it up first.
+    :param source_etag: Only copy the source if it still has this ETag, so that the copy is consistent
+        with what the caller saw of the source.
+    :param transfer_config: Optional multipart threshold, part size and concurrency. Defaults to boto3's.
+    :param s3_client: An optional boto3 S3 client. If not provided, one will be created.
+    :param source_bucket_name: The bucket of the object to copy, if it is not `bucket_name`.
+    """
+    s3_client = s3_client or boto3.client("s3")
+    transfer_config = transfer_config or TransferConfig()
+    copy_source = {"Bucket": source_bucket_name or bucket_name, "Key": source_key}
+    extra_args = {"CopySourceIfMatch": source_etag} if source_etag else {}
+    if size_bytes is not None and size_bytes < transfer_config.multipart_threshold:
+        s3_client.copy_object(CopySource=copy_source, Bucket=bucket_name, Key=destination_key, **extra_args)
+        return
+    s3_client.copy(
+        CopySource=copy_source, Bucket=bucket_name, Key=destination_key, ExtraArgs=extra_args, Config=transfer_config
+    )
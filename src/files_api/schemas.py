@@ -5,6 +5,7 @@ from enum import Enum
 from datetime import datetime
 from typing import (
     List,
+    Literal,
     Optional,
 )
 
@@ -18,10 +19,20 @@ from pydantic import (
 )
 from typing_extensions import Self
 
+from files_api.generate_files import DEFAULT_CHAT_COMPLETION_MAX_TOKENS
+from files_api.s3.presigned_urls import MAX_PRESIGNED_URL_EXPIRY_SECONDS
+
 DEFAULT_GET_FILES_PAGE_SIZE = 10
 DEFAULT_GET_FILES_MIN_PAGE_SIZE = 10
 DEFAULT_GET_FILES_MAX_PAGE_SIZE = 100
 DEFAULT_GET_FILES_DIRECTORY = ""
+MAX_BATCH_DELETE_FILE_PATHS = 10_000
+# the most files Starlette parses from one multipart form
+MAX_BATCH_UPLOAD_FILES = 1000
+MAX_MULTIPART_UPLOAD_PARTS = 10_000
+MAX_UPLOAD_PART_SIZE_BYTES = 5 * 1024 * 1024 * 1024
+# the most output tokens of the chat completion model
+MAX_CHAT_COMPLETION_TOKENS = 4096
 
 INVALID_FILE_PATH = re.compile(
     r"""
@@ -111,36 +122,365 @@ class GetFilesResponse(BaseModel):
 class GetFilesQueryParams(BaseModel):
     """Query parameters for `GET /v1/files`."""
 
-    page_size: int = Field(
-        DEFAULT_GET_FILES_PAGE_SIZE,
+    page_size: Optional[int] = Field(
+        None,
         le=DEFAULT_GET_FILES_MAX_PAGE_SIZE,
         ge=DEFAULT_GET_FILES_MIN_PAGE_SIZE,
+        description=(
+            f"The number of files per page. Defaults to {DEFAULT_GET_FILES_PAGE_SIZE}, "
+            "or with a `page_token`, to the page size of the previous page."
+        ),
     )
     directory: Optional[str] = Field(
-        DEFAULT_GET_FILES_DIRECTORY,
-        description="The directory to list files from.",
+        None,
+        description="The directory to list files from. Defaults to the whole bucket.",
     )
     page_token: Optional[str] = Field(
         None,
-        description="The token for the next page.",
+        description=(
+            "The token for the next page. It encodes the directory, filters and sort order, "
+            "so it cannot be combined with them."
+        ),
+    )
+    min_size: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Only list files of at least this many bytes. Requires the metadata index.",
+    )
+    modified_since: Optional[datetime] = Field(
+        None,
+        description="Only list files modified at or after this date. Requires the metadata index.",
+    )
+    sort: Optional[Literal["file_path", "size", "last_modified"]] = Field(
+        None,
+        description=(
+            "The order to list files in, ascending; ties are broken by file path. Defaults to `file_path`. "
+            "Other orders require the metadata index."
+        ),
     )
 
     @model_validator(mode="after")
     def check_mutual_exclusivity(self) -> Self:
         if self.page_token:
-            get_files_query_params = self.model_dump(exclude_unset=True)
-            page_size_set = "page_size" in get_files_query_params.keys()
-            directory_path_set = "directory" in get_files_query_params.keys()
-            if page_size_set or directory_path_set:
-                raise ValueError("page_token is mutually exclusive with page_size and directory")
+            for name in ("directory", "min_size", "modified_since", "sort"):
+                if getattr(self, name) is not None:
+                    raise ValueError(f"page_token is mutually exclusive with {name}")
         return self
 
 
+class StreamFilesQueryParams(BaseModel):
+    """Query parameters for `GET /v1/files:stream`."""
+
+    directory: str = Field(
+        DEFAULT_GET_FILES_DIRECTORY,
+        description="The directory to list files from.",
+    )
+    delimiter: Optional[str] = Field(
+        None,
+        min_length=1,
+        description=(
+            "If set, e.g. to `/`, only list the files directly in `directory`, "
+            "and list each of its subdirectories once instead of the files in them."
+        ),
+    )
+    parallel: bool = Field(
+        False,
+        description=(
+            "List the subdirectories of `directory` concurrently. Faster for directories with "
+            "many subdirectories; the files are still listed in path order."
+        ),
+    )
+
+    @model_validator(mode="after")
+    def check_parallel_without_delimiter(self) -> Self:
+        if self.parallel and self.delimiter:
+            raise ValueError("parallel is mutually exclusive with delimiter")
+        return self
+
+
+class DirectoryMetadata(BaseModel):
+    """A subdirectory listed by `GET /v1/files:stream` when a `delimiter` is given."""
+
+    directory: str = Field(
+        description="The path of the subdirectory, ending with the delimiter.",
+        json_schema_extra={"example": "path/to/"},
+    )
+
+
+class LargeFile(BaseModel):
+    """One of the largest files of a directory."""
+
+    file_path: str = Field(description="The path of the file.", json_schema_extra={"example": "path/to/model.bin"})
+    size_bytes: int = Field(description="The size of the file in bytes.")
+
+
+class SizeHistogramBucket(BaseModel):
+    """The number of files of a directory whose size falls in a range."""
+
+    min_size_bytes: int = Field(description="The smallest size in the range.")
+    max_size_bytes: Optional[int] = Field(description="The end of the range (exclusive), or null for no end.")
+    file_count: int = Field(description="The number of files in the range.")
+
+
+class DirectoryStatsResponse(BaseModel):
+    """Response model for `GET /v1/directories/:directory/stats`."""
+
+    directory: str = Field(description="The directory, ending with '/'.", json_schema_extra={"example": "path/to/"})
+    file_count: int = Field(description="The number of files in the directory and its subdirectories.")
+    total_bytes: int = Field(description="The total size of those files in bytes.")
+    largest_files: List[LargeFile] = Field(description="The largest files, largest first.")
+    size_histogram: List[SizeHistogramBucket] = Field(description="The number of files per size range.")
+
+
 class DeleteFileResponse(BaseModel):
     """Response model for `DELETE /v1/files/:file_path`."""
 
     message: str
 
+
+class BatchDeleteFilesRequest(BaseModel):
+    """Request body for `POST /v1/files:batchDelete`. Exactly one of `file_paths` and `directory` must be set."""
+
+    file_paths: Optional[List[str]] = Field(
+        None,
+        min_length=1,
+        max_length=MAX_BATCH_DELETE_FILE_PATHS,
+        description="The paths of the files to delete.",
+        json_schema_extra={"example": ["path/to/pyproject.toml", "path/to/Makefile"]},
+    )
+    directory: Optional[str] = Field(
+        None,
+        min_length=1,
+        description=(
+            "Delete every file whose path starts with this directory. The directory may hold at most "
+            f"{MAX_BATCH_DELETE_FILE_PATHS} files."
+        ),
+        json_schema_extra={"example": "path/to/"},
+    )
+
+    @field_validator("file_paths")
+    @classmethod
+    def _validate_file_paths(cls, file_paths):
+        for file_path in file_paths or []:
+            if INVALID_FILE_PATH.search(file_path):
+                raise ValueError(
+                    "file_path must not start with '/' or '.', " "contain '//' or '%', or include whitespace"
+                )
+        return file_paths
+
+    @model_validator(mode="after")
+    def check_mutual_exclusivity(self) -> Self:
+        if (self.file_paths is None) == (self.directory is None):
+            raise ValueError("exactly one of file_paths and directory must be set")
+        return self
+
+
+class FileError(BaseModel):
+    """A file that a request on many files, such as a batch delete, could not process, and why."""
+
+    file_path: str = Field(description="The path of the file.")
+    code: str = Field(
+        description="The error code reported by S3, or by the API for an invalid request.",
+        json_schema_extra={"example": "AccessDenied"},
+    )
+    message: str = Field(description="The error message.")
+
+
+class BatchDeleteFilesResponse(BaseModel):
+    """Response model for `POST /v1/files:batchDelete`."""
+
+    deleted: List[str] = Field(
+        description=(
+            "The paths of the files that were deleted. Like `DELETE /v1/files/:file_path` without a "
+            "precondition, S3 reports deleting a file that does not exist as a success."
+        )
+    )
+    errors: List[FileError] = Field(description="The files that could not be deleted.")
+
+
+class BatchUploadFilesResponse(BaseModel):
+    """Response model for `POST /v1/files:batchUpload`."""
+
+    uploaded: List[str] = Field(description="The paths of the files that were uploaded.")
+    errors: List[FileError] = Field(
+        description="The files that could not be uploaded, including those whose path is invalid."
+    )
+
+
+class CopyFileRequest(BaseModel):
+    """Request body for `POST /v1/files/:file_path:copy` and `POST /v1/files/:file_path:move`."""
+
+    destination_path: str = Field(
+        description="The path to copy or move the file to. An existing file at this path is overwritten.",
+        json_schema_extra={"example": "path/to/copy.toml"},
+    )
+
+    @field_validator("destination_path")
+    @classmethod
+    def _validate_destination_path(cls, destination_path):
+        if INVALID_FILE_PATH.search(destination_path):
+            raise ValueError("file_path must not start with '/' or '.', " "contain '//' or '%', or include whitespace")
+        return destination_path
+
+
+class CopyFileResponse(BaseModel):
+    """Response model for `POST /v1/files/:file_path:copy` and `POST /v1/files/:file_path:move`."""
+
+    source_path: str = Field(description="The path of the source file.")
+    destination_path: str = Field(description="The path of the copy.")
+    message: str = Field(description="A message about the operation.")
+
+
+class MoveDirectoryRequest(BaseModel):
+    """Request body for `POST /v1/directories/:directory:move`."""
+
+    destination_directory: str = Field(
+        min_length=1,
+        description="The directory to move the files to; the rest of their paths is kept.",
+        json_schema_extra={"example": "path/to/new/"},
+    )
+
+
+class MoveDirectoryResponse(BaseModel):
+    """Response model for `POST /v1/directories/:directory:move`."""
+
+    moved: List[str] = Field(description="The (former) paths of the files that were moved.")
+    errors: List[FileError] = Field(
+        description="The files that could not be moved: either not copied, or copied but not deleted."
+    )
+
+
+class PresignFileRequest(BaseModel):
+    """Request body for `POST /v1/files/:file_path:presign`."""
+
+    method: Literal["GET", "PUT", "UPLOAD_PART"] = Field(
+        "GET",
+        description=(
+            "`GET` for a download URL, `PUT` for an upload URL (files up to 5 GiB), "
+            "`UPLOAD_PART` for one upload URL per part of a multipart upload."
+        ),
+    )
+    expires_in_seconds: Optional[int] = Field(
+        None,
+        ge=1,
+        le=MAX_PRESIGNED_URL_EXPIRY_SECONDS,
+        description="Time for which the URLs are valid. Defaults to the API's configured expiry.",
+    )
+    content_type: Optional[str] = Field(
+        None,
+        description=(
+            "`PUT` and `UPLOAD_PART` only: the MIME type the file is stored with. A `PUT` must send "
+            "the same `Content-Type` header."
+        ),
+        json_schema_extra={"example": "text/plain"},
+    )
+    upload_id: Optional[str] = Field(
+        None, description="`UPLOAD_PART` only: the multipart upload to sign more parts of. By default, a new one."
+    )
+    part_numbers: Optional[List[int]] = Field(
+        None,
+        min_length=1,
+        max_length=MAX_MULTIPART_UPLOAD_PARTS,
+        description="`UPLOAD_PART` only: the numbers of the parts to sign URLs for, from 1 to 10000.",
+        json_schema_extra={"example": [1, 2, 3]},
+    )
+
+    @field_validator("part_numbers")
+    @classmethod
+    def _validate_part_numbers(cls, part_numbers):
+        for part_number in part_numbers or []:
+            if not 1 <= part_number <= MAX_MULTIPART_UPLOAD_PARTS:
+                raise ValueError(f"part numbers must be between 1 and {MAX_MULTIPART_UPLOAD_PARTS}")
+        return part_numbers
+
+    @model_validator(mode="after")
+    def check_part_numbers(self) -> Self:
+        if (self.method == "UPLOAD_PART") != (self.part_numbers is not None):
+            raise ValueError("part_numbers must be set if and only if method is UPLOAD_PART")
+        if self.upload_id is not None and self.method != "UPLOAD_PART":
+            raise ValueError("upload_id requires method UPLOAD_PART")
+        return self
+
+
+class PresignedUrl(BaseModel):
+    """A presigned URL."""
+
+    url: str = Field(description="The URL, which needs no further authentication until it expires.")
+    part_number: Optional[int] = Field(None, description="`UPLOAD_PART` only: the part the URL uploads.")
+
+
+class PresignFileResponse(BaseModel):
+    """Response model for `POST /v1/files/:file_path:presign`."""
+
+    http_method: str = Field(
+        description="The HTTP method to call the URLs with.", json_schema_extra={"example": "GET"}
+    )
+    urls: List[PresignedUrl] = Field(description="The presigned URLs.")
+    expires_at: datetime = Field(description="When the URLs expire.")
+    upload_id: Optional[str] = Field(None, description="`UPLOAD_PART` only: the ID of the multipart upload.")
+    complete_url: Optional[str] = Field(
+        None,
+        description=(
+            "`UPLOAD_PART` only: `POST` the `CompleteMultipartUpload` XML document, with the `ETag` response "
+            "header of every part, to this URL to complete the upload."
+        ),
+    )
+    abort_url: Optional[str] = Field(
+        None, description="`UPLOAD_PART` only: `DELETE` this URL to abort the upload and discard its parts."
+    )
+
+
+class CreateUploadSessionRequest(FilePathValidator):
+    """Request body for `POST /v1/uploads`."""
+
+    content_type: Optional[str] = Field(
+        None,
+        description="The MIME type the file is stored with.",
+        json_schema_extra={"example": "application/octet-stream"},
+    )
+
+
+class UploadedPart(BaseModel):
+    """A part of an upload session that has been uploaded."""
+
+    part_number: int = Field(description="The position of the part in the file.")
+    size_bytes: int = Field(description="The size of the part in bytes.")
+    etag: str = Field(description="The ETag of the part.")
+
+
+class CompletedPart(BaseModel):
+    """A part of an upload session, as the client uploaded it."""
+
+    part_number: int = Field(ge=1, le=MAX_MULTIPART_UPLOAD_PARTS, description="The position of the part in the file.")
+    etag: str = Field(description="The ETag returned by the upload of the part.")
+
+
+class CompleteUploadSessionRequest(BaseModel):
+    """Request body for `POST /v1/uploads/:upload_id:complete`."""
+
+    parts: List[CompletedPart] = Field(
+        min_length=1,
+        max_length=MAX_MULTIPART_UPLOAD_PARTS,
+        description="Every part of the file. The upload is only completed if exactly these parts were uploaded.",
+        json_schema_extra={"example": [{"part_number": 1, "etag": '"9b2cf535f27731c974343645a3985328"'}]},
+    )
+
+    @field_validator("parts")
+    @classmethod
+    def _validate_parts(cls, parts):
+        if len({part.part_number for part in parts}) != len(parts):
+            raise ValueError("part numbers must be unique")
+        return parts
+
+
+class UploadSessionResponse(BaseModel):
+    """Response model for `POST /v1/uploads` and `GET /v1/uploads/:upload_id`."""
+
+    upload_id: str = Field(description="The ID of the upload session.")
+    file_path: str = Field(description="The path the file is stored at once the upload is completed.")
+    parts: List[UploadedPart] = Field(description="The parts uploaded so far, in order.")
+
+
 class GeneratedFileType(str, Enum):
     """The type of file generated by OpenAI."""
 
@@ -161,6 +501,19 @@ class GeneratedFilesQueryParams(BaseModel):
         description="The prompt to generate the file content.",
         json_schema_extra={"example": "Generate a text file."},
     )
+    max_tokens: int = Field(
+        default=DEFAULT_CHAT_COMPLETION_MAX_TOKENS,
+        ge=1,
+        le=MAX_CHAT_COMPLETION_TOKENS,
+        description="The maximum number of tokens to generate.",
+    )
+    stream: bool = Field(
+        default=False,
+        description=(
+            "Send the text to the client as server-sent events while it is generated and uploaded, "
+            "instead of a JSON response once the file is stored."
+        ),
+    )
     # file_type: GeneratedFileType = Field(
     #     ...,
     #     description="The type of file to generate.",
@@ -1,4 +1,12 @@
-from pydantic import Field
+from typing import (
+    Literal,
+    Optional,
+)
+
+from pydantic import (
+    Field,
+    SecretStr,
+)
 from pydantic_settings import (
     BaseSettings,
     SettingsConfigDict,
@@ -14,4 +22,380 @@ class Settings(BaseSettings):
 
     s3_bucket_name: str = Field(...)
 
+    # S3 client connection pool and retry behavior
+    s3_max_pool_connections: int = Field(
+        default=50,
+        ge=1,
+        description="Maximum number of pooled HTTP connections kept open by the shared S3 client.",
+    )
+    s3_tcp_keepalive: bool = Field(
+        default=True,
+        description="Enable TCP keep-alive on the S3 client's pooled connections.",
+    )
+    s3_connect_timeout_seconds: float = Field(default=5.0, gt=0, description="S3 connection timeout.")
+    s3_read_timeout_seconds: float = Field(default=60.0, gt=0, description="S3 socket read timeout.")
+    s3_max_retry_attempts: int = Field(
+        default=3,
+        ge=0,
+        description="Maximum number of retry attempts botocore makes for a failed S3 call.",
+    )
+    s3_retry_mode: Literal["legacy", "standard", "adaptive"] = Field(
+        default="standard",
+        description="Retry mode, see https://boto3.amazonaws.com/v1/documentation/api/latest/guide/retries.html",
+    )
+
+    # uploads larger than the threshold are streamed to S3 as a multipart upload
+    s3_multipart_threshold_bytes: int = Field(
+        default=8 * 1024 * 1024,
+        ge=5 * 1024 * 1024,
+        description="Uploads at least this large use a multipart upload instead of a single put_object.",
+    )
+    s3_multipart_part_size_bytes: int = Field(
+        default=8 * 1024 * 1024,
+        ge=5 * 1024 * 1024,
+        description="Size of each part of a multipart upload. S3 requires at least 5 MiB.",
+    )
+    s3_multipart_max_concurrency: int = Field(
+        default=4,
+        ge=1,
+        description="Number of parts of a single multipart upload that are in flight at once.",
+    )
+
+    # copies larger than the threshold are made of parts copied in parallel with upload_part_copy
+    s3_copy_multipart_threshold_bytes: int = Field(
+        default=5 * 1024 * 1024 * 1024,
+        ge=5 * 1024 * 1024,
+        le=5 * 1024 * 1024 * 1024,
+        description=(
+            "Copies at least this large use a multipart copy instead of a single copy_object. "
+            "S3 cannot copy objects over 5 GiB with a single copy_object."
+        ),
+    )
+    s3_copy_part_size_bytes: int = Field(
+        default=256 * 1024 * 1024,
+        ge=5 * 1024 * 1024,
+        le=5 * 1024 * 1024 * 1024,
+        description="Size of each part of a multipart copy.",
+    )
+    s3_copy_max_concurrency: int = Field(
+        default=10,
+        ge=1,
+        description="Number of parts of a single multipart copy, or of files of a directory move, copied at once.",
+    )
+
+    s3_batch_upload_max_concurrency: int = Field(
+        default=16,
+        ge=1,
+        description="Number of files of a `POST /v1/files:batchUpload` request uploaded at once.",
+    )
+
+    s3_download_chunk_size_bytes: int = Field(
+        default=1024 * 1024,
+        ge=1024,
+        description="Size of the chunks a file's content is read from S3 and streamed to the client in.",
+    )
+
+    s3_listing_max_concurrency: int = Field(
+        default=8,
+        ge=1,
+        description="Number of subdirectories listed at once by `GET /v1/files:stream?parallel=true`.",
+    )
+
+    archive_prefetch_count: int = Field(
+        default=4,
+        ge=1,
+        description=(
+            "Number of files `GET /v1/archives/{directory}.zip` requests from S3 ahead of the one it is "
+            "writing into the archive. Each may hold a connection of the S3 client's pool."
+        ),
+    )
+
+    s3_backend: Literal["sync", "async"] = Field(
+        default="async",
+        description=(
+            "`async` runs boto3 calls on worker threads so they never block the event loop; "
+            "`sync` calls them inline."
+        ),
+    )
+
+    delete_checks_existence: bool = Field(
+        default=True,
+        description=(
+            "Look the file up before an unconditional DELETE so that missing files get a 404. "
+            "If disabled, DELETE is a single S3 call that returns 204 whether or not the file existed."
+        ),
+    )
+
+    # presigned URLs, so that file content can go straight between clients and S3
+    presigned_url_expiry_seconds: int = Field(
+        default=3600,
+        ge=1,
+        le=7 * 24 * 3600,
+        description="Time for which presigned URLs are valid, unless a request asks for a different time.",
+    )
+    presigned_url_max_expiry_seconds: int = Field(
+        default=7 * 24 * 3600,
+        ge=1,
+        le=7 * 24 * 3600,
+        description="Longest validity a request may ask presigned URLs to have. S3 allows at most 7 days.",
+    )
+    presigned_redirect_threshold_bytes: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description=(
+            "If set, `GET /v1/files/{file_path}` answers requests for files at least this large with a "
+            "307 redirect to a presigned URL, so the content is downloaded straight from S3. This costs "
+            "a HeadObject call per download unless the metadata cache is enabled."
+        ),
+    )
+
+    # the OpenAI client shared by the generation endpoints (which reads OPENAI_API_KEY and OPENAI_BASE_URL itself)
+    openai_max_connections: int = Field(
+        default=100,
+        ge=1,
+        description="Maximum number of concurrent connections of the shared OpenAI client.",
+    )
+    openai_max_keepalive_connections: int = Field(
+        default=20,
+        ge=0,
+        description="Number of idle connections the shared OpenAI client keeps open for reuse.",
+    )
+    openai_keepalive_expiry_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        description="Time after which an idle connection of the shared OpenAI client is closed.",
+    )
+    openai_connect_timeout_seconds: float = Field(default=5.0, gt=0, description="OpenAI connection timeout.")
+    openai_read_timeout_seconds: float = Field(
+        default=600.0,
+        gt=0,
+        description="Timeout of each OpenAI request; generations can take minutes.",
+    )
+    openai_max_retries: int = Field(
+        default=2,
+        ge=0,
+        description="Maximum number of retries of a failed OpenAI request.",
+    )
+    openai_http2: bool = Field(
+        default=False,
+        description=(
+            "Talk HTTP/2 to OpenAI, so concurrent generations share a few connections. "
+            "Requires the `h2` package (`pip install httpx[http2]`)."
+        ),
+    )
+
+    # the HTTP client shared by the generation endpoints to download generated files from the provider's URLs
+    download_max_connections: int = Field(
+        default=20,
+        ge=1,
+        description="Maximum number of concurrent connections of the shared download client.",
+    )
+    download_connect_timeout_seconds: float = Field(default=5.0, gt=0, description="Download connection timeout.")
+    download_read_timeout_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        description="Time a download may wait for its next chunk before it fails.",
+    )
+    generated_image_max_size_bytes: int = Field(
+        default=50 * 1024 * 1024,
+        ge=1,
+        description="Size above which the download of a generated image is stopped and the generation fails.",
+    )
+
+    # coalescing of concurrent identical requests into one S3 or OpenAI call
+    single_flight_enabled: bool = Field(
+        default=False,
+        description=(
+            "Share one in-flight S3 read, existence check or OpenAI generation among concurrent identical "
+            "requests, e.g. many downloads of a newly popular file or re-submissions of the same prompt. "
+            "Requests that coalesce into one generation get the same generated content."
+        ),
+    )
+    single_flight_max_body_bytes: int = Field(
+        default=1024 * 1024,
+        ge=0,
+        description=(
+            "Files up to this size are read into memory once and sent to every coalesced download; "
+            "coalesced downloads of larger files each fetch the file themselves."
+        ),
+    )
+
+    # cache of generated files, so identical generation requests are answered with a copy of the earlier result
+    generation_cache_enabled: bool = Field(
+        default=False,
+        description=(
+            "Store every generated file in `generation_cache_bucket_name`, keyed by a hash of the model, its "
+            "parameters and the prompt, and answer an identical generation request with a server-side copy of it "
+            "instead of calling OpenAI again."
+        ),
+    )
+    generation_cache_bucket_name: Optional[str] = Field(
+        default=None,
+        description=(
+            "Bucket the cached generations are stored in, required if the cache is enabled. It must not be "
+            "`s3_bucket_name`, so that clients can neither list nor overwrite cached generations."
+        ),
+    )
+    generation_cache_prefix: str = Field(
+        default="",
+        description="Prefix of `generation_cache_bucket_name` under which cached generations are stored.",
+    )
+    generation_cache_ttl_seconds: float = Field(
+        default=7 * 24 * 3600,
+        gt=0,
+        description="Time after which a cached generation is no longer served, and is deleted by the next eviction.",
+    )
+    generation_cache_max_file_size_bytes: int = Field(
+        default=20 * 1024 * 1024,
+        ge=0,
+        description="Generated files larger than this are not cached.",
+    )
+    generation_cache_max_size_bytes: int = Field(
+        default=1024 * 1024 * 1024,
+        ge=0,
+        description="Total size of the cached generations above which the least recently generated ones are evicted.",
+    )
+    generation_cache_lru_max_entries: int = Field(
+        default=10_000,
+        ge=1,
+        description="Number of cached generations known in memory, whose hits need no lookup in S3.",
+    )
+    generation_cache_eviction_interval_seconds: float = Field(
+        default=3600.0,
+        gt=0,
+        description="Interval at which expired cached generations are deleted and the cache is shrunk to its size.",
+    )
+
+    # resumable uploads of `/v1/uploads`, which are S3 multipart uploads
+    upload_session_max_age_seconds: float = Field(
+        default=24 * 3600,
+        gt=0,
+        description=(
+            "Time after which an upload session that was neither completed nor aborted is aborted, "
+            "and its parts deleted. This applies to every multipart upload of the bucket, "
+            "including those started with presigned URLs."
+        ),
+    )
+    upload_session_gc_interval_seconds: float = Field(
+        default=3600.0,
+        gt=0,
+        description="Interval at which upload sessions older than `upload_session_max_age_seconds` are aborted.",
+    )
+
+    page_token_secret: Optional[SecretStr] = Field(
+        default=None,
+        description=(
+            "Secret that the keys signing the page tokens of `GET /v1/files` and the IDs of upload sessions "
+            "are derived from. Required to serve the API; every instance must use the same secret."
+        ),
+    )
+
+    # in-process cache of object metadata for HEAD requests and existence checks
+    metadata_cache_enabled: bool = Field(
+        default=False,
+        description=(
+            "Cache object metadata in memory. Changes made outside this process are only seen "
+            "once the cached entry expires."
+        ),
+    )
+    metadata_cache_max_entries: int = Field(
+        default=10_000,
+        ge=1,
+        description="Number of objects to cache metadata for; the least recently used entry is evicted first.",
+    )
+    metadata_cache_ttl_seconds: float = Field(
+        default=30.0,
+        gt=0,
+        description="Time after which cached metadata is fetched from S3 again.",
+    )
+    metadata_cache_stats_log_interval_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        description=(
+            "Interval at which the hit and miss counters of the metadata cache, and of the generation cache "
+            "if it is enabled, are logged."
+        ),
+    )
+
+    # in-process cache of missing keys, so repeated lookups of a missing file are answered without S3
+    negative_cache_enabled: bool = Field(
+        default=False,
+        description="Remember missing files for a short time and answer repeated lookups of them with a 404 at once.",
+    )
+    negative_cache_max_entries: int = Field(
+        default=100_000,
+        ge=1,
+        description="Number of missing files to remember; the oldest entry is forgotten first.",
+    )
+    negative_cache_ttl_seconds: float = Field(
+        default=5.0,
+        gt=0,
+        description=(
+            "Time for which a missing file is remembered. Files created outside this process "
+            "may keep getting a 404 for this long."
+        ),
+    )
+    negative_cache_bloom_prefix: Optional[str] = Field(
+        default=None,
+        description=(
+            "If set, list every key under this prefix (use an empty string for the whole bucket) into a "
+            "Bloom filter, so that lookups of keys under it that were never stored get a 404 without S3."
+        ),
+    )
+    negative_cache_bloom_max_age_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        description=(
+            "The Bloom filter is rebuilt from a new listing at half this interval and is no longer used "
+            "once this old. Files created outside this process may get a 404 for up to this long."
+        ),
+    )
+    negative_cache_bloom_false_positive_rate: float = Field(
+        default=0.01,
+        gt=0,
+        lt=1,
+        description="Share of lookups of missing keys that the Bloom filter lets through to S3.",
+    )
+
+    # local SQLite index of the bucket's files, for filtered and sorted listings
+    metadata_index_path: Optional[str] = Field(
+        default=None,
+        description=(
+            "Path of a SQLite database that mirrors the metadata of every file in the bucket "
+            "(`:memory:` for one that lives in memory). If set, `GET /v1/files` is answered from it and "
+            "supports `min_size`, `modified_since` and `sort`."
+        ),
+    )
+    metadata_index_rebuild_interval_seconds: float = Field(
+        default=3600.0,
+        gt=0,
+        description=(
+            "Interval at which the index is reconciled with a full listing of the bucket. Files written "
+            "outside this process are only listed once the next rebuild has run."
+        ),
+    )
+
+    # statistics of `GET /v1/directories/{directory}/stats`, kept up to date by the writes of this process
+    directory_stats_enabled: bool = Field(
+        default=False,
+        description=(
+            "Cache the statistics of directories instead of listing the directory for every request. Without "
+            "the metadata index, a write or delete in a cached directory costs an extra `HeadObject` to look up "
+            "the size the file had before."
+        ),
+    )
+    directory_stats_cache_max_entries: int = Field(
+        default=1000,
+        ge=1,
+        description="Number of directories to keep statistics for; the least recently used one is evicted first.",
+    )
+    directory_stats_cache_ttl_seconds: float = Field(
+        default=300.0,
+        gt=0,
+        description=(
+            "Time after which the statistics of a directory are recomputed from a full listing. Files written "
+            "outside this process are only counted once the statistics have been recomputed."
+        ),
+    )
+
     model_config = SettingsConfigDict(case_sensitive=False)
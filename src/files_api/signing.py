@@ -0,0 +1,74 @@
+"""Sign the opaque values the API hands to clients, such as page tokens and upload session IDs.
+
+A signed value is a URL-safe base64 JSON payload followed by a truncated HMAC of it, e.g.
+"eyJkIjoiZGlyLyJ9.Qm9n...". Each kind of value is signed with its own key, derived from the
+configured secret with `derive_key`, so a value issued for one purpose is never accepted for another.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from typing import (
+    Any,
+    Dict,
+)
+
+# a truncated HMAC keeps signed values short while still making them infeasible to forge
+SIGNATURE_LENGTH_BYTES = 16
+
+
+class InvalidSignatureError(ValueError):
+    """The signed value was not issued with this key, was tampered with, or is malformed."""
+
+
+def derive_key(secret: bytes, purpose: str) -> bytes:
+    """
+    Derive the key that one kind of value is signed with from the configured secret.
+
+    :param secret: The configured secret, see `Settings.page_token_secret`.
+    :param purpose: What the key signs, e.g. "upload-session".
+    """
+    return hmac.new(secret, f"files-api/{purpose}".encode("utf-8"), hashlib.sha256).digest()
+
+
+def encode_signed(data: Dict[str, Any], key: bytes) -> str:
+    """
+    Encode JSON-serializable data into a compact, URL-safe, signed value.
+
+    :param data: The data to encode.
+    :param key: The key the value is signed with.
+    """
+    payload = _b64encode(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload, key)}"
+
+
+def decode_signed(value: str, key: bytes) -> Any:
+    """
+    Verify a value created by `encode_signed` and decode its data.
+
+    :param value: The value sent by the client.
+    :param key: The key the value was signed with.
+
+    :raises InvalidSignatureError: If the value is malformed or its signature does not match.
+    """
+    payload, _, signature = value.partition(".")
+    if not signature or not hmac.compare_digest(signature.encode("utf-8"), _sign(payload, key).encode("utf-8")):
+        raise InvalidSignatureError("Invalid signature.")
+    try:
+        return json.loads(_b64decode(payload))
+    except ValueError as err:
+        raise InvalidSignatureError("Invalid payload.") from err
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str, key: bytes) -> str:
+    digest = hmac.new(key, payload.encode("utf-8"), hashlib.sha256).digest()
+    return _b64encode(digest[:SIGNATURE_LENGTH_BYTES])
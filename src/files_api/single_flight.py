@@ -0,0 +1,96 @@
+"""Coalesce concurrent identical calls into one, so a burst of requests for a hot key costs a single S3 or OpenAI call.
+
+The first caller of a key runs the call; callers of the same key that arrive while it is in flight
+wait for it and get its result, or its exception, instead of making their own call. Once the call is
+done the key is free again: results are shared, not cached.
+"""
+
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    TypeVar,
+)
+
+import anyio
+
+T = TypeVar("T")
+
+
+class _Call:
+    """A call in flight, and its outcome once `done` is set."""
+
+    def __init__(self):
+        self.done = anyio.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        # the caller running the call was cancelled, so there is no outcome to share
+        self.abandoned = False
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time, sharing its outcome with every caller that asked for it meanwhile.
+
+    The calls must run on one event loop; a `SingleFlight` holds no state between calls, so it is
+    safe to share it across the requests of the app.
+    """
+
+    def __init__(self):
+        self.n_calls = 0
+        self.n_coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Call `func`, unless a call of the same key is in flight, in which case wait for its outcome instead.
+
+        If the caller running the call is cancelled, the callers waiting for it start a new call.
+
+        :param key: Identifies the call; callers with equal keys must want the same result.
+        :param func: Makes the call.
+        """
+        while (call := self._calls.get(key)) is not None:
+            await call.done.wait()
+            if not call.abandoned:
+                self.n_coalesced += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result
+
+        call = _Call()
+        self._calls[key] = call
+        self.n_calls += 1
+        try:
+            call.result = await func()
+        except Exception as err:
+            call.error = err
+            raise
+        except BaseException:
+            call.abandoned = True
+            raise
+        finally:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Make callers of the matching keys start a new call instead of waiting for the one in flight.
+
+        The waiting callers still get the outcome of the call in flight. Used when whatever the call
+        reads has changed, e.g. an object was written, so that later callers see the change.
+        """
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+
+async def call_coalesced(single_flight: Optional[SingleFlight], key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+    """Call `func` through `single_flight`, or directly if coalescing is disabled (`single_flight` is None)."""
+    if single_flight is None:
+        return await func()
+    return await single_flight.do(key, func)
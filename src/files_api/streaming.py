@@ -0,0 +1,66 @@
+"""Stream a response whose content a background task produces, e.g. files fetched ahead or generated text.
+
+A generator must not yield from inside a task group: the consumer of the generator, not the generator,
+would then run while the task group's cancel scope is active, and a cancellation or an error in the
+task group could hit the consumer in the middle of sending the response. `ProducerStreamingResponse`
+runs the producer in a task group of its own instead, around sending the response, and its content
+only reads what the producer sends through a memory stream.
+"""
+
+from typing import (
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Optional,
+    Union,
+)
+
+import anyio
+from anyio.streams.memory import (
+    MemoryObjectReceiveStream,
+    MemoryObjectSendStream,
+)
+from fastapi.responses import StreamingResponse
+from starlette.types import (
+    Receive,
+    Scope,
+    Send,
+)
+
+Producer = Callable[[MemoryObjectSendStream], Awaitable[None]]
+Consumer = Callable[[MemoryObjectReceiveStream], AsyncIterable[Union[str, bytes]]]
+
+
+class ProducerStreamingResponse(StreamingResponse):
+    """
+    A streaming response whose content is sent by a producer task through a memory stream.
+
+    The producer starts when the response starts being sent and is cancelled once it has been sent,
+    or once the client disconnects. It must close the send stream it is given when it is done.
+
+    :param produce: Sends the items of the content to the send stream it is called with.
+    :param consume: Turns the receive stream into the chunks of the body; by default, the items are
+        the chunks.
+    :param max_buffer_size: Number of items the producer may send ahead of the client.
+    """
+
+    def __init__(
+        self,
+        produce: Producer,
+        consume: Optional[Consumer] = None,
+        max_buffer_size: float = 0,
+        **kwargs,
+    ):
+        self._send_stream, self._receive_stream = anyio.create_memory_object_stream(max_buffer_size=max_buffer_size)
+        self._produce = produce
+        content = consume(self._receive_stream) if consume is not None else self._receive_stream
+        super().__init__(content=content, **kwargs)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(self._produce, self._send_stream)
+            try:
+                await super().__call__(scope, receive, send)
+            finally:
+                task_group.cancel_scope.cancel()
+                self._receive_stream.close()
@@ -0,0 +1,54 @@
+"""Encode and verify the IDs of the resumable upload sessions of `/v1/uploads`.
+
+An upload session is an S3 multipart upload, and S3 keeps its state: the parts uploaded so far.
+The session ID records the file path and the S3 upload ID, so any instance of the API can continue
+a session without a session store. It is signed, so a client cannot write to another file by
+tampering with the file path of its session, and its key is derived for upload sessions alone,
+so no other signed value of the API, such as a page token, is accepted as a session ID.
+"""
+
+from typing import NamedTuple
+
+from files_api.signing import (
+    decode_signed,
+    derive_key,
+    encode_signed,
+)
+
+
+class InvalidUploadSessionError(ValueError):
+    """The upload session ID was not issued by this API, was tampered with, or is malformed."""
+
+
+class UploadSession(NamedTuple):
+    """The multipart upload behind an upload session."""
+
+    file_path: str
+    s3_upload_id: str
+
+
+def encode_upload_session_id(upload_session: UploadSession, secret: bytes) -> str:
+    """
+    Encode an upload session into a URL-safe, signed ID.
+
+    :param upload_session: The session to encode.
+    :param secret: The secret the ID's key is derived from, see `signing.derive_key`.
+    """
+    data = {"k": upload_session.file_path, "u": upload_session.s3_upload_id}
+    return encode_signed(data, derive_key(secret, "upload-session"))
+
+
+def decode_upload_session_id(upload_session_id: str, secret: bytes) -> UploadSession:
+    """
+    Verify an ID created by `encode_upload_session_id` and decode the upload session from it.
+
+    :param upload_session_id: The ID sent by the client.
+    :param secret: The secret the ID's key was derived from.
+
+    :raises InvalidUploadSessionError: If the ID is malformed or its signature does not match.
+    """
+    try:
+        data = decode_signed(upload_session_id, derive_key(secret, "upload-session"))
+        return UploadSession(file_path=str(data["k"]), s3_upload_id=str(data["u"]))
+    except (ValueError, KeyError, TypeError) as err:
+        raise InvalidUploadSessionError("Invalid upload session ID.") from err
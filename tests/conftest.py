@@ -5,6 +5,7 @@ Docs: https://stackoverflow.com/questions/34466027/in-pytest-what-is-the-use-of-
 """
 
 
+import os
 import sys
 from pathlib import Path
 
@@ -15,10 +16,14 @@ TESTS_DIR_PARENT = (THIS_DIR / "..").resolve()
 # so that we can use "from tests.<module> import ..." in our tests and fixtures
 sys.path.insert(0, str(TESTS_DIR_PARENT))
 
+# the app refuses to start without a key to sign page tokens with
+os.environ.setdefault("PAGE_TOKEN_SECRET", "test-page-token-secret")
+
 # module import paths to python files containing fixtures
 pytest_plugins = [
     # e.g. "tests/fixtures/example_fixture.py" should be registered as:
     "tests.fixtures.mocked_aws",
     "tests.fixtures.api_client",
     "tests.fixtures.mocked_openai",
+    "tests.fixtures.moto_server",
 ]
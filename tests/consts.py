@@ -5,3 +5,4 @@ from pathlib import Path
 THIS_DIR = Path(__file__).parent
 PROJECT_DIR = (THIS_DIR / "../").resolve()
 TEST_BUCKET_NAME = "test-python-upload-object"
+TEST_GENERATION_CACHE_BUCKET_NAME = "test-python-generation-cache"
@@ -0,0 +1,73 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import boto3
+import pytest
+import requests  # type: ignore
+
+from tests.consts import TEST_BUCKET_NAME
+from tests.fixtures.mocked_openai import temporary_env_vars
+
+
+def get_free_port() -> int:
+    """Ask the OS for a port that is not in use."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+MOTO_SERVER_ENV_VARS = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+
+@pytest.fixture(scope="session")
+def moto_server_endpoint_url():
+    """Start a moto server in a separate process once per session, and return its URL."""
+    port = get_free_port()
+    endpoint_url = f"http://localhost:{port}"
+    # pylint: disable=consider-using-with
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=os.environ.copy(),
+    )
+    for _ in range(30):
+        try:
+            requests.get(f"{endpoint_url}/moto-api/", timeout=1)
+            break
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.5)
+    else:
+        process.terminate()
+        raise RuntimeError(f"moto server at port {port} failed to start.")
+
+    boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=MOTO_SERVER_ENV_VARS["AWS_ACCESS_KEY_ID"],
+        aws_secret_access_key=MOTO_SERVER_ENV_VARS["AWS_SECRET_ACCESS_KEY"],
+        region_name=MOTO_SERVER_ENV_VARS["AWS_DEFAULT_REGION"],
+    ).create_bucket(Bucket=TEST_BUCKET_NAME)
+    yield endpoint_url
+
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture
+def moto_server(moto_server_endpoint_url: str):
+    """
+    Point boto3 at the moto server for the duration of a test.
+
+    Unlike `mocked_aws`, the mocked S3 runs out of process, so the memory it uses to store
+    objects does not count towards the memory of the process under test.
+    """
+    with temporary_env_vars({"AWS_ENDPOINT_URL": moto_server_endpoint_url, **MOTO_SERVER_ENV_VARS}):
+        yield moto_server_endpoint_url
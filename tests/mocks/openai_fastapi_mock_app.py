@@ -6,14 +6,21 @@ No matter the prompt, it always returns the same text or image.
 Access the server at `http://localhost:1080`.
 """
 
+import json
 import os
+import struct
+import zlib
 from io import BytesIO
 from pathlib import Path
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import (
+    FastAPI,
+    Request,
+)
 from fastapi.responses import (
     JSONResponse,
+    Response,
     StreamingResponse,
 )
 
@@ -60,11 +67,8 @@ mock_responses = [
                 "object": "image.generation",
                 "created": 1677628902,
                 "model": "dall-e-2024",
-                "data": [
-                    {
-                        "url": "https://repository-images.githubusercontent.com/516708998/571919ae-d303-406d-8098-af4b2d2fb6be"
-                    }
-                ],
+                # served by this app, so that downloading the generated image works offline
+                "data": [{"url": f"http://localhost:{MOCK_PORT}/images/generated.png"}],
                 "usage": {"prompt_tokens": 15, "completion_tokens": 1, "total_tokens": 16},
             },
         },
@@ -73,8 +77,10 @@ mock_responses = [
 
 
 @app.post("/chat/completions")
-async def chat_completions():
+async def chat_completions(request: Request):
     response_config = mock_responses[0]["httpResponse"]
+    if (await request.json()).get("stream"):
+        return StreamingResponse(content=iter_chat_completion_chunks(), media_type="text/event-stream")
     return JSONResponse(
         content=response_config["body"],
         status_code=response_config["statusCode"],
@@ -82,6 +88,24 @@ async def chat_completions():
     )
 
 
+def iter_chat_completion_chunks():
+    """Stream the mocked chat completion as OpenAI does with `stream=True`: a chunk per word, then `[DONE]`."""
+    body = mock_responses[0]["httpResponse"]["body"]
+    words = body["choices"][0]["message"]["content"].split(" ")
+    deltas = [{"role": "assistant", "content": ""}]
+    deltas.extend({"content": word if i == 0 else f" {word}"} for i, word in enumerate(words))
+    for i, delta in enumerate(deltas):
+        chunk = {
+            "id": body["id"],
+            "object": "chat.completion.chunk",
+            "created": body["created"],
+            "model": body["model"],
+            "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) - 1 else None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
 @app.post("/images/generations")
 async def images_generations():
     response_config = mock_responses[1]["httpResponse"]
@@ -92,6 +116,29 @@ async def images_generations():
     )
 
 
+@app.get("/images/{image_name}")
+async def get_image(image_name: str):  # pylint: disable=unused-argument
+    """Return a generated image: a blank PNG."""
+    return Response(content=create_png(width=256, height=256), media_type="image/png")
+
+
+def create_png(width: int, height: int) -> bytes:
+    """Create a white PNG of the given size."""
+
+    def chunk(chunk_type: bytes, data: bytes) -> bytes:
+        body = chunk_type + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    # each row starts with its filter type (0, none), followed by an RGB pixel per column
+    rows = (b"\x00" + b"\xff" * 3 * width) * height
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
 @app.post("/audio/speech")
 async def create_speech():
     """Return the local speech.mp3 file as a streaming response."""
@@ -0,0 +1,179 @@
+"""Test cases for `s3.backends`."""
+
+import asyncio
+import io
+import os
+import threading
+
+import boto3
+import pytest
+from boto3.s3.transfer import TransferConfig
+
+from files_api.s3.backends import (
+    AsyncS3Backend,
+    S3Backend,
+    create_s3_backend,
+)
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+OBJECT_KEY = "test.txt"
+MB = 1024 * 1024
+
+
+@pytest.mark.parametrize("s3_backend", ["sync", "async"])
+def test_backends_share_the_same_surface(mocked_aws: None, s3_backend: str):  # pylint: disable=unused-argument
+    """Test both backends upload, read, list and delete objects"""
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, s3_backend=s3_backend)
+    backend = create_s3_backend(settings, boto3.client("s3"))
+
+    async def crud():
+        await backend.upload_s3_object(TEST_BUCKET_NAME, OBJECT_KEY, b"test", "text/plain")
+        assert await backend.object_exists_in_s3(TEST_BUCKET_NAME, OBJECT_KEY)
+        response = await backend.fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY)
+        assert response["Body"].read() == b"test"
+        objects, _ = await backend.fetch_s3_objects_metadata(TEST_BUCKET_NAME)
+        assert [obj["Key"] for obj in objects] == [OBJECT_KEY]
+        await backend.delete_s3_object(TEST_BUCKET_NAME, OBJECT_KEY)
+        assert not await backend.object_exists_in_s3(TEST_BUCKET_NAME, OBJECT_KEY)
+
+    asyncio.run(crud())
+
+
+def test_async_backend_runs_off_the_event_loop_thread():
+    """Test the async backend hands the blocking call to a worker thread"""
+    backend = AsyncS3Backend(s3_client=None, max_concurrency=2)
+
+    def which_thread(s3_client):  # pylint: disable=unused-argument
+        return threading.get_ident()
+
+    worker_thread = asyncio.run(backend.run(which_thread))
+    assert worker_thread != threading.get_ident()
+    assert type(create_s3_backend(Settings(s3_bucket_name="b", s3_backend="sync"), None)) is S3Backend
+
+
+@pytest.mark.parametrize("s3_backend", ["sync", "async"])
+def test_stream_s3_object_body_closes_the_body_when_stopped_early(
+    mocked_aws: None, s3_backend: str  # pylint: disable=unused-argument
+):
+    """Test a download that is abandoned midway, e.g. by a disconnected client, releases the S3 response"""
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, s3_backend=s3_backend, s3_download_chunk_size_bytes=1024)
+    backend = create_s3_backend(settings, boto3.client("s3"))
+
+    async def read_first_chunk():
+        await backend.upload_s3_object(TEST_BUCKET_NAME, OBJECT_KEY, b"0" * 4096)
+        body = (await backend.fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY))["Body"]
+        stream = backend.stream_s3_object_body(body)
+        assert len(await anext(stream)) == 1024
+        await stream.aclose()
+        return body
+
+    body = asyncio.run(read_first_chunk())
+    assert body._raw_stream.closed  # pylint: disable=protected-access
+
+
+def test_upload_s3_fileobjs_reports_errors_per_object(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test a batch upload stores every object, mirrors it into the index, and reports failures per object"""
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, metadata_index_path=":memory:")
+    backend = create_s3_backend(settings, boto3.client("s3"))
+    files = [(f"dir/{i}", io.BytesIO(b"x" * i), "text/plain") for i in range(20)]
+
+    errors = asyncio.run(backend.upload_s3_fileobjs(TEST_BUCKET_NAME, files, max_concurrency=4))
+    assert errors == []
+    assert backend.metadata_index.count(TEST_BUCKET_NAME) == 20
+    assert backend.metadata_index.get(TEST_BUCKET_NAME, "dir/7").size_bytes == 7
+
+    errors = asyncio.run(backend.upload_s3_fileobjs("missing-bucket", [("a", io.BytesIO(b"a"), None)]))
+    assert [(error["Key"], error["Code"]) for error in errors] == [("a", "NoSuchBucket")]
+
+
+@pytest.mark.parametrize("n_chunks", [3, 13])
+def test_upload_s3_stream_uploads_large_streams_in_parts(
+    mocked_aws: None, n_chunks: int  # pylint: disable=unused-argument
+):
+    """Test a stream below one part is put as one object, and a larger stream is uploaded part by part"""
+    part_size = 5 * MB
+    backend = S3Backend(boto3.client("s3"), transfer_config=TransferConfig(multipart_chunksize=part_size))
+    chunk = os.urandom(MB)
+
+    async def chunks():
+        for _ in range(n_chunks):
+            yield chunk
+
+    size_bytes, etag = asyncio.run(backend.upload_s3_stream(TEST_BUCKET_NAME, OBJECT_KEY, chunks(), "image/png"))
+    assert size_bytes == n_chunks * MB
+    s3_client = boto3.client("s3")
+    # a multipart object reports its part count, a single put does not
+    first_part = s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY, PartNumber=1)
+    assert first_part.get("PartsCount", 1) == -(-n_chunks * MB // part_size)
+    response = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY)
+    assert response["ContentType"] == "image/png"
+    assert response["ETag"] == etag
+    assert response["Body"].read() == chunk * n_chunks
+
+
+def test_upload_s3_stream_aborts_the_upload_when_the_stream_fails(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test a stream that fails after some parts were uploaded leaves no object and no multipart upload behind"""
+    backend = S3Backend(boto3.client("s3"), transfer_config=TransferConfig(multipart_chunksize=5 * MB))
+
+    async def failing_chunks():
+        yield os.urandom(6 * MB)
+        raise ConnectionError("The download failed.")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(backend.upload_s3_stream(TEST_BUCKET_NAME, OBJECT_KEY, failing_chunks()))
+    s3_client = boto3.client("s3")
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME)
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME)
+
+
+@pytest.mark.parametrize("size_bytes", [10, 2 * MB])
+def test_concurrent_reads_share_one_s3_call(mocked_aws: None, size_bytes: int):  # pylint: disable=unused-argument
+    """Test concurrent reads of a key coalesce into one GetObject, unless the body is too large to share"""
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, single_flight_enabled=True)
+    s3_client = boto3.client("s3")
+    backend = create_s3_backend(settings, s3_client)
+    content = os.urandom(size_bytes)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY, Body=content)
+    operations = []
+    s3_client.meta.events.register("before-call.s3", lambda model, **kwargs: operations.append(model.name))
+
+    async def read() -> bytes:
+        response = await backend.fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY)
+        return b"".join([chunk async for chunk in backend.stream_s3_object_body(response["Body"])])
+
+    async def read_concurrently():
+        return await asyncio.gather(*(read() for _ in range(5)), backend.object_exists_in_s3(TEST_BUCKET_NAME, "x"))
+
+    *contents, exists = asyncio.run(read_concurrently())
+    assert contents == [content] * 5 and not exists
+    n_get_object_calls = 1 if size_bytes <= settings.single_flight_max_body_bytes else 5
+    assert sorted(operations) == ["GetObject"] * n_get_object_calls + ["HeadObject"]
+
+
+def test_objects_presigned_for_upload_are_not_cached(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the caches do not describe an object that a client may still upload to directly"""
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        metadata_cache_enabled=True,
+        negative_cache_enabled=True,
+        directory_stats_enabled=True,
+    )
+    s3_client = boto3.client("s3")
+    backend = create_s3_backend(settings, s3_client)
+
+    object_key = "dir/" + OBJECT_KEY
+
+    async def presign_then_upload_directly():
+        await backend.create_presigned_upload_url(TEST_BUCKET_NAME, object_key, 60)
+        assert not await backend.object_exists_in_s3(TEST_BUCKET_NAME, object_key)
+        assert (await backend.fetch_directory_stats(TEST_BUCKET_NAME, "dir/")).file_count == 0
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=object_key, Body=b"test")
+        assert await backend.object_exists_in_s3(TEST_BUCKET_NAME, object_key)
+        metadata = await backend.fetch_s3_object_metadata(TEST_BUCKET_NAME, object_key)
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=object_key, Body=b"updated")
+        new_metadata = await backend.fetch_s3_object_metadata(TEST_BUCKET_NAME, object_key)
+        assert new_metadata["ETag"] != metadata["ETag"]
+        assert (await backend.fetch_directory_stats(TEST_BUCKET_NAME, "dir/")).file_count == 1
+
+    asyncio.run(presign_then_upload_directly())
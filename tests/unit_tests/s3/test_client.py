@@ -0,0 +1,37 @@
+"""Test cases for `s3.client`."""
+
+from fastapi.testclient import TestClient
+
+from files_api.s3.client import create_s3_client
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+from tests.utils import record_s3_calls
+
+
+def test_create_s3_client_applies_settings(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the connection pool and retry settings are passed to botocore"""
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        s3_max_pool_connections=7,
+        s3_tcp_keepalive=False,
+        s3_max_retry_attempts=1,
+        s3_retry_mode="adaptive",
+    )
+    s3_client = create_s3_client(settings)
+    config = s3_client.meta.config
+    assert config.max_pool_connections == 7
+    assert config.tcp_keepalive is False
+    assert config.retries == {"total_max_attempts": 2, "mode": "adaptive"}
+
+
+def test_routes_share_the_app_s3_client(client: TestClient):
+    """Test every request goes through the client created in `create_app`"""
+    calls = record_s3_calls(client.app.state.s3_client)
+
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+    client.get("/v1/files")
+    client.delete("/v1/files/file_1")
+
+    assert "PutObject" in calls
+    assert "ListObjectsV2" in calls
+    assert "DeleteObject" in calls
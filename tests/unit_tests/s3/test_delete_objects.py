@@ -1,8 +1,14 @@
 """Test cases for `s3.delete_objects`."""
 
 import boto3
+import pytest
+from botocore.exceptions import ClientError
 
-from files_api.s3.delete_objects import delete_s3_object
+from files_api.s3.delete_objects import (
+    delete_s3_object,
+    delete_s3_objects,
+    iter_delete_batches,
+)
 from files_api.s3.read_objects import object_exists_in_s3
 from files_api.s3.write_objects import upload_s3_object
 from tests.consts import TEST_BUCKET_NAME
@@ -25,3 +31,55 @@ def test_delete_nonexistent_s3_object(mocked_aws: None):  # pylint: disable=unus
     delete_s3_object(TEST_BUCKET_NAME, object_key)
     delete_s3_object(TEST_BUCKET_NAME, object_key)
     assert object_exists_in_s3(TEST_BUCKET_NAME, object_key) is False
+
+
+def test_conditional_delete_s3_object(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test an object is only deleted if its ETag matches"""
+    s3_client = boto3.client("s3")
+    object_key = "file_to_delete.txt"
+    upload_s3_object(TEST_BUCKET_NAME, object_key, b"Test")
+    etag = s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key=object_key)["ETag"]
+
+    with pytest.raises(ClientError) as err:
+        delete_s3_object(TEST_BUCKET_NAME, object_key, if_match='"stale-etag"')
+    assert err.value.response["Error"]["Code"] == "PreconditionFailed"
+    assert object_exists_in_s3(TEST_BUCKET_NAME, object_key) is True
+
+    delete_s3_object(TEST_BUCKET_NAME, object_key, if_match=etag)
+    assert object_exists_in_s3(TEST_BUCKET_NAME, object_key) is False
+
+
+def test_delete_s3_objects(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test several objects are deleted with one call, including keys that do not exist"""
+    for object_key in ("a.txt", "b.txt"):
+        upload_s3_object(TEST_BUCKET_NAME, object_key, b"Test")
+
+    errors = delete_s3_objects(TEST_BUCKET_NAME, ["a.txt", "b.txt", "missing.txt"])
+    assert errors == []
+    assert object_exists_in_s3(TEST_BUCKET_NAME, "a.txt") is False
+    assert object_exists_in_s3(TEST_BUCKET_NAME, "b.txt") is False
+    assert delete_s3_objects(TEST_BUCKET_NAME, []) == []
+
+
+def test_delete_s3_objects_sends_etags(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the ETags that objects must still have are sent with their keys"""
+    s3_client = boto3.client("s3")
+    sent_objects = []
+    s3_client.meta.events.register(
+        "provide-client-params.s3.DeleteObjects",
+        lambda params, **_: sent_objects.extend(params["Delete"]["Objects"]),
+    )
+    upload_s3_object(TEST_BUCKET_NAME, "a.txt", b"Test", s3_client=s3_client)
+    etag = s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="a.txt")["ETag"]
+
+    errors = delete_s3_objects(TEST_BUCKET_NAME, ["a.txt", "b.txt"], etags={"a.txt": etag}, s3_client=s3_client)
+    assert errors == []
+    assert sent_objects == [{"Key": "a.txt", "ETag": etag}, {"Key": "b.txt"}]
+
+
+def test_iter_delete_batches():
+    """Test keys are split into batches of at most 1000 keys"""
+    object_keys = [f"file_{i}.txt" for i in range(2500)]
+    batches = list(iter_delete_batches(object_keys))
+    assert [len(batch) for batch in batches] == [1000, 1000, 500]
+    assert [key for batch in batches for key in batch] == object_keys
@@ -0,0 +1,81 @@
+"""Test cases for `s3.directory_stats`."""
+
+from files_api.s3.directory_stats import (
+    LARGEST_FILES_COUNT,
+    DirectoryStats,
+    DirectoryStatsCache,
+)
+
+BUCKET_NAME = "bucket"
+
+
+def test_directory_stats_aggregates():
+    """Test files are counted, summed, bucketed by size and ranked"""
+    stats = DirectoryStats.from_files("dir/", [("dir/a", 10), ("dir/b", 2048), ("dir/c", 5 * 1024 * 1024 * 1024)])
+    assert (stats.file_count, stats.total_bytes) == (3, 10 + 2048 + 5 * 1024 * 1024 * 1024)
+    assert stats.size_histogram == [1, 1, 0, 0, 0, 0, 1]
+    assert stats.largest_files[0] == (5 * 1024 * 1024 * 1024, "dir/c")
+
+
+def test_removing_one_of_the_largest_files_needs_a_recompute():
+    """Test the stats report when they can no longer be updated incrementally"""
+    files = [(f"dir/{i:02}", i) for i in range(LARGEST_FILES_COUNT + 1)]
+    stats = DirectoryStats.from_files("dir/", files)
+    assert [file_path for _, file_path in stats.largest_files][:2] == ["dir/10", "dir/09"]
+    assert stats.remove("dir/00", 0)
+    # all remaining files are ranked, so the ranking stays complete
+    assert stats.remove("dir/10", 10)
+
+    stats = DirectoryStats.from_files("dir/", files)
+    assert not stats.remove("dir/10", 10)
+
+
+def test_cache_applies_changes_to_containing_directories():
+    """Test writes and deletes update every cached directory that contains the file"""
+    cache = DirectoryStatsCache(max_entries=10, ttl_seconds=30)
+    cache.put(BUCKET_NAME, DirectoryStats.from_files("a/", [("a/1", 1)]))
+    cache.put(BUCKET_NAME, DirectoryStats.from_files("a/b/", []))
+    assert cache.covers(BUCKET_NAME, "a/b/2")
+    assert not cache.covers(BUCKET_NAME, "c/3")
+
+    cache.file_written(BUCKET_NAME, "a/b/2", None, 5)
+    assert cache.get(BUCKET_NAME, "a/").total_bytes == 6
+    assert cache.get(BUCKET_NAME, "a/b/").file_count == 1
+
+    cache.file_written(BUCKET_NAME, "a/1", 1, 3)
+    cache.file_deleted(BUCKET_NAME, "a/b/2", 5)
+    stats = cache.get(BUCKET_NAME, "a/")
+    assert (stats.file_count, stats.total_bytes, stats.largest_files) == (1, 3, [(3, "a/1")])
+
+    cache.invalidate_file(BUCKET_NAME, "a/b/4")
+    assert len(cache) == 0
+
+
+def test_listing_from_before_a_change_is_not_cached():
+    """Test the stats of a directory are not cached if one of its files changed while it was listed"""
+    cache = DirectoryStatsCache(max_entries=10, ttl_seconds=30)
+    version = cache.version()
+    cache.file_written(BUCKET_NAME, "a/1", None, 1)
+    cache.put(BUCKET_NAME, DirectoryStats.from_files("a/", []), version=version)
+    assert cache.get(BUCKET_NAME, "a/") is None
+
+    cache.put(BUCKET_NAME, DirectoryStats.from_files("b/", []), version=version)
+    assert cache.get(BUCKET_NAME, "b/") is not None
+
+
+def test_concurrent_changes_of_a_file_drop_its_directories():
+    """Test the second of two overwrites that looked up the same old size does not count it again"""
+    cache = DirectoryStatsCache(max_entries=10, ttl_seconds=30)
+    cache.put(BUCKET_NAME, DirectoryStats.from_files("a/", [("a/1", 1)]))
+    version = cache.version()
+    cache.file_written(BUCKET_NAME, "a/1", 1, 2, version=version)
+    assert cache.get(BUCKET_NAME, "a/").total_bytes == 2
+    cache.file_written(BUCKET_NAME, "a/1", 1, 3, version=version)
+    assert cache.get(BUCKET_NAME, "a/") is None
+
+
+def test_cached_stats_are_copies():
+    cache = DirectoryStatsCache(max_entries=10, ttl_seconds=30)
+    cache.put(BUCKET_NAME, DirectoryStats("a/"))
+    cache.get(BUCKET_NAME, "a/").add("a/1", 1)
+    assert cache.get(BUCKET_NAME, "a/").file_count == 0
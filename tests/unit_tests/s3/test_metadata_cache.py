@@ -0,0 +1,77 @@
+"""Test cases for `s3.metadata_cache`."""
+
+from files_api.s3.metadata_cache import MetadataCache
+
+BUCKET_NAME = "bucket"
+METADATA = {"ContentType": "text/plain", "ContentLength": 4, "ETag": '"etag"', "Body": b"not cached"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_get_counts_hits_and_misses():
+    """Test cached metadata is returned without the response's other keys and lookups are counted"""
+    cache = MetadataCache(max_entries=10, ttl_seconds=30)
+    assert cache.get(BUCKET_NAME, "a.txt") is None
+    cache.put(BUCKET_NAME, "a.txt", METADATA)
+    assert cache.get(BUCKET_NAME, "a.txt") == {"ContentType": "text/plain", "ContentLength": 4, "ETag": '"etag"'}
+    assert cache.get("other-bucket", "a.txt") is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_entries_expire_after_the_ttl():
+    """Test an entry is served until its TTL runs out"""
+    clock = FakeClock()
+    cache = MetadataCache(max_entries=10, ttl_seconds=30, clock=clock)
+    cache.put(BUCKET_NAME, "a.txt", METADATA)
+    clock.now = 29.9
+    assert cache.get(BUCKET_NAME, "a.txt") is not None
+    clock.now = 30
+    assert cache.get(BUCKET_NAME, "a.txt") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test the cache never holds more than `max_entries` and evicts the least recently used entry"""
+    cache = MetadataCache(max_entries=2, ttl_seconds=30)
+    cache.put(BUCKET_NAME, "a.txt", METADATA)
+    cache.put(BUCKET_NAME, "b.txt", METADATA)
+    cache.get(BUCKET_NAME, "a.txt")
+    cache.put(BUCKET_NAME, "c.txt", METADATA)
+    assert len(cache) == 2
+    assert cache.get(BUCKET_NAME, "b.txt") is None
+    assert cache.get(BUCKET_NAME, "a.txt") is not None
+
+
+def test_invalidate():
+    """Test an invalidated entry is no longer served"""
+    cache = MetadataCache(max_entries=10, ttl_seconds=30)
+    cache.put(BUCKET_NAME, "a.txt", METADATA)
+    cache.invalidate(BUCKET_NAME, "a.txt")
+    cache.invalidate(BUCKET_NAME, "never-cached.txt")
+    assert cache.get(BUCKET_NAME, "a.txt") is None
+
+
+def test_put_of_a_read_from_before_an_invalidation_is_ignored():
+    """Test a read that was in flight while the object was overwritten does not cache stale metadata"""
+    cache = MetadataCache(max_entries=1, ttl_seconds=30)
+    version = cache.version()
+    cache.invalidate(BUCKET_NAME, "a.txt")
+    cache.put(BUCKET_NAME, "a.txt", METADATA, version=version)
+    assert cache.get(BUCKET_NAME, "a.txt") is None
+
+    # reads that started after the invalidation are cached
+    cache.put(BUCKET_NAME, "a.txt", METADATA, version=cache.version())
+    assert cache.get(BUCKET_NAME, "a.txt") is not None
+
+    # once the invalidation is no longer tracked, reads from before it are not cached either
+    version = cache.version()
+    cache.invalidate(BUCKET_NAME, "a.txt")
+    cache.invalidate(BUCKET_NAME, "b.txt")
+    cache.put(BUCKET_NAME, "a.txt", METADATA, version=version)
+    assert cache.get(BUCKET_NAME, "a.txt") is None
@@ -0,0 +1,41 @@
+"""Test cases for `s3.multipart_uploads`."""
+
+import io
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import boto3
+
+from files_api.s3.multipart_uploads import (
+    abort_stale_multipart_uploads,
+    complete_multipart_upload,
+    create_multipart_upload,
+    list_uploaded_parts,
+    upload_part,
+)
+from tests.consts import TEST_BUCKET_NAME
+
+
+def test_multipart_upload_in_any_part_order(mocked_aws):  # pylint: disable=unused-argument
+    upload_id = create_multipart_upload(TEST_BUCKET_NAME, "large.bin", content_type="text/plain")
+    upload_part(TEST_BUCKET_NAME, "large.bin", upload_id, 2, io.BytesIO(b"end"))
+    upload_part(TEST_BUCKET_NAME, "large.bin", upload_id, 1, io.BytesIO(b"a" * (5 * 1024 * 1024)))
+
+    parts = list_uploaded_parts(TEST_BUCKET_NAME, "large.bin", upload_id)
+    assert [(part["PartNumber"], part["Size"]) for part in parts] == [(1, 5 * 1024 * 1024), (2, 3)]
+    complete_multipart_upload(TEST_BUCKET_NAME, "large.bin", upload_id, parts)
+
+    response = boto3.client("s3").get_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")
+    assert response["ContentType"] == "text/plain"
+    assert response["Body"].read() == b"a" * (5 * 1024 * 1024) + b"end"
+
+
+def test_abort_stale_multipart_uploads(mocked_aws):  # pylint: disable=unused-argument
+    create_multipart_upload(TEST_BUCKET_NAME, "stale.bin")
+    # moto reports every upload as initiated on 2010-11-10
+    assert abort_stale_multipart_uploads(TEST_BUCKET_NAME, datetime(2010, 1, 1, tzinfo=timezone.utc)) == []
+
+    assert abort_stale_multipart_uploads(TEST_BUCKET_NAME, datetime.now(timezone.utc)) == ["stale.bin"]
+    assert not boto3.client("s3").list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads")
@@ -0,0 +1,79 @@
+"""Test cases for `s3.negative_cache`."""
+
+from files_api.s3.negative_cache import (
+    BloomFilter,
+    NegativeLookupCache,
+)
+
+BUCKET_NAME = "bucket"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test every added item is reported as a member and most other items are not"""
+    keys = [f"folder/file_{i}.txt" for i in range(1000)]
+    bloom_filter = BloomFilter.from_items(keys, n_items=len(keys), false_positive_rate=0.01)
+    assert all(key in bloom_filter for key in keys)
+    false_positives = sum(f"folder/missing_{i}.txt" in bloom_filter for i in range(1000))
+    assert false_positives < 50
+
+
+def test_missing_keys_expire_after_the_ttl():
+    """Test a missing key is known as missing until its TTL runs out, and lookups are counted"""
+    clock = FakeClock()
+    cache = NegativeLookupCache(max_entries=10, ttl_seconds=5, clock=clock)
+    assert not cache.is_known_missing(BUCKET_NAME, "a.txt")
+    cache.record_missing(BUCKET_NAME, "a.txt")
+    assert cache.is_known_missing(BUCKET_NAME, "a.txt")
+    clock.now = 5
+    assert not cache.is_known_missing(BUCKET_NAME, "a.txt")
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 0}
+
+
+def test_record_written_clears_a_missing_key():
+    """Test a key that was written is no longer known as missing"""
+    cache = NegativeLookupCache(max_entries=10, ttl_seconds=5)
+    cache.record_missing(BUCKET_NAME, "a.txt")
+    cache.record_written(BUCKET_NAME, "a.txt")
+    assert not cache.is_known_missing(BUCKET_NAME, "a.txt")
+
+
+def test_lookup_from_before_a_write_does_not_record_the_key_as_missing():
+    """Test a lookup that was in flight while the object was written does not remember it as missing"""
+    cache = NegativeLookupCache(max_entries=10, ttl_seconds=5)
+    version = cache.version()
+    cache.record_written(BUCKET_NAME, "a.txt")
+    cache.record_missing(BUCKET_NAME, "a.txt", version=version)
+    assert not cache.is_known_missing(BUCKET_NAME, "a.txt")
+
+    cache.record_missing(BUCKET_NAME, "b.txt", version=version)
+    assert cache.is_known_missing(BUCKET_NAME, "b.txt")
+
+
+def test_bloom_filter_answers_lookups_under_its_prefix():
+    """Test the Bloom filter reports keys it does not contain as missing, only under its prefix and until it expires"""
+    clock = FakeClock()
+    cache = NegativeLookupCache(max_entries=10, ttl_seconds=5, bloom_max_age_seconds=60, clock=clock)
+    cache.begin_bloom_filter_build(BUCKET_NAME)
+    # written while the listing runs, so the listing may not include it
+    cache.record_written(BUCKET_NAME, "folder/new.txt")
+    bloom_filter = BloomFilter.from_items(["folder/a.txt"], n_items=1, false_positive_rate=0.001)
+    cache.load_bloom_filter(BUCKET_NAME, "folder/", bloom_filter)
+
+    assert cache.is_known_missing(BUCKET_NAME, "folder/missing.txt")
+    assert not cache.is_known_missing(BUCKET_NAME, "folder/a.txt")
+    assert not cache.is_known_missing(BUCKET_NAME, "folder/new.txt")
+    assert not cache.is_known_missing(BUCKET_NAME, "other/missing.txt")
+
+    cache.record_written(BUCKET_NAME, "folder/newer.txt")
+    assert not cache.is_known_missing(BUCKET_NAME, "folder/newer.txt")
+
+    clock.now = 60
+    assert not cache.is_known_missing(BUCKET_NAME, "folder/missing.txt")
@@ -0,0 +1,31 @@
+"""Test cases for `s3.pending_uploads`."""
+
+from files_api.s3.pending_uploads import PendingUploads
+
+BUCKET_NAME = "bucket"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_keys_are_pending_until_their_last_url_expires():
+    """Test a key stays pending until the latest of its upload URLs expires"""
+    clock = FakeClock()
+    pending_uploads = PendingUploads(clock=clock)
+    pending_uploads.add(BUCKET_NAME, "dir/a.txt", 60)
+    pending_uploads.add(BUCKET_NAME, "dir/a.txt", 30)
+    assert pending_uploads.contains(BUCKET_NAME, "dir/a.txt")
+    assert not pending_uploads.contains("other-bucket", "dir/a.txt")
+    assert pending_uploads.any_under(BUCKET_NAME, "dir/")
+    assert not pending_uploads.any_under(BUCKET_NAME, "other/")
+
+    clock.now = 30
+    assert pending_uploads.contains(BUCKET_NAME, "dir/a.txt")
+    clock.now = 60
+    assert not pending_uploads.contains(BUCKET_NAME, "dir/a.txt")
+    assert not pending_uploads.any_under(BUCKET_NAME, "dir/")
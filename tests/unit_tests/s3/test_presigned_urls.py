@@ -0,0 +1,50 @@
+"""Test cases for `s3.presigned_urls`, whose URLs are requested with `requests`, which moto intercepts."""
+
+import boto3
+import requests
+
+from files_api.s3.multipart_uploads import create_multipart_upload
+from files_api.s3.presigned_urls import (
+    create_presigned_abort_url,
+    create_presigned_complete_url,
+    create_presigned_download_url,
+    create_presigned_upload_part_urls,
+    create_presigned_upload_url,
+)
+from tests.consts import TEST_BUCKET_NAME
+
+
+def test_presigned_upload_and_download(mocked_aws):  # pylint: disable=unused-argument
+    url = create_presigned_upload_url(TEST_BUCKET_NAME, "file.txt", 60, content_type="text/plain")
+    response = requests.put(url, data=b"content", headers={"Content-Type": "text/plain"}, timeout=10)
+    assert response.status_code == 200
+
+    url = create_presigned_download_url(TEST_BUCKET_NAME, "file.txt", 60)
+    response = requests.get(url, headers={"Range": "bytes=0-2"}, timeout=10)
+    assert response.status_code == 206
+    assert response.content == b"con"
+
+
+def test_presigned_multipart_upload(mocked_aws):  # pylint: disable=unused-argument
+    s3_client = boto3.client("s3")
+    parts = [b"a" * (5 * 1024 * 1024), b"b"]
+    upload_id = create_multipart_upload(TEST_BUCKET_NAME, "large.bin", s3_client=s3_client)
+    urls = create_presigned_upload_part_urls(TEST_BUCKET_NAME, "large.bin", upload_id, [1, 2], 60, s3_client=s3_client)
+    etags = [requests.put(url, data=part, timeout=10).headers["ETag"] for url, part in zip(urls, parts)]
+
+    document = "".join(
+        f"<Part><PartNumber>{part_number}</PartNumber><ETag>{etag}</ETag></Part>"
+        for part_number, etag in enumerate(etags, start=1)
+    )
+    url = create_presigned_complete_url(TEST_BUCKET_NAME, "large.bin", upload_id, 60, s3_client=s3_client)
+    response = requests.post(url, data=f"<CompleteMultipartUpload>{document}</CompleteMultipartUpload>", timeout=10)
+    assert response.status_code == 200
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")["Body"].read() == b"".join(parts)
+
+
+def test_presigned_abort(mocked_aws):  # pylint: disable=unused-argument
+    s3_client = boto3.client("s3")
+    upload_id = create_multipart_upload(TEST_BUCKET_NAME, "aborted.bin", s3_client=s3_client)
+    url = create_presigned_abort_url(TEST_BUCKET_NAME, "aborted.bin", upload_id, 60, s3_client=s3_client)
+    assert requests.delete(url, timeout=10).status_code == 204
+    assert not s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads")
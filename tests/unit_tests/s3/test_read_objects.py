@@ -1,10 +1,17 @@
 """Test cases for `s3.read_objects`."""
 
 import boto3
+import pytest
+from botocore.exceptions import ClientError
 
 from files_api.s3.read_objects import (
+    fetch_s3_object,
+    fetch_s3_object_metadata,
     fetch_s3_objects_metadata,
     fetch_s3_objects_using_page_token,
+    is_missing_object_error,
+    is_not_modified_error,
+    iter_s3_object_body,
     object_exists_in_s3,
 )
 from tests.consts import TEST_BUCKET_NAME
@@ -90,3 +97,47 @@ def test_directory_queries(mocked_aws: None):  # pylint: disable=unused-argument
     assert objects[3]["Key"] == "folder2/file_3.txt"
     assert objects[4]["Key"] == "folder2/subfolder/file_4.txt"
     assert next_token is None
+
+
+def test_fetch_s3_object_metadata(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test fetching object metadata and the error raised for a missing object"""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY, Body=b"test content", ContentType="text/plain")
+    response = fetch_s3_object_metadata(TEST_BUCKET_NAME, OBJECT_KEY)
+    assert response["ContentType"] == "text/plain"
+    assert response["ContentLength"] == len(b"test content")
+
+    with pytest.raises(ClientError) as err:
+        fetch_s3_object_metadata(TEST_BUCKET_NAME, "missing.txt")
+    assert is_missing_object_error(err.value)
+
+    with pytest.raises(ClientError) as err:
+        fetch_s3_object(TEST_BUCKET_NAME, "missing.txt")
+    assert is_missing_object_error(err.value)
+
+
+def test_fetch_s3_object_not_modified(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test a conditional read of an unchanged object raises a not-modified error"""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY, Body=b"test content")
+    etag = fetch_s3_object_metadata(TEST_BUCKET_NAME, OBJECT_KEY)["ETag"]
+
+    with pytest.raises(ClientError) as err:
+        fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY, if_none_match=etag)
+    assert is_not_modified_error(err.value)
+    assert not is_missing_object_error(err.value)
+
+    response = fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY, if_none_match='"stale-etag"')
+    assert response["Body"].read() == b"test content"
+
+
+def test_iter_s3_object_body(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the content is read in fixed-size chunks, newlines or not, and the body is closed"""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=OBJECT_KEY, Body=b"a\n" * 10 + b"b" * 10)
+    body = fetch_s3_object(TEST_BUCKET_NAME, OBJECT_KEY)["Body"]
+
+    chunks = list(iter_s3_object_body(body, chunk_size=8))
+    assert [len(chunk) for chunk in chunks] == [8, 8, 8, 6]
+    assert b"".join(chunks) == b"a\n" * 10 + b"b" * 10
+    assert body._raw_stream.closed  # pylint: disable=protected-access
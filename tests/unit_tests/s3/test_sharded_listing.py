@@ -0,0 +1,124 @@
+"""Test cases for `s3.sharded_listing`."""
+
+import threading
+import time
+
+import boto3
+import pytest
+
+from files_api.s3 import sharded_listing
+from files_api.s3.sharded_listing import (
+    discover_shards,
+    iter_s3_objects_sharded,
+)
+from tests.consts import TEST_BUCKET_NAME
+
+OBJECT_KEYS = sorted(
+    [
+        "a.txt",
+        "dir_a/file_1.txt",
+        "dir_a/sub/file_2.txt",
+        "dir_a0.txt",
+        "dir_b/file_3.txt",
+        "dir_b/file_4.txt",
+        "m.txt",
+        "z/file_5.txt",
+    ]
+    + [f"many/file_{i:03}.txt" for i in range(250)]
+)
+
+
+def put_objects() -> None:
+    s3_client = boto3.client("s3")
+    for object_key in OBJECT_KEYS:
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=object_key, Body=b"")
+
+
+def test_discover_shards(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the top-level objects and subdirectories are returned in key order"""
+    put_objects()
+    segments = list(discover_shards(TEST_BUCKET_NAME))
+    assert [segment if isinstance(segment, str) else segment["Key"] for segment in segments] == [
+        "a.txt",
+        "dir_a/",
+        "dir_a0.txt",
+        "dir_b/",
+        "m.txt",
+        "many/",
+        "z/",
+    ]
+
+    segments = list(discover_shards(TEST_BUCKET_NAME, prefix="dir_a/"))
+    assert [segment if isinstance(segment, str) else segment["Key"] for segment in segments] == [
+        "dir_a/file_1.txt",
+        "dir_a/sub/",
+    ]
+
+    # the second level splits "dir_a/sub/" too, which only holds a file
+    segments = list(discover_shards(TEST_BUCKET_NAME, prefix="dir_a/", depth=2))
+    assert [segment if isinstance(segment, str) else segment["Key"] for segment in segments] == [
+        "dir_a/file_1.txt",
+        "dir_a/sub/file_2.txt",
+    ]
+
+
+def test_iter_s3_objects_sharded_matches_a_sequential_listing(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the sharded listing returns every object exactly once, in key order"""
+    put_objects()
+    for depth in (1, 2):
+        pages = list(iter_s3_objects_sharded(TEST_BUCKET_NAME, max_concurrency=2, depth=depth, page_size=100))
+        assert [len(page) for page in pages] == [100, 100, 58]
+        assert [obj["Key"] for page in pages for obj in page] == OBJECT_KEYS
+
+    pages = iter_s3_objects_sharded(TEST_BUCKET_NAME, prefix="dir_")
+    assert [obj["Key"] for page in pages for obj in page] == [key for key in OBJECT_KEYS if key.startswith("dir_")]
+    assert not list(iter_s3_objects_sharded(TEST_BUCKET_NAME, prefix="missing/"))
+
+
+def test_closing_the_listing_does_not_wait_for_the_shards_being_listed(
+    mocked_aws: None, monkeypatch: pytest.MonkeyPatch
+):  # pylint: disable=unused-argument
+    """Test closing a listing early, e.g. because the client disconnected, does not block on its running shards"""
+    put_objects()
+    release = threading.Event()
+    list_shard = sharded_listing._list_shard  # pylint: disable=protected-access
+
+    def slow_list_shard(bucket_name, shard_prefix, *args, **kwargs):
+        release.wait(timeout=10)
+        return list_shard(bucket_name, shard_prefix, *args, **kwargs)
+
+    monkeypatch.setattr(sharded_listing, "_list_shard", slow_list_shard)
+    pages = iter_s3_objects_sharded(TEST_BUCKET_NAME, max_concurrency=2, page_size=1)
+    assert [obj["Key"] for obj in next(pages)] == ["a.txt"]
+
+    started_at = time.monotonic()
+    pages.close()
+    assert time.monotonic() - started_at < 5
+    release.set()
+
+
+def test_listing_reads_a_few_pages_ahead(monkeypatch: pytest.MonkeyPatch):
+    """Test a flat prefix and a large shard are listed a few pages ahead of the consumer, not in full"""
+    pages_read = []
+
+    def iter_pages(bucket_name, prefix, delimiter=None, s3_client=None):  # pylint: disable=unused-argument
+        for page_number in range(100):
+            pages_read.append((prefix, page_number))
+            if delimiter is None:
+                yield [{"Key": f"{prefix}{page_number:03}_{i}"} for i in range(10)], []
+            elif page_number == 0:
+                yield [], ["shard/"]
+            else:
+                # the objects directly under the prefix, after the shard
+                yield [{"Key": f"top_{page_number:03}_{i}"} for i in range(10)], []
+
+    monkeypatch.setattr(sharded_listing, "iter_s3_objects_pages", iter_pages)
+    pages = iter_s3_objects_sharded(TEST_BUCKET_NAME, max_concurrency=2, page_size=10, s3_client=object())
+    assert [obj["Key"] for obj in next(pages)] == [f"shard/000_{i}" for i in range(10)]
+    time.sleep(0.5)
+    pages.close()
+
+    shard_pages_read = sum(prefix == "shard/" for prefix, _ in pages_read)
+    discovery_pages_read = sum(prefix == "" for prefix, _ in pages_read)
+    assert shard_pages_read <= sharded_listing.SHARD_PAGES_BUFFERED + 2
+    assert discovery_pages_read <= 3
@@ -1,8 +1,26 @@
+import io
+import os
+import threading
+from typing import Optional
+
 import boto3
+import psutil
+import pytest
+from boto3.s3.transfer import TransferConfig
 from moto import mock_aws
 
-from files_api.s3.write_objects import upload_s3_object
+from files_api.s3.client import (
+    create_s3_client,
+    create_transfer_config,
+)
+from files_api.s3.write_objects import (
+    copy_s3_object,
+    upload_s3_fileobj,
+    upload_s3_object,
+)
+from files_api.settings import Settings
 from tests.consts import TEST_BUCKET_NAME
+from tests.utils import record_s3_calls
 
 
 @mock_aws
@@ -26,3 +44,144 @@ def test_upload_s3_object(mocked_aws):  # pylint: disable=unused-argument
     # for obj in object.get('Contents', []):
     #     s3_client.delete_object(Bucket=TEST_BUCKET_NAME, Key=obj.get('Key'))
     # s3_client.delete_bucket(Bucket=TEST_BUCKET_NAME)
+
+
+MIB = 1024 * 1024
+
+
+class GeneratedStream(io.RawIOBase):
+    """A non-seekable stream of `size` zero bytes, optionally failing once `fail_after` bytes were read."""
+
+    def __init__(self, size: int, fail_after: Optional[int] = None):
+        self.remaining = size
+        self.bytes_read = 0
+        self.fail_after = fail_after
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self.fail_after is not None and self.bytes_read >= self.fail_after:
+            raise IOError("client disconnected")
+        n_bytes = min(len(buffer), self.remaining)
+        buffer[:n_bytes] = bytes(n_bytes)
+        self.remaining -= n_bytes
+        self.bytes_read += n_bytes
+        return n_bytes
+
+
+def test_upload_s3_fileobj_small_file_uses_put_object(mocked_aws):  # pylint: disable=unused-argument
+    """Test a file below the multipart threshold is uploaded with a single call"""
+    s3_client = boto3.client("s3")
+    calls = record_s3_calls(s3_client)
+    upload_s3_fileobj(TEST_BUCKET_NAME, "small.txt", io.BytesIO(b"small"), "text/plain", s3_client=s3_client)
+
+    assert calls == ["PutObject"]
+    resp = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="small.txt")
+    assert resp.get("ContentType") == "text/plain"
+    assert resp.get("Body").read() == b"small"
+
+
+def test_upload_s3_fileobj_uploads_the_rest_of_a_file(mocked_aws):  # pylint: disable=unused-argument
+    """Test the content of a file from its current position on is uploaded"""
+    s3_client = boto3.client("s3")
+    fileobj = io.BytesIO(b"header:content")
+    fileobj.seek(len(b"header:"))
+    upload_s3_fileobj(TEST_BUCKET_NAME, "rest.txt", fileobj, s3_client=s3_client)
+    assert s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="rest.txt")["Body"].read() == b"content"
+
+
+def test_upload_s3_fileobj_large_file_uses_multipart_upload(mocked_aws):  # pylint: disable=unused-argument
+    """Test a file above the multipart threshold is uploaded in parts"""
+    s3_client = boto3.client("s3")
+    calls = record_s3_calls(s3_client)
+    transfer_config = TransferConfig(multipart_threshold=5 * MIB, multipart_chunksize=5 * MIB, max_concurrency=2)
+    upload_s3_fileobj(
+        TEST_BUCKET_NAME, "large.bin", GeneratedStream(12 * MIB), transfer_config=transfer_config, s3_client=s3_client
+    )
+
+    assert calls.count("UploadPart") == 3
+    assert "CompleteMultipartUpload" in calls
+    resp = s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="large.bin")
+    assert resp["ContentLength"] == 12 * MIB
+    assert resp["ContentType"] == "application/octet-stream"
+
+
+def test_upload_s3_fileobj_aborts_multipart_upload_on_failure(mocked_aws):  # pylint: disable=unused-argument
+    """Test a failed multipart upload does not leave orphaned parts behind"""
+    s3_client = boto3.client("s3")
+    transfer_config = TransferConfig(multipart_threshold=5 * MIB, multipart_chunksize=5 * MIB, max_concurrency=2)
+    with pytest.raises(IOError):
+        upload_s3_fileobj(
+            TEST_BUCKET_NAME,
+            "large.bin",
+            GeneratedStream(20 * MIB, fail_after=10 * MIB),
+            transfer_config=transfer_config,
+            s3_client=s3_client,
+        )
+
+    assert s3_client.list_multipart_uploads(Bucket=TEST_BUCKET_NAME).get("Uploads", []) == []
+    assert "Contents" not in s3_client.list_objects_v2(Bucket=TEST_BUCKET_NAME)
+
+
+def test_copy_s3_object_small_file_uses_copy_object(mocked_aws):  # pylint: disable=unused-argument
+    """Test a small file of known size is copied with a single call and keeps its content type"""
+    s3_client = boto3.client("s3")
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="src.txt", Body=b"small", ContentType="text/plain")
+    calls = record_s3_calls(s3_client)
+    copy_s3_object(TEST_BUCKET_NAME, "src.txt", "dst.txt", size_bytes=5, s3_client=s3_client)
+
+    assert calls == ["CopyObject"]
+    resp = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="dst.txt")
+    assert resp.get("ContentType") == "text/plain"
+    assert resp.get("Body").read() == b"small"
+
+
+def test_copy_s3_object_large_file_uses_upload_part_copy(mocked_aws):  # pylint: disable=unused-argument
+    """Test a file above the multipart threshold is copied in parts and keeps its content type"""
+    s3_client = boto3.client("s3")
+    content = os.urandom(12 * MIB)
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="large.bin", Body=content, ContentType="image/png")
+    calls = record_s3_calls(s3_client)
+    transfer_config = TransferConfig(multipart_threshold=5 * MIB, multipart_chunksize=5 * MIB, max_concurrency=3)
+    copy_s3_object(TEST_BUCKET_NAME, "large.bin", "copy.bin", transfer_config=transfer_config, s3_client=s3_client)
+
+    assert calls.count("UploadPartCopy") == 3
+    resp = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="copy.bin")
+    assert resp["ContentType"] == "image/png"
+    assert resp["Body"].read() == content
+
+
+@pytest.mark.slow
+def test_upload_s3_fileobj_memory_stays_bounded(moto_server):  # pylint: disable=unused-argument
+    """Test the peak memory of a multi-GB upload is bounded by a few parts, not by the file size"""
+    upload_size = int(os.getenv("LARGE_UPLOAD_SIZE_BYTES", str(2 * 1024 * MIB)))
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME)
+    s3_client = create_s3_client(settings)
+
+    process = psutil.Process()
+    baseline_rss = process.memory_info().rss
+    peak_rss = baseline_rss
+    upload_done = threading.Event()
+
+    def sample_rss():
+        nonlocal peak_rss
+        while not upload_done.wait(0.05):
+            peak_rss = max(peak_rss, process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample_rss)
+    sampler.start()
+    try:
+        upload_s3_fileobj(
+            TEST_BUCKET_NAME,
+            "huge.bin",
+            GeneratedStream(upload_size),
+            transfer_config=create_transfer_config(settings),
+            s3_client=s3_client,
+        )
+    finally:
+        upload_done.set()
+        sampler.join()
+
+    assert s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="huge.bin")["ContentLength"] == upload_size
+    assert peak_rss - baseline_rss < 256 * MIB
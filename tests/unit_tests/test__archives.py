@@ -0,0 +1,56 @@
+"""Test cases for `archives`."""
+
+import io
+import os
+import tarfile
+import zipfile
+from datetime import (
+    datetime,
+    timezone,
+)
+from typing import Dict
+
+import pytest
+
+from files_api.archives import (
+    ArchiveWriter,
+    TarGzArchiveWriter,
+    ZipArchiveWriter,
+)
+
+FILES = {"a.txt": b"hello", "sub/b.bin": bytes(range(256)) * 1000, "empty": b""}
+LAST_MODIFIED = datetime(2024, 1, 2, 3, 4, 6, tzinfo=timezone.utc)
+
+
+def write_archive(writer: ArchiveWriter, files: Dict[str, bytes], chunk_size: int = 1000) -> bytes:
+    archive = b""
+    for file_name, content in files.items():
+        archive += writer.start_file(file_name, len(content), LAST_MODIFIED)
+        for start in range(0, len(content), chunk_size):
+            archive += writer.write(content[start : start + chunk_size])
+        archive += writer.end_file()
+    return archive + writer.close()
+
+
+def test_zip_archive():
+    with zipfile.ZipFile(io.BytesIO(write_archive(ZipArchiveWriter(), FILES))) as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == FILES
+        assert archive.getinfo("a.txt").date_time == (2024, 1, 2, 3, 4, 6)
+
+
+def test_tar_gz_archive():
+    with tarfile.open(fileobj=io.BytesIO(write_archive(TarGzArchiveWriter(), FILES)), mode="r:gz") as archive:
+        assert {member.name: archive.extractfile(member).read() for member in archive.getmembers()} == FILES
+        assert archive.getmember("a.txt").mtime == int(LAST_MODIFIED.timestamp())
+
+
+@pytest.mark.parametrize("writer_class", [ZipArchiveWriter, TarGzArchiveWriter])
+def test_archive_writers_hand_out_output_as_it_is_written(writer_class):
+    """Test the writers do not buffer the whole archive until it is closed"""
+    writer = writer_class()
+    writer.start_file("random.bin", 1024 * 1024, LAST_MODIFIED)
+    # random content does not compress, so the output keeps pace with the input
+    content = io.BytesIO(os.urandom(1024 * 1024))
+    written = sum(len(writer.write(content.read(64 * 1024))) for _ in range(16))
+    assert written > 512 * 1024
@@ -0,0 +1,61 @@
+"""Test cases for `byte_ranges`."""
+
+import anyio
+import pytest
+
+from files_api.byte_ranges import (
+    MAX_RANGES_PER_REQUEST,
+    iter_multipart_byteranges,
+    parse_if_range_header,
+    parse_range_header,
+)
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        ("bytes=0-99", ["bytes=0-99"]),
+        ("bytes=-500", ["bytes=-500"]),
+        ("bytes=100-", ["bytes=100-"]),
+        ("bytes=0-0, 5-9 ,-1", ["bytes=0-0", "bytes=5-9", "bytes=-1"]),
+        (None, None),
+        ("", None),
+        ("items=0-9", None),
+        ("bytes=", None),
+        ("bytes=-", None),
+        ("bytes=9-0", None),
+        ("bytes=a-b", None),
+        ("bytes=" + ",".join(["0-1"] * (MAX_RANGES_PER_REQUEST + 1)), None),
+    ],
+)
+def test_parse_range_header(range_header, expected):
+    assert parse_range_header(range_header) == expected
+
+
+def test_parse_if_range_header():
+    assert parse_if_range_header('"abc"') == ('"abc"', None)
+    assert parse_if_range_header('W/"abc"') == (None, None)
+    assert parse_if_range_header("not a date") == (None, None)
+    etag, date = parse_if_range_header("Thu, 01 Jan 2022 00:00:00 GMT")
+    assert etag is None
+    assert date.year == 2022
+
+
+def test_iter_multipart_byteranges():
+    async def iter_chunks(*chunks: bytes):
+        for chunk in chunks:
+            yield chunk
+
+    async def iter_parts():
+        yield "bytes 0-1/10", iter_chunks(b"01")
+        yield "bytes 8-9/10", iter_chunks(b"8", b"9")
+
+    async def read_body() -> bytes:
+        return b"".join([chunk async for chunk in iter_multipart_byteranges(iter_parts(), "text/plain", "BOUNDARY")])
+
+    body = anyio.run(read_body)
+    assert body == (
+        b"--BOUNDARY\r\nContent-Type: text/plain\r\nContent-Range: bytes 0-1/10\r\n\r\n01\r\n"
+        b"--BOUNDARY\r\nContent-Type: text/plain\r\nContent-Range: bytes 8-9/10\r\n\r\n89\r\n"
+        b"--BOUNDARY--\r\n"
+    )
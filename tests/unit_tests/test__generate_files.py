@@ -0,0 +1,92 @@
+"""Test cases for `generate_files`."""
+
+import asyncio
+
+import httpx
+import pytest
+from openai import OpenAIError
+
+from files_api.generate_files import (
+    DownloadTooLargeError,
+    create_openai_client,
+    get_text_chat_completion,
+    stream_download,
+    stream_text_chat_completion,
+)
+from files_api.settings import Settings
+from tests.consts import TEST_BUCKET_NAME
+
+
+def test_openai_client_is_configured_from_settings(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "mocked_key")
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        openai_max_retries=5,
+        openai_connect_timeout_seconds=1.5,
+        openai_read_timeout_seconds=30,
+    )
+    client = asyncio.run(create_openai_client(settings))
+    assert client.max_retries == 5
+    assert (client.timeout.connect, client.timeout.read) == (1.5, 30)
+    asyncio.run(client.close())
+
+
+def test_openai_client_closes_its_connection_pool_if_openai_is_not_configured(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    http_clients = []
+
+    class RecordedAsyncClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            http_clients.append(self)
+
+    monkeypatch.setattr(httpx, "AsyncClient", RecordedAsyncClient)
+    with pytest.raises(OpenAIError):
+        asyncio.run(create_openai_client(Settings(s3_bucket_name=TEST_BUCKET_NAME)))
+    assert [http_client.is_closed for http_client in http_clients] == [True]
+
+
+def test_generations_share_the_client(mocked_openai):  # pylint: disable=unused-argument
+    async def generate_twice():
+        async with await create_openai_client(Settings(s3_bucket_name=TEST_BUCKET_NAME)) as client:
+            for _ in range(2):
+                content = await get_text_chat_completion("prompt", client=client)
+                assert content == "This is a mock response from the chat completion endpoint."
+            return client
+
+    client = asyncio.run(generate_twice())
+    assert client.is_closed()
+
+
+def test_stream_text_chat_completion_yields_the_text_as_it_is_generated(
+    mocked_openai,  # pylint: disable=unused-argument
+):
+    async def generate():
+        async with await create_openai_client(Settings(s3_bucket_name=TEST_BUCKET_NAME)) as client:
+            return [delta async for delta in stream_text_chat_completion("prompt", client=client, max_tokens=1000)]
+
+    deltas = asyncio.run(generate())
+    assert len(deltas) > 1
+    assert "".join(deltas) == "This is a mock response from the chat completion endpoint."
+
+
+@pytest.mark.parametrize("declare_size", [True, False])
+def test_stream_download_stops_at_the_size_limit(declare_size: bool):
+    """Test a download larger than allowed fails, whether or not the server declares its size up front"""
+
+    async def chunks():
+        for _ in range(3):
+            yield b"x" * 10
+
+    def handler(request: httpx.Request) -> httpx.Response:  # pylint: disable=unused-argument
+        if declare_size:
+            return httpx.Response(200, content=b"x" * 30)
+        return httpx.Response(200, content=chunks())
+
+    async def download(max_size_bytes: int) -> bytes:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+            return b"".join([chunk async for chunk in stream_download(http_client, "http://x/a.png", max_size_bytes)])
+
+    assert asyncio.run(download(max_size_bytes=30)) == b"x" * 30
+    with pytest.raises(DownloadTooLargeError):
+        asyncio.run(download(max_size_bytes=25))
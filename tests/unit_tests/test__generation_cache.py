@@ -0,0 +1,145 @@
+"""Test cases for `generation_cache`."""
+
+import asyncio
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+from typing import Optional
+
+import boto3
+import pytest
+
+from files_api.generation_cache import (
+    GenerationCache,
+    create_generation_cache,
+    generation_cache_key,
+)
+from files_api.metadata_index import MetadataIndex
+from files_api.s3.backends import S3Backend
+from files_api.settings import Settings
+from tests.consts import (
+    TEST_BUCKET_NAME,
+    TEST_GENERATION_CACHE_BUCKET_NAME,
+)
+from tests.utils import (
+    check_copy_source_if_match,
+    record_s3_calls,
+)
+
+PREFIX = "_generation_cache/"
+
+
+def create_test_generation_cache(s3_backend: Optional[S3Backend] = None, **kwargs) -> GenerationCache:
+    boto3.client("s3").create_bucket(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME)
+    options = {"ttl_seconds": 3600, "max_file_size_bytes": 100, "max_size_bytes": 1000, "lru_max_entries": 10}
+    return GenerationCache(
+        s3_backend or S3Backend(boto3.client("s3")),
+        TEST_BUCKET_NAME,
+        TEST_GENERATION_CACHE_BUCKET_NAME,
+        PREFIX,
+        **{**options, **kwargs},
+    )
+
+
+def test_generation_cache_key_depends_on_parameters_and_prompt():
+    key = generation_cache_key({"model": "a", "n": 1}, "prompt")
+    assert key == generation_cache_key({"n": 1, "model": "a"}, "prompt")
+    assert key != generation_cache_key({"model": "b", "n": 1}, "prompt")
+    assert key != generation_cache_key({"model": "a", "n": 1}, "other prompt")
+
+
+def test_generation_cache_copies_hits(mocked_aws: None):  # pylint: disable=unused-argument
+    s3_client = boto3.client("s3")
+    generation_cache = create_test_generation_cache()
+
+    async def generate_twice():
+        assert not await generation_cache.copy_to("key", "first.txt")
+        etag = s3_client.put_object(
+            Bucket=TEST_BUCKET_NAME, Key="first.txt", Body=b"generated", ContentType="text/plain"
+        )["ETag"]
+        await generation_cache.store("key", "first.txt", size_bytes=9, etag=etag)
+        return await generation_cache.copy_to("key", "second.txt")
+
+    assert asyncio.run(generate_twice())
+    assert generation_cache.stats() == {"hits": 1, "misses": 1}
+    response = s3_client.get_object(Bucket=TEST_BUCKET_NAME, Key="second.txt")
+    assert response["Body"].read() == b"generated"
+    assert response["ContentType"] == "text/plain"
+
+
+def test_generation_cache_skips_large_files_and_evicted_entries(mocked_aws: None):  # pylint: disable=unused-argument
+    s3_client = boto3.client("s3")
+    generation_cache = create_test_generation_cache(max_file_size_bytes=5)
+    etag = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="large.txt", Body=b"generated")["ETag"]
+
+    async def store_and_copy():
+        await generation_cache.store("key", "large.txt", size_bytes=9, etag=etag)
+        return await generation_cache.copy_to("key", "copy.txt")
+
+    assert not asyncio.run(store_and_copy())
+
+    # an entry the LRU knows about, but which was deleted from S3 since, is a miss
+    s3_client.put_object(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME, Key=f"{PREFIX}key", Body=b"x")
+    assert asyncio.run(generation_cache.copy_to("key", "copy.txt"))
+    s3_client.delete_object(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME, Key=f"{PREFIX}key")
+    assert not asyncio.run(generation_cache.copy_to("key", "copy.txt"))
+
+
+def test_generation_cache_stores_entries_without_mirroring_them(mocked_aws: None):  # pylint: disable=unused-argument
+    """Test the cache bucket is not mirrored into the metadata index, which only describes the files bucket"""
+    s3_client = boto3.client("s3")
+    metadata_index = MetadataIndex(":memory:")
+    generation_cache = create_test_generation_cache(S3Backend(boto3.client("s3"), metadata_index=metadata_index))
+    etag = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="generated.txt", Body=b"generated")["ETag"]
+
+    calls = record_s3_calls(generation_cache.s3_backend.s3_client)
+    asyncio.run(generation_cache.store("key", "generated.txt", size_bytes=9, etag=etag))
+    assert calls == ["CopyObject"]
+    assert metadata_index.get(TEST_GENERATION_CACHE_BUCKET_NAME, f"{PREFIX}key") is None
+
+
+def test_generation_cache_skips_files_overwritten_since_they_were_generated(
+    mocked_aws: None,  # pylint: disable=unused-argument
+):
+    s3_client = boto3.client("s3")
+    generation_cache = create_test_generation_cache()
+    check_copy_source_if_match(generation_cache.s3_backend.s3_client)
+    etag = s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="generated.txt", Body=b"generated")["ETag"]
+    # e.g. a concurrent PUT /v1/files/generated.txt
+    s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="generated.txt", Body=b"uploaded")
+
+    async def store_and_copy():
+        await generation_cache.store("key", "generated.txt", size_bytes=9, etag=etag)
+        return await generation_cache.copy_to("key", "copy.txt")
+
+    assert not asyncio.run(store_and_copy())
+
+
+def test_generation_cache_evicts_expired_entries_then_the_oldest(mocked_aws: None):  # pylint: disable=unused-argument
+    s3_client = boto3.client("s3")
+    generation_cache = create_test_generation_cache(max_size_bytes=25)
+    for key in ["a", "b", "c"]:
+        s3_client.put_object(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME, Key=f"{PREFIX}{key}", Body=b"x" * 10)
+    s3_client.put_object(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME, Key="not-cached.txt", Body=b"x" * 100)
+
+    # the entries share their LastModified, so which one is kept is arbitrary
+    evicted_keys = asyncio.run(generation_cache.evict())
+    assert len(evicted_keys) == 1 and evicted_keys[0].startswith(PREFIX)
+
+    evicted_keys = asyncio.run(generation_cache.evict(now=datetime.now(timezone.utc) + timedelta(hours=2)))
+    assert len(evicted_keys) == 2
+    remaining_objects = s3_client.list_objects_v2(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME)["Contents"]
+    assert [obj["Key"] for obj in remaining_objects] == ["not-cached.txt"]
+
+
+@pytest.mark.parametrize("cache_bucket_name", [None, TEST_BUCKET_NAME])
+def test_generation_cache_needs_a_bucket_of_its_own(cache_bucket_name):
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        generation_cache_enabled=True,
+        generation_cache_bucket_name=cache_bucket_name,
+    )
+    with pytest.raises(ValueError):
+        create_generation_cache(settings, S3Backend(boto3.client("s3")))
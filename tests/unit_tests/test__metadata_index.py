@@ -0,0 +1,95 @@
+"""Test cases for `metadata_index`."""
+
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from files_api.metadata_index import (
+    MetadataIndex,
+    cursor_of,
+)
+
+BUCKET_NAME = "bucket"
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def make_index() -> MetadataIndex:
+    index = MetadataIndex(":memory:")
+    for i, file_path in enumerate(["a/1.txt", "a/2.txt", "a/sub/3.txt", "b/4.txt", "c.txt"]):
+        # sizes and dates in a different order than the paths
+        size_bytes, last_modified = (i * 3) % 5 * 100, EPOCH - timedelta(days=i)
+        index.upsert(BUCKET_NAME, file_path, size_bytes=size_bytes, last_modified=last_modified, etag=None)
+    return index
+
+
+def file_paths_of(files):
+    return [file.file_path for file in files]
+
+
+def test_query_directory_and_filters():
+    """Test listings are limited to a directory and filtered by size and date"""
+    index = make_index()
+    files, has_more = index.query(BUCKET_NAME, directory="a/")
+    assert file_paths_of(files) == ["a/1.txt", "a/2.txt", "a/sub/3.txt"]
+    assert not has_more
+    assert file_paths_of(index.query(BUCKET_NAME, min_size=300)[0]) == ["a/2.txt", "b/4.txt"]
+    files, _ = index.query(BUCKET_NAME, modified_since=EPOCH - timedelta(days=1))
+    assert file_paths_of(files) == ["a/1.txt", "a/2.txt"]
+    assert index.query("other-bucket")[0] == []
+
+
+def test_query_sorted_pages():
+    """Test sorted listings are paginated with the cursor of the last file of each page"""
+    index = make_index()
+    for sort, expected in [
+        ("size", ["a/1.txt", "a/sub/3.txt", "c.txt", "a/2.txt", "b/4.txt"]),
+        ("last_modified", ["c.txt", "b/4.txt", "a/sub/3.txt", "a/2.txt", "a/1.txt"]),
+        ("file_path", ["a/1.txt", "a/2.txt", "a/sub/3.txt", "b/4.txt", "c.txt"]),
+    ]:
+        file_paths, after, has_more = [], None, True
+        while has_more:
+            files, has_more = index.query(BUCKET_NAME, page_size=2, sort=sort, after=after)
+            file_paths += file_paths_of(files)
+            after = cursor_of(files[-1], sort)
+        assert file_paths == expected, sort
+
+
+def test_delete():
+    index = make_index()
+    index.delete(BUCKET_NAME, ["a/1.txt", "missing.txt"])
+    assert "a/1.txt" not in file_paths_of(index.query(BUCKET_NAME, page_size=100)[0])
+    assert index.count(BUCKET_NAME) == 4
+
+
+def test_rebuild_reconciles_with_the_listing():
+    """Test a rebuild adds new files, updates changed ones and removes those gone from the bucket"""
+    index = make_index()
+    listing = [
+        [{"Key": "a/1.txt", "Size": 7, "LastModified": EPOCH, "ETag": '"new"'}],
+        [{"Key": "new.txt", "Size": 1, "LastModified": EPOCH}],
+    ]
+    assert index.rebuild(BUCKET_NAME, iter(listing)) == 2
+    files, _ = index.query(BUCKET_NAME)
+    assert file_paths_of(files) == ["a/1.txt", "new.txt"]
+    assert (files[0].size_bytes, files[0].etag) == (7, '"new"')
+
+
+def test_rebuild_keeps_changes_made_while_listing():
+    """Test files written or deleted during a rebuild keep their newer state"""
+    index = make_index()
+
+    def listing():
+        # the listing saw "a/1.txt" and "b/4.txt" before they were changed
+        yield [
+            {"Key": "a/1.txt", "Size": 1, "LastModified": EPOCH},
+            {"Key": "b/4.txt", "Size": 1, "LastModified": EPOCH},
+        ]
+        index.upsert(BUCKET_NAME, "a/1.txt", size_bytes=2, last_modified=EPOCH, etag=None)
+        index.upsert(BUCKET_NAME, "written.txt", size_bytes=2, last_modified=EPOCH, etag=None)
+        index.delete(BUCKET_NAME, ["b/4.txt"])
+
+    index.rebuild(BUCKET_NAME, listing())
+    files, _ = index.query(BUCKET_NAME)
+    assert [(file.file_path, file.size_bytes) for file in files] == [("a/1.txt", 2), ("written.txt", 2)]
@@ -0,0 +1,49 @@
+"""Test cases for `page_tokens`."""
+
+from datetime import (
+    datetime,
+    timezone,
+)
+
+import pytest
+
+from files_api.page_tokens import (
+    InvalidPageTokenError,
+    PageToken,
+    decode_page_token,
+    encode_page_token,
+)
+
+SECRET = b"secret"
+
+
+def test_page_token_round_trip():
+    page_token = PageToken(directory="dir/", last_file_path="dir/ünïcode file.txt", page_size=25)
+    token = encode_page_token(page_token, SECRET)
+    assert "/" not in token and "+" not in token
+    assert decode_page_token(token, SECRET) == page_token
+
+
+def test_page_token_of_a_sorted_and_filtered_listing_round_trip():
+    page_token = PageToken(
+        directory="dir/",
+        last_file_path="dir/a.txt",
+        page_size=10,
+        sort="size",
+        last_sort_value=1024,
+        min_size=100,
+        modified_since=datetime(2024, 1, 1, tzinfo=timezone.utc),
+    )
+    assert decode_page_token(encode_page_token(page_token, SECRET), SECRET) == page_token
+
+
+@pytest.mark.parametrize("token", ["", "token", "payload.signature", "é.é"])
+def test_decode_invalid_page_token(token):
+    with pytest.raises(InvalidPageTokenError):
+        decode_page_token(token, SECRET)
+
+
+def test_decode_page_token_signed_with_another_secret():
+    token = encode_page_token(PageToken(directory="", last_file_path="a.txt", page_size=10), b"other secret")
+    with pytest.raises(InvalidPageTokenError):
+        decode_page_token(token, SECRET)
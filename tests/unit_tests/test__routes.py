@@ -1,13 +1,30 @@
+import io
+import json
+import tarfile
+import zipfile
+
+import boto3
+import pytest
+import requests
 from fastapi import status
 from fastapi.testclient import TestClient
 
 from files_api.schemas import GeneratedFileType
 
+from files_api import routes
+from files_api.main import create_app
+from files_api.s3 import delete_objects
 from files_api.s3.read_objects import object_exists_in_s3
-from tests.consts import TEST_BUCKET_NAME
+from files_api.settings import Settings
+from tests.consts import (
+    TEST_BUCKET_NAME,
+    TEST_GENERATION_CACHE_BUCKET_NAME,
+)
+from tests.utils import record_s3_calls
 
 TEST_FILE_PATH = "test.txt"
 
+
 def test_upload_file(client: TestClient):
     prefix = "some_folder/test.txt"
     content = b"test"
@@ -29,6 +46,23 @@ def test_upload_file(client: TestClient):
     assert response.json() == {"file_path": prefix, "message": f"Existing file updated at path: /{prefix}"}
 
 
+def test_upload_large_file_uses_multipart_upload(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        s3_multipart_threshold_bytes=5 * 1024 * 1024,
+        s3_multipart_part_size_bytes=5 * 1024 * 1024,
+    )
+    content = b"x" * (6 * 1024 * 1024)
+    with TestClient(create_app(settings=settings)) as client:
+        calls = record_s3_calls(client.app.state.s3_client)
+        response = client.put("/v1/files/large.bin", files={"file_content": ("large.bin", content)})
+        assert response.status_code == status.HTTP_201_CREATED
+        assert calls.count("UploadPart") == 2
+
+        response = client.get("/v1/files/large.bin")
+        assert response.content == content
+
+
 def test_list_files_with_pagination(client: TestClient):
     for i in range(15):
         client.put(
@@ -42,6 +76,171 @@ def test_list_files_with_pagination(client: TestClient):
     assert "next_page_token" in data
 
 
+def test_list_files_page_size_can_change_between_pages(client: TestClient):
+    for i in range(35):
+        client.put(f"/v1/files/dir/file_{i:02}", files={"file_content": (f"file_{i}", b"test", "text/plain")})
+    client.put("/v1/files/other/file", files={"file_content": ("file", b"test", "text/plain")})
+
+    file_paths = []
+    response = client.get("/v1/files?directory=dir/&page_size=10").json()
+    file_paths += [file["file_path"] for file in response["files"]]
+
+    # the page size carries over from the previous page unless a new one is given
+    response = client.get("/v1/files", params={"page_token": response["next_page_token"]}).json()
+    assert len(response["files"]) == 10
+    file_paths += [file["file_path"] for file in response["files"]]
+
+    response = client.get("/v1/files", params={"page_token": response["next_page_token"], "page_size": 100}).json()
+    assert len(response["files"]) == 15
+    assert response["next_page_token"] is None
+    file_paths += [file["file_path"] for file in response["files"]]
+
+    assert file_paths == [f"dir/file_{i:02}" for i in range(35)]
+
+
+def test_list_files_rejects_tampered_page_tokens(client: TestClient):
+    for i in range(15):
+        client.put(f"/v1/files/file_{i:02}", files={"file_content": (f"file_{i}", b"test", "text/plain")})
+    page_token = client.get("/v1/files").json()["next_page_token"]
+    payload, signature = page_token.split(".")
+    forged_payload = payload[:-2] + ("AA" if payload[-2:] != "AA" else "BB")
+
+    response = client.get("/v1/files", params={"page_token": f"{forged_payload}.{signature}"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_page_tokens_work_on_every_instance_of_the_app(client: TestClient):
+    for i in range(15):
+        client.put(f"/v1/files/file_{i:02}", files={"file_content": (f"file_{i}", b"test", "text/plain")})
+    page_token = client.get("/v1/files").json()["next_page_token"]
+
+    # e.g. another Lambda instance, or the same one after a restart
+    with TestClient(create_app(settings=Settings(s3_bucket_name=TEST_BUCKET_NAME))) as other_client:
+        response = other_client.get("/v1/files", params={"page_token": page_token})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["files"]) == 5
+
+
+def test_app_requires_a_page_token_secret(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delenv("PAGE_TOKEN_SECRET")
+    with pytest.raises(ValueError):
+        create_app(settings=Settings(s3_bucket_name=TEST_BUCKET_NAME))
+
+
+def test_list_files_from_metadata_index(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, metadata_index_path=":memory:")
+    app = create_app(settings=settings)
+    # written before startup, so only found by the initial rebuild
+    app.state.s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="dir/existing", Body=b"x" * 50)
+    with TestClient(app) as client:
+        for i in range(15):
+            client.put(f"/v1/files/dir/file_{i:02}", files={"file_content": ("file", b"x" * i, "text/plain")})
+        client.put("/v1/files/other/file", files={"file_content": ("file", b"x" * 100, "text/plain")})
+        client.delete("/v1/files/dir/file_00")
+        calls = record_s3_calls(client.app.state.s3_client)
+
+        response = client.get("/v1/files", params={"directory": "dir/", "min_size": 5, "sort": "size"}).json()
+        file_paths = [file["file_path"] for file in response["files"]]
+        response = client.get("/v1/files", params={"page_token": response["next_page_token"]}).json()
+        file_paths += [file["file_path"] for file in response["files"]]
+        assert response["next_page_token"] is None
+        assert file_paths == [f"dir/file_{i:02}" for i in range(5, 15)] + ["dir/existing"]
+        assert calls == []
+
+        response = client.get("/v1/files", params={"page_size": 100}).json()
+        assert [file["file_path"] for file in response["files"]][:2] == ["dir/existing", "dir/file_01"]
+        assert len(response["files"]) == 16
+
+
+def test_list_files_filters_require_metadata_index(client: TestClient):
+    response = client.get("/v1/files", params={"sort": "size"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert client.get("/v1/files", params={"sort": "file_path"}).status_code == status.HTTP_200_OK
+
+
+def test_get_directory_stats(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, directory_stats_enabled=True)
+    with TestClient(create_app(settings=settings)) as client:
+        for file_path, size in [("dir/a", 10), ("dir/sub/b", 2000), ("other/c", 5)]:
+            client.put(f"/v1/files/{file_path}", files={"file_content": ("file", b"x" * size, "text/plain")})
+
+        response = client.get("/v1/directories/dir/stats")
+        assert response.status_code == status.HTTP_200_OK
+        stats = response.json()
+        assert (stats["directory"], stats["file_count"], stats["total_bytes"]) == ("dir/", 2, 2010)
+        assert stats["largest_files"] == [
+            {"file_path": "dir/sub/b", "size_bytes": 2000},
+            {"file_path": "dir/a", "size_bytes": 10},
+        ]
+        assert [bucket["file_count"] for bucket in stats["size_histogram"]][:2] == [1, 1]
+
+        # uploads and deletes update the cached statistics without listing the directory again
+        calls = record_s3_calls(client.app.state.s3_client)
+        client.put("/v1/files/dir/a", files={"file_content": ("file", b"x" * 20, "text/plain")})
+        client.put("/v1/files/dir/new", files={"file_content": ("file", b"x" * 30, "text/plain")})
+        client.delete("/v1/files/dir/sub/b")
+        stats = client.get("/v1/directories/dir/stats").json()
+        assert (stats["file_count"], stats["total_bytes"]) == (2, 50)
+        assert "ListObjectsV2" not in calls
+
+
+def test_uploads_look_up_the_previous_size_only_in_cached_directories(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, directory_stats_enabled=True)
+    with TestClient(create_app(settings=settings)) as client:
+        client.get("/v1/directories/dir/stats")
+        calls = record_s3_calls(client.app.state.s3_client)
+        client.put("/v1/files/other/a", files={"file_content": ("file", b"test", "text/plain")})
+        assert calls == ["HeadObject", "PutObject"]
+
+        # the new size is taken from the upload rather than looked up after it
+        calls.clear()
+        client.put("/v1/files/dir/a", files={"file_content": ("file", b"test", "text/plain")})
+        assert calls == ["HeadObject", "HeadObject", "PutObject"]
+        assert client.get("/v1/directories/dir/stats").json()["total_bytes"] == 4
+
+
+def test_stream_files(client: TestClient):
+    for file_path in ("dir/file_1", "dir/file_2", "dir/sub/file_3", "dir/sub/deeper/file_4", "other/file_5"):
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, b"test", "text/plain")})
+
+    response = client.get("/v1/files:stream?directory=dir/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    file_paths = [line["file_path"] for line in lines]
+    assert file_paths == ["dir/file_1", "dir/file_2", "dir/sub/deeper/file_4", "dir/sub/file_3"]
+    assert lines[0]["size_bytes"] == 4
+
+    response = client.get("/v1/files:stream?directory=dir/&delimiter=/")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"directory": "dir/sub/"}
+    assert [line["file_path"] for line in lines[1:]] == ["dir/file_1", "dir/file_2"]
+
+
+def test_stream_files_walks_every_page(client: TestClient):
+    s3_client = client.app.state.s3_client
+    for i in range(2500):
+        s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key=f"many/file_{i:04}", Body=b"")
+    calls = record_s3_calls(s3_client)
+
+    response = client.get("/v1/files:stream?directory=many/")
+    file_paths = [json.loads(line)["file_path"] for line in response.text.splitlines()]
+    assert file_paths == [f"many/file_{i:04}" for i in range(2500)]
+    assert calls == ["ListObjectsV2"] * 3
+
+
+def test_stream_files_in_parallel(client: TestClient):
+    file_paths = [f"dir/sub_{i}/file_{j}" for i in range(5) for j in range(3)] + ["dir/top_level_file"]
+    for file_path in file_paths:
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, b"test", "text/plain")})
+
+    response = client.get("/v1/files:stream?directory=dir/&parallel=true")
+    assert [json.loads(line)["file_path"] for line in response.text.splitlines()] == sorted(file_paths)
+
+    response = client.get("/v1/files:stream?directory=dir/&parallel=true&delimiter=/")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_get_file_metadata(client: TestClient):
     client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
     assert object_exists_in_s3(TEST_BUCKET_NAME, "file_1")
@@ -51,6 +250,7 @@ def test_get_file_metadata(client: TestClient):
     assert headers["Content-Type"] == "text/plain"
     assert headers["Content-Length"] == str(len(b"test"))
     assert "Last-Modified" in headers
+    assert headers["Accept-Ranges"] == "bytes"
 
 
 def test_get_file(client: TestClient):
@@ -60,6 +260,109 @@ def test_get_file(client: TestClient):
     assert response.content == b"test"
 
 
+def test_get_file_is_streamed_in_chunks(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, s3_download_chunk_size_bytes=1024)
+    with TestClient(create_app(settings=settings)) as client:
+        content = bytes(range(256)) * 20
+        client.put("/v1/files/file.bin", files={"file_content": ("file.bin", content, "application/octet-stream")})
+        response = client.get("/v1/files/file.bin")
+        assert response.content == content
+        assert response.headers["Content-Length"] == str(len(content))
+
+        response = client.get("/v1/files/file.bin", headers={"Range": "bytes=0-9, 2000-"})
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert content[:10] in response.content
+        assert content[2000:] in response.content
+
+
+def test_get_file_byte_range(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"0123456789", "text/plain")})
+
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=2-4"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == b"234"
+    assert response.headers["Content-Range"] == "bytes 2-4/10"
+    assert response.headers["Content-Length"] == "3"
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=-3"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == b"789"
+
+    # a Range header that cannot be parsed is ignored
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=4-2"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"0123456789"
+
+
+def test_get_file_multiple_byte_ranges(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"0123456789", "text/plain")})
+
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=0-1, 100-200, 8-"})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    content_type = response.headers["Content-Type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1]
+    expected = (
+        f"--{boundary}\r\nContent-Type: text/plain\r\nContent-Range: bytes 0-1/10\r\n\r\n01\r\n"
+        f"--{boundary}\r\nContent-Type: text/plain\r\nContent-Range: bytes 8-9/10\r\n\r\n89\r\n"
+        f"--{boundary}--\r\n"
+    ).encode()
+    assert response.content == expected
+
+
+def test_get_file_if_range(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"0123456789", "text/plain")})
+    etag = client.app.state.s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="file_1")["ETag"]
+
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=0-1", "If-Range": etag})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert response.content == b"01"
+
+    # the file changed since the client's copy: send the whole file
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=0-1", "If-Range": '"stale-etag"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"0123456789"
+
+
+def test_get_file_if_range_date_must_match_last_modified_exactly(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"0123456789", "text/plain")})
+    last_modified = client.get("/v1/files/file_1").headers["Last-Modified"]
+
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=0-1, 8-9", "If-Range": last_modified})
+    assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+
+    # a later date does not match, even though the file was not modified since
+    later = "Fri, 01 Jan 2100 00:00:00 GMT"
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=0-1", "If-Range": later})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"0123456789"
+
+
+def test_get_file_conditional_requests(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+    response = client.get("/v1/files/file_1")
+    etag, last_modified = response.headers["ETag"], response.headers["Last-Modified"]
+    assert client.head("/v1/files/file_1").headers["ETag"] == etag
+
+    for method in (client.get, client.head):
+        response = method("/v1/files/file_1", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+        response = method("/v1/files/file_1", headers={"If-Modified-Since": last_modified})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    # the client's copy is stale: send the file
+    response = client.get("/v1/files/file_1", headers={"If-None-Match": '"stale-etag"'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"test"
+
+    response = client.get("/v1/files/file_1", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+    assert response.status_code == status.HTTP_200_OK
+
+
 def test_delete_file(client: TestClient):
     client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
     response = client.delete("/v1/files/file_1")
@@ -68,6 +371,355 @@ def test_delete_file(client: TestClient):
     response = client.get("/v1/files/file_1")
     assert response.status_code == 404
 
+
+def test_read_routes_make_a_single_s3_call(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+    calls = record_s3_calls(client.app.state.s3_client)
+
+    client.get("/v1/files/file_1")
+    assert calls == ["GetObject"]
+
+    calls.clear()
+    client.head("/v1/files/file_1")
+    assert calls == ["HeadObject"]
+
+    calls.clear()
+    client.get("/v1/files/nonexistent_file.txt")
+    assert calls == ["GetObject"]
+
+
+def test_metadata_cache_serves_head_requests(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, metadata_cache_enabled=True)
+    with TestClient(create_app(settings=settings)) as client:
+        client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+        calls = record_s3_calls(client.app.state.s3_client)
+
+        client.head("/v1/files/file_1")
+        response = client.head("/v1/files/file_1")
+        assert calls == ["HeadObject"]
+        assert response.headers["Content-Length"] == "4"
+        assert response.headers["Content-Type"] == "text/plain"
+
+        # overwriting the file invalidates its cached metadata
+        client.put("/v1/files/file_1", files={"file_content": ("file_1", b"new content", "text/plain")})
+        calls.clear()
+        assert client.head("/v1/files/file_1").headers["Content-Length"] == str(len(b"new content"))
+        assert calls == ["HeadObject"]
+
+        client.delete("/v1/files/file_1")
+        assert client.head("/v1/files/file_1").status_code == status.HTTP_404_NOT_FOUND
+
+        stats = client.app.state.s3_backend.metadata_cache.stats()
+        assert stats["hits"] >= 2
+        assert stats["misses"] >= 2
+
+
+def test_negative_cache_answers_repeated_lookups_of_missing_files(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, negative_cache_enabled=True)
+    with TestClient(create_app(settings=settings)) as client:
+        calls = record_s3_calls(client.app.state.s3_client)
+        for _ in range(3):
+            assert client.get("/v1/files/missing.txt").status_code == status.HTTP_404_NOT_FOUND
+            assert client.head("/v1/files/missing.txt").status_code == status.HTTP_404_NOT_FOUND
+        assert calls == ["GetObject"]
+
+        # a new file is never answered with a stale 404
+        client.put("/v1/files/missing.txt", files={"file_content": ("missing.txt", b"test", "text/plain")})
+        assert client.get("/v1/files/missing.txt").content == b"test"
+
+
+def test_negative_cache_bloom_filter(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, negative_cache_enabled=True, negative_cache_bloom_prefix="")
+    app = create_app(settings=settings)
+    app.state.s3_client.put_object(Bucket=TEST_BUCKET_NAME, Key="stored.txt", Body=b"test")
+    with TestClient(app) as client:
+        calls = record_s3_calls(client.app.state.s3_client)
+        assert client.get("/v1/files/never-stored.txt").status_code == status.HTTP_404_NOT_FOUND
+        assert calls == []
+        assert client.get("/v1/files/stored.txt").content == b"test"
+
+        client.put("/v1/files/new.txt", files={"file_content": ("new.txt", b"new", "text/plain")})
+        assert client.get("/v1/files/new.txt").content == b"new"
+
+
+def test_delete_file_s3_calls(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+    client.put("/v1/files/file_2", files={"file_content": ("file_2", b"test", "text/plain")})
+    etag = client.app.state.s3_client.head_object(Bucket=TEST_BUCKET_NAME, Key="file_2")["ETag"]
+    calls = record_s3_calls(client.app.state.s3_client)
+
+    # an unconditional delete looks the file up first so that it can return a 404
+    response = client.delete("/v1/files/file_1")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert calls == ["HeadObject", "DeleteObject"]
+
+    # a conditional delete is a single call
+    calls.clear()
+    response = client.delete("/v1/files/file_2", headers={"If-Match": etag})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert calls == ["DeleteObject"]
+    assert not object_exists_in_s3(TEST_BUCKET_NAME, "file_2")
+
+
+def test_delete_file_without_existence_check(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, delete_checks_existence=False)
+    with TestClient(create_app(settings=settings)) as client:
+        client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+        calls = record_s3_calls(client.app.state.s3_client)
+
+        response = client.delete("/v1/files/file_1")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        assert calls == ["DeleteObject"]
+
+        response = client.delete("/v1/files/file_1")
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+
+
+def test_batch_delete_files(client: TestClient):
+    for file_path in ("dir/file_1", "dir/file_2", "dir/sub/file_3", "other/file_4"):
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, b"test", "text/plain")})
+
+    response = client.post("/v1/files:batchDelete", json={"file_paths": ["dir/file_1", "dir/file_1", "missing"]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"deleted": ["dir/file_1", "missing"], "errors": []}
+
+    calls = record_s3_calls(client.app.state.s3_client)
+    response = client.post("/v1/files:batchDelete", json={"directory": "dir/"})
+    assert response.json() == {"deleted": ["dir/file_2", "dir/sub/file_3"], "errors": []}
+    assert calls == ["ListObjectsV2", "DeleteObjects"]
+
+    remaining = client.get("/v1/files?page_size=100").json()["files"]
+    assert [file["file_path"] for file in remaining] == ["other/file_4"]
+
+
+def test_batch_delete_files_runs_one_s3_call_per_1000_files(client: TestClient):
+    file_paths = [f"file_{i}" for i in range(2001)]
+    calls = record_s3_calls(client.app.state.s3_client)
+    response = client.post("/v1/files:batchDelete", json={"file_paths": file_paths})
+    assert len(response.json()["deleted"]) == 2001
+    assert calls == ["DeleteObjects"] * 3
+
+
+def test_batch_delete_files_rejects_a_directory_with_too_many_files(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(routes, "MAX_BATCH_DELETE_FILE_PATHS", 2)
+    for file_path in ("dir/file_1", "dir/file_2", "dir/file_3"):
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, b"test", "text/plain")})
+
+    calls = record_s3_calls(client.app.state.s3_client)
+    response = client.post("/v1/files:batchDelete", json={"directory": "dir/"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "DeleteObjects" not in calls
+
+    response = client.post("/v1/files:batchDelete", json={"directory": "dir/file_1"})
+    assert response.json() == {"deleted": ["dir/file_1"], "errors": []}
+
+
+def test_copy_and_move_file(client: TestClient):
+    client.put("/v1/files/src.txt", files={"file_content": ("src.txt", b"content", "text/plain")})
+    calls = record_s3_calls(client.app.state.s3_client)
+
+    response = client.post("/v1/files/src.txt:copy", json={"destination_path": "dir/copy.txt"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["destination_path"] == "dir/copy.txt"
+    assert "GetObject" not in calls and "PutObject" not in calls
+
+    response = client.post("/v1/files/dir/copy.txt:move", json={"destination_path": "moved.txt"})
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get("/v1/files/moved.txt").content == b"content"
+    assert client.head("/v1/files/moved.txt").headers["Content-Type"] == "text/plain"
+    assert client.head("/v1/files/dir/copy.txt").status_code == status.HTTP_404_NOT_FOUND
+    assert client.head("/v1/files/src.txt").status_code == status.HTTP_200_OK
+
+    response = client.post("/v1/files/missing.txt:move", json={"destination_path": "other.txt"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.post("/v1/files/missing.txt:copy", json={"destination_path": "other.txt"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_move_directory(client: TestClient):
+    for file_path in ("dir/a", "dir/sub/b", "dir_other/c"):
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, file_path.encode(), "text/plain")})
+
+    response = client.post("/v1/directories/dir:move", json={"destination_directory": "new/"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"moved": ["dir/a", "dir/sub/b"], "errors": []}
+    remaining = client.get("/v1/files?page_size=100").json()["files"]
+    assert [file["file_path"] for file in remaining] == ["dir_other/c", "new/a", "new/sub/b"]
+    assert client.get("/v1/files/new/sub/b").content == b"dir/sub/b"
+
+    response = client.post("/v1/directories/new:move", json={"destination_directory": "new/sub/"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_move_directory_keeps_files_changed_during_the_move(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    for file_path in ("dir/a", "dir/b"):
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, b"old", "text/plain")})
+    delete_s3_objects = delete_objects.delete_s3_objects
+
+    def overwrite_then_delete(bucket_name, object_keys, etags=None, s3_client=None):
+        s3_client.put_object(Bucket=bucket_name, Key="dir/a", Body=b"new")
+        # moto ignores the ETags of `delete_objects`, so check them the way S3 does
+        changed = [
+            key for key in object_keys if s3_client.head_object(Bucket=bucket_name, Key=key)["ETag"] != etags[key]
+        ]
+        unchanged = [key for key in object_keys if key not in changed]
+        errors = delete_s3_objects(bucket_name, unchanged, s3_client=s3_client)
+        return errors + [{"Key": key, "Code": "PreconditionFailed", "Message": "ETag changed"} for key in changed]
+
+    monkeypatch.setattr(delete_objects, "delete_s3_objects", overwrite_then_delete)
+    response = client.post("/v1/directories/dir:move", json={"destination_directory": "new/"})
+    assert response.json()["moved"] == ["dir/b"]
+    errors = response.json()["errors"]
+    assert [(error["file_path"], error["code"]) for error in errors] == [("dir/a", "PreconditionFailed")]
+    assert client.get("/v1/files/dir/a").content == b"new"
+    assert client.get("/v1/files/new/a").content == b"old"
+
+
+def test_presign_file(client: TestClient):
+    response = client.post("/v1/files/doc.txt:presign", json={"method": "PUT", "content_type": "text/plain"})
+    assert response.status_code == status.HTTP_200_OK
+    url = response.json()["urls"][0]["url"]
+    requests.put(url, data=b"presigned", headers={"Content-Type": "text/plain"}, timeout=10)
+
+    response = client.post("/v1/files/doc.txt:presign", json={"method": "GET", "expires_in_seconds": 60})
+    assert response.json()["http_method"] == "GET"
+    assert requests.get(response.json()["urls"][0]["url"], timeout=10).content == b"presigned"
+
+    response = client.post("/v1/files/big.bin:presign", json={"method": "UPLOAD_PART", "part_numbers": [1, 2]})
+    body = response.json()
+    assert [url["part_number"] for url in body["urls"]] == [1, 2]
+    assert body["upload_id"] and body["complete_url"] and body["abort_url"]
+    response = client.post(
+        "/v1/files/big.bin:presign",
+        json={"method": "UPLOAD_PART", "part_numbers": [3], "upload_id": body["upload_id"]},
+    )
+    assert response.json()["upload_id"] == body["upload_id"]
+
+
+def test_presign_file_validation(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, presigned_url_max_expiry_seconds=60)
+    with TestClient(create_app(settings=settings)) as client:
+        for body in (
+            {"method": "GET", "expires_in_seconds": 61},
+            {"method": "UPLOAD_PART"},
+            {"method": "PUT", "part_numbers": [1]},
+            {"method": "UPLOAD_PART", "part_numbers": [0]},
+        ):
+            response = client.post("/v1/files/doc.txt:presign", json=body)
+            assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, body
+
+
+def test_get_large_file_redirects_to_presigned_url(mocked_aws):  # pylint: disable=unused-argument
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, presigned_redirect_threshold_bytes=10)
+    with TestClient(create_app(settings=settings)) as client:
+        client.put("/v1/files/small", files={"file_content": ("small", b"small", "text/plain")})
+        client.put("/v1/files/large", files={"file_content": ("large", b"x" * 10, "text/plain")})
+
+        assert client.get("/v1/files/small", follow_redirects=False).content == b"small"
+        response = client.get("/v1/files/large", follow_redirects=False)
+        assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
+        assert requests.get(response.headers["Location"], timeout=10).content == b"x" * 10
+        assert client.get("/v1/files/missing", follow_redirects=False).status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_download_archive(client: TestClient):
+    files = {"dir/a.txt": b"a", "dir/sub/b.txt": b"b" * 10_000, "dir_other/c.txt": b"c"}
+    for file_path, content in files.items():
+        client.put(f"/v1/files/{file_path}", files={"file_content": (file_path, content, "text/plain")})
+
+    response = client.get("/v1/archives/dir.zip")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/zip"
+    assert response.headers["Content-Disposition"] == "attachment; filename*=UTF-8''dir.zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert {name: archive.read(name) for name in archive.namelist()} == {"a.txt": b"a", "sub/b.txt": b"b" * 10_000}
+
+    response = client.get("/v1/archives/dir/sub.tar.gz")
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as archive:
+        assert archive.getnames() == ["b.txt"]
+
+    assert client.get("/v1/archives/missing.zip").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get("/v1/archives/dir.rar").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_batch_upload_files(client: TestClient):
+    files = [
+        ("files", ("dir/a.txt", b"a", "text/plain")),
+        ("files", ("dir/b.bin", b"b", "application/octet-stream")),
+        ("files", ("dir/a.txt", b"again", "text/plain")),
+        ("files", ("/invalid", b"c", "text/plain")),
+    ]
+    response = client.post("/v1/files:batchUpload", files=files)
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["uploaded"] == ["dir/a.txt", "dir/b.bin"]
+    assert [(error["file_path"], error["code"]) for error in body["errors"]] == [
+        ("dir/a.txt", "DuplicateFilePath"),
+        ("/invalid", "InvalidFilePath"),
+    ]
+    assert client.get("/v1/files/dir/a.txt").content == b"a"
+    assert client.head("/v1/files/dir/b.bin").headers["Content-Type"] == "application/octet-stream"
+
+
+def test_resumable_upload(client: TestClient):
+    response = client.post("/v1/uploads", json={"file_path": "large.bin", "content_type": "text/plain"})
+    assert response.status_code == status.HTTP_201_CREATED
+    upload_id = response.json()["upload_id"]
+
+    first_part = b"a" * (5 * 1024 * 1024)
+    response = client.put(f"/v1/uploads/{upload_id}/parts/2", content=b"end")
+    assert response.json()["size_bytes"] == 3
+    client.put(f"/v1/uploads/{upload_id}/parts/1", content=b"lost")
+    client.put(f"/v1/uploads/{upload_id}/parts/1", content=first_part)
+    parts = client.get(f"/v1/uploads/{upload_id}").json()["parts"]
+    assert [(part["part_number"], part["size_bytes"]) for part in parts] == [(1, len(first_part)), (2, 3)]
+
+    expected_parts = [{"part_number": part["part_number"], "etag": part["etag"]} for part in parts]
+    response = client.post(f"/v1/uploads/{upload_id}:complete", json={"parts": expected_parts})
+    assert response.status_code == status.HTTP_200_OK
+    assert client.get("/v1/files/large.bin").content == first_part + b"end"
+    assert client.head("/v1/files/large.bin").headers["Content-Type"] == "text/plain"
+    assert client.get(f"/v1/uploads/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_resumable_upload_errors(client: TestClient):
+    upload_id = client.post("/v1/uploads", json={"file_path": "file.bin"}).json()["upload_id"]
+    response = client.post(f"/v1/uploads/{upload_id}:complete", json={"parts": []})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    etag = client.put(f"/v1/uploads/{upload_id}/parts/1", content=b"x").json()["etag"]
+    for parts in (
+        [{"part_number": 1, "etag": etag}, {"part_number": 2, "etag": etag}],
+        [{"part_number": 1, "etag": '"stale-etag"'}],
+        [{"part_number": 1, "etag": etag}, {"part_number": 1, "etag": etag}],
+    ):
+        response = client.post(f"/v1/uploads/{upload_id}:complete", json={"parts": parts})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY, parts
+    client.put(f"/v1/uploads/{upload_id}/parts/2", content=b"y")
+    response = client.post(f"/v1/uploads/{upload_id}:complete", json={"parts": [{"part_number": 1, "etag": etag}]})
+    assert response.json()["detail"] == "Part 2 has been uploaded, but is not in the request."
+    response = client.put(f"/v1/uploads/{upload_id}/parts/0", content=b"x")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    assert client.delete(f"/v1/uploads/{upload_id}").status_code == status.HTTP_204_NO_CONTENT
+    assert client.get(f"/v1/uploads/{upload_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"/v1/uploads/{upload_id[1:]}").status_code == status.HTTP_404_NOT_FOUND
+    response = client.post("/v1/uploads", json={"file_path": "/absolute"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_openai_client_lives_as_long_as_the_app(mocked_aws, mocked_openai):  # pylint: disable=unused-argument
+    app = create_app(settings=Settings(s3_bucket_name=TEST_BUCKET_NAME))
+    with TestClient(app) as client:
+        openai_client = app.state.openai_client
+        for _ in range(2):
+            response = client.post(f"/v1/files/generated/chat/completion/{TEST_FILE_PATH}", params={"prompt": "p"})
+            assert response.status_code == status.HTTP_201_CREATED
+        assert not openai_client.is_closed()
+    assert openai_client.is_closed()
+
+
 def test_generate_chat_text(client: TestClient):
     """Test generating text using POST method."""
     # response = client.post(
@@ -93,6 +745,7 @@ def test_generate_chat_text(client: TestClient):
     assert response.content == b"This is a mock response from the chat completion endpoint."
     assert "text/plain" in response.headers["Content-Type"]
 
+
 def test_imag_generation(client: TestClient):
     """Test generating image using POST method."""
     IMAGE_FILE_PATH = "some/nested/path/image.png"  # pylint: disable=invalid-name
@@ -111,4 +764,64 @@ def test_imag_generation(client: TestClient):
     response = client.get(f"/v1/files/{IMAGE_FILE_PATH}")
     assert response.status_code == status.HTTP_200_OK
     assert response.content is not None
-    assert response.headers["Content-Type"] == "image/png"
\ No newline at end of file
+    assert response.headers["Content-Type"] == "image/png"
+
+
+def test_image_generation_fails_when_the_image_is_too_large(
+    mocked_aws, mocked_openai  # pylint: disable=unused-argument
+):
+    settings = Settings(s3_bucket_name=TEST_BUCKET_NAME, generated_image_max_size_bytes=100)
+    with TestClient(create_app(settings=settings)) as client:
+        response = client.post("/v1/files/generated/image/generation/image.png", params={"prompt": "Test Prompt"})
+        assert response.status_code == status.HTTP_502_BAD_GATEWAY
+        assert client.get("/v1/files/image.png").status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_generation_cache_answers_identical_prompts(mocked_aws, mocked_openai):  # pylint: disable=unused-argument
+    boto3.client("s3").create_bucket(Bucket=TEST_GENERATION_CACHE_BUCKET_NAME)
+    settings = Settings(
+        s3_bucket_name=TEST_BUCKET_NAME,
+        generation_cache_enabled=True,
+        generation_cache_bucket_name=TEST_GENERATION_CACHE_BUCKET_NAME,
+    )
+    app = create_app(settings=settings)
+    with TestClient(app) as client:
+        for file_path in ["first.txt", "second.txt"]:
+            response = client.post(f"/v1/files/generated/chat/completion/{file_path}", params={"prompt": "prompt"})
+            assert response.status_code == status.HTTP_201_CREATED
+        client.post("/v1/files/generated/chat/completion/third.txt", params={"prompt": "other prompt"})
+
+        assert app.state.generation_cache.stats() == {"hits": 1, "misses": 2}
+        assert client.get("/v1/files/second.txt").content == client.get("/v1/files/first.txt").content
+        # the cached generations are not files of the API
+        listed_files = client.get("/v1/files?page_size=100").json()["files"]
+        assert [file["file_path"] for file in listed_files] == ["first.txt", "second.txt", "third.txt"]
+
+        # a streamed generation is answered from the cache too, as a single delta
+        response = client.post(
+            "/v1/files/generated/chat/completion/fourth.txt", params={"prompt": "prompt", "stream": True}
+        )
+        first_event = response.text.split("\n\n")[0]
+        assert json.loads(first_event.removeprefix("data: "))["delta"] == client.get("/v1/files/first.txt").text
+        assert app.state.generation_cache.stats() == {"hits": 2, "misses": 2}
+
+
+def test_generate_chat_text_streamed(client: TestClient):
+    response = client.post(
+        "/v1/files/generated/chat/completion/streamed.txt",
+        params={"prompt": "Test Prompt", "stream": True, "max_tokens": 1000},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.headers["Content-Type"].startswith("text/event-stream")
+
+    events = [event.split("\n") for event in response.text.strip().split("\n\n")]
+    deltas = [json.loads(lines[0].removeprefix("data: "))["delta"] for lines in events[:-1]]
+    assert len(deltas) > 1
+    assert events[-1][0] == "event: done"
+    assert json.loads(events[-1][1].removeprefix("data: "))["file_path"] == "streamed.txt"
+    assert client.get("/v1/files/streamed.txt").text == "".join(deltas)
+
+    response = client.post(
+        "/v1/files/generated/chat/completion/streamed.txt", params={"prompt": "Test Prompt", "max_tokens": 100_000}
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
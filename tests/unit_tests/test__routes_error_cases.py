@@ -12,6 +12,16 @@ def test_get_non_existent_file_s3(client: TestClient):
     assert response.json() == {"detail": "File not found."}
 
 
+def test_get_file_unsatisfiable_byte_range(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"0123456789", "text/plain")})
+    response = client.get("/v1/files/file_1", headers={"Range": "bytes=20-30"})
+    assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert response.headers["Content-Range"] == "bytes */10"
+
+    response = client.get("/v1/files/nonexistentfile.txt", headers={"Range": "bytes=0-1"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 def test_head_nonexistent_file(client: TestClient):
     response = client.head("/v1/files/nonexistent_file.txt")
     assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -23,6 +33,16 @@ def test_delete_nonexistent_file(client: TestClient):
     assert response.json() == {"detail": "File not found."}
 
 
+def test_delete_file_with_stale_etag(client: TestClient):
+    client.put("/v1/files/file_1", files={"file_content": ("file_1", b"test", "text/plain")})
+    response = client.delete("/v1/files/file_1", headers={"If-Match": '"stale-etag"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    response = client.delete("/v1/files/nonexistent_file.txt", headers={"If-Match": '"some-etag"'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json() == {"detail": "File not found."}
+
+
 def test_get_files_invalid_page_size(client: TestClient):
     response = client.get("/v1/files?page_size=-1")
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -45,11 +65,7 @@ def test_get_files_invalid_file_path(client: TestClient):
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
-def test_get_file_pages_token_is_mutually_exclusive_with_page_size_and_directory(client: TestClient):
-    response = client.get("/v1/files?page_token=token&page_size=10")
-    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
-    assert "mutually exclusive" in str(response.json())
-
+def test_get_file_pages_token_is_mutually_exclusive_with_directory(client: TestClient):
     response = client.get("/v1/files?page_token=token&directory=dir")
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
     assert "mutually exclusive" in str(response.json())
@@ -59,6 +75,26 @@ def test_get_file_pages_token_is_mutually_exclusive_with_page_size_and_directory
     assert "mutually exclusive" in str(response.json())
 
 
+def test_get_files_invalid_page_token(client: TestClient):
+    response = client.get("/v1/files?page_token=token&page_size=10")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "Invalid page_token" in str(response.json())
+
+
+def test_batch_delete_files_invalid_request(client: TestClient):
+    response = client.post("/v1/files:batchDelete", json={})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.post("/v1/files:batchDelete", json={"file_paths": ["a.txt"], "directory": "dir/"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.post("/v1/files:batchDelete", json={"directory": ""})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    response = client.post("/v1/files:batchDelete", json={"file_paths": ["/absolute.txt"]})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_unforeseen_500_errors(client: TestClient):
     delete_s3_bucket(TEST_BUCKET_NAME)
 
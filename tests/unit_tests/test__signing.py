@@ -0,0 +1,32 @@
+"""Test cases for `signing`."""
+
+import pytest
+
+from files_api.signing import (
+    InvalidSignatureError,
+    decode_signed,
+    derive_key,
+    encode_signed,
+)
+
+SECRET = b"secret"
+
+
+def test_signed_value_round_trip():
+    key = derive_key(SECRET, "test")
+    value = encode_signed({"a": "ünïcode", "n": 1}, key)
+    assert "/" not in value and "+" not in value
+    assert decode_signed(value, key) == {"a": "ünïcode", "n": 1}
+
+
+@pytest.mark.parametrize("value", ["", "payload", "payload.signature", "é.é"])
+def test_decode_invalid_signed_value(value: str):
+    with pytest.raises(InvalidSignatureError):
+        decode_signed(value, derive_key(SECRET, "test"))
+
+
+def test_keys_of_different_purposes_do_not_verify_each_others_values():
+    value = encode_signed({"a": 1}, derive_key(SECRET, "one"))
+    assert derive_key(SECRET, "one") == derive_key(SECRET, "one")
+    with pytest.raises(InvalidSignatureError):
+        decode_signed(value, derive_key(SECRET, "two"))
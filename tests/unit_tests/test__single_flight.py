@@ -0,0 +1,108 @@
+"""Test cases for `single_flight`."""
+
+import anyio
+import pytest
+
+from files_api.single_flight import SingleFlight
+
+
+def test_concurrent_calls_of_a_key_share_one_call():
+    single_flight = SingleFlight()
+    results = []
+
+    async def slow_call(value: str) -> str:
+        await anyio.sleep(0.05)
+        return value
+
+    async def call(key: str) -> None:
+        results.append(await single_flight.do(key, lambda: slow_call(key)))
+
+    async def main():
+        async with anyio.create_task_group() as task_group:
+            for key in ["a", "a", "a", "b"]:
+                task_group.start_soon(call, key)
+        # the key is free again once the call is done
+        await call("a")
+
+    anyio.run(main)
+    assert sorted(results) == ["a", "a", "a", "a", "b"]
+    assert (single_flight.n_calls, single_flight.n_coalesced) == (3, 2)
+
+
+def test_waiting_callers_get_the_error_of_the_call():
+    single_flight = SingleFlight()
+    errors = []
+
+    async def failing_call():
+        await anyio.sleep(0.05)
+        raise ValueError("failed")
+
+    async def call() -> None:
+        with pytest.raises(ValueError) as exc_info:
+            await single_flight.do("key", failing_call)
+        errors.append(exc_info.value)
+
+    async def main():
+        async with anyio.create_task_group() as task_group:
+            for _ in range(3):
+                task_group.start_soon(call)
+
+    anyio.run(main)
+    assert len(errors) == 3 and single_flight.n_calls == 1
+
+
+def test_waiting_callers_make_a_new_call_when_the_caller_of_the_call_is_cancelled():
+    single_flight = SingleFlight()
+    results = []
+
+    async def slow_call() -> str:
+        await anyio.sleep(0.05)
+        return "result"
+
+    async def main():
+        leader_scope = anyio.CancelScope()
+
+        async def leader() -> None:
+            with leader_scope:
+                await single_flight.do("key", slow_call)
+
+        async def follower() -> None:
+            results.append(await single_flight.do("key", slow_call))
+
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(leader)
+            await anyio.sleep(0.01)
+            task_group.start_soon(follower)
+            await anyio.sleep(0.01)
+            leader_scope.cancel()
+
+    anyio.run(main)
+    assert results == ["result"]
+    assert (single_flight.n_calls, single_flight.n_coalesced) == (2, 0)
+
+
+def test_callers_after_forget_make_a_new_call():
+    single_flight = SingleFlight()
+    versions = iter(["old", "new"])
+    results = {}
+
+    async def slow_read() -> str:
+        version = next(versions)
+        await anyio.sleep(0.05)
+        return version
+
+    async def read(name: str) -> None:
+        results[name] = await single_flight.do(("read", "key"), slow_read)
+
+    async def main():
+        async with anyio.create_task_group() as task_group:
+            task_group.start_soon(read, "before")
+            await anyio.sleep(0.01)
+            task_group.start_soon(read, "waiting")
+            await anyio.sleep(0.01)
+            # e.g. the object was written meanwhile
+            single_flight.forget(lambda key: key[1] == "key")
+            task_group.start_soon(read, "after")
+
+    anyio.run(main)
+    assert results == {"before": "old", "waiting": "old", "after": "new"}
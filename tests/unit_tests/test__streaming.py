@@ -0,0 +1,45 @@
+"""Test cases for `streaming`."""
+
+import anyio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from files_api.streaming import ProducerStreamingResponse
+
+
+def test_producer_streams_the_content_and_is_cancelled_once_it_is_sent():
+    cancelled = []
+
+    async def produce(send_stream):
+        async with send_stream:
+            try:
+                for chunk in ("a", "b", "c"):
+                    await send_stream.send(chunk)
+                await anyio.sleep_forever()
+            except anyio.get_cancelled_exc_class():
+                cancelled.append(True)
+                raise
+
+    async def first_two(receive_stream):
+        async for chunk in receive_stream:
+            yield chunk
+            if chunk == "b":
+                return
+
+    app = FastAPI()
+    app.get("/first-two")(lambda: ProducerStreamingResponse(produce=produce, consume=first_two))
+    with TestClient(app) as client:
+        assert client.get("/first-two").text == "ab"
+        assert cancelled == [True]
+
+
+def test_content_ends_when_the_producer_closes_its_stream():
+    async def produce(send_stream):
+        async with send_stream:
+            for chunk in ("a", "b", "c"):
+                await send_stream.send(chunk)
+
+    app = FastAPI()
+    app.get("/")(lambda: ProducerStreamingResponse(produce=produce, max_buffer_size=3))
+    with TestClient(app) as client:
+        assert client.get("/").text == "abc"
@@ -0,0 +1,38 @@
+"""Test cases for `upload_sessions`."""
+
+import pytest
+
+from files_api.page_tokens import (
+    PageToken,
+    encode_page_token,
+)
+from files_api.upload_sessions import (
+    InvalidUploadSessionError,
+    UploadSession,
+    decode_upload_session_id,
+    encode_upload_session_id,
+)
+
+SECRET = b"secret"
+
+
+def test_upload_session_id_round_trip():
+    upload_session = UploadSession(file_path="dir/ünïcode file.bin", s3_upload_id="abc+/=")
+    upload_session_id = encode_upload_session_id(upload_session, SECRET)
+    assert "/" not in upload_session_id and "+" not in upload_session_id
+    assert decode_upload_session_id(upload_session_id, SECRET) == upload_session
+
+
+@pytest.mark.parametrize(
+    "upload_session_id",
+    [
+        "",
+        "no-signature",
+        encode_upload_session_id(UploadSession("a", "b"), b"other secret"),
+        encode_upload_session_id(UploadSession("a", "b"), SECRET)[1:],
+        encode_page_token(PageToken(directory="a", last_file_path="b", page_size=10), SECRET),
+    ],
+)
+def test_invalid_upload_session_ids_are_rejected(upload_session_id: str):
+    with pytest.raises(InvalidUploadSessionError):
+        decode_upload_session_id(upload_session_id, SECRET)
@@ -1,4 +1,8 @@
+from typing import List
+from urllib.parse import unquote
+
 import boto3
+from botocore.awsrequest import AWSResponse
 
 
 def delete_s3_bucket(bucket_name: str) -> None:
@@ -6,3 +10,34 @@ def delete_s3_bucket(bucket_name: str) -> None:
     bucket = s3_delete.Bucket(bucket_name)
     bucket.objects.all().delete()
     bucket.delete()
+
+
+def record_s3_calls(s3_client) -> List[str]:
+    """Record the name of every S3 operation, e.g. "HeadObject", made with `s3_client` from now on."""
+    calls: List[str] = []
+
+    def record_call(model, **kwargs):  # pylint: disable=unused-argument
+        calls.append(model.name)
+
+    s3_client.meta.events.register("before-call.s3", record_call)
+    return calls
+
+
+def check_copy_source_if_match(s3_client) -> None:
+    """Fail the `CopyObject` calls of `s3_client` whose `CopySourceIfMatch` is stale, as S3 does and moto does not."""
+
+    def check_precondition(params, **kwargs):  # pylint: disable=unused-argument
+        headers = params["headers"]
+        if_match = headers.get("x-amz-copy-source-if-match")
+        if if_match is None:
+            return None
+        bucket_name, _, object_key = unquote(headers["x-amz-copy-source"]).partition("/")
+        if if_match == boto3.client("s3").head_object(Bucket=bucket_name, Key=object_key)["ETag"]:
+            return None
+        error = {
+            "Code": "PreconditionFailed",
+            "Message": "At least one of the pre-conditions you specified did not hold",
+        }
+        return AWSResponse(params["url"], 412, {}, None), {"Error": error, "ResponseMetadata": {"HTTPStatusCode": 412}}
+
+    s3_client.meta.events.register("before-call.s3.CopyObject", check_precondition)